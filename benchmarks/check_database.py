@@ -0,0 +1,163 @@
+"""
+Check that reading the Plex library from its database gives the same items and expired media as the Plex API.
+
+Usage:
+    python -m benchmarks.check_database --size 500
+
+A synthetic library with items without history, multi-part movies, shows without episodes and views older than
+the history window is served by the mock Plex server and written to a fixture database. Both are read by a
+PlexClient, and the rows and the expired items of every library type have to be equal.
+"""
+import argparse
+import dataclasses
+import json
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.database import build_database
+from benchmarks.library import generate_library
+from benchmarks.run import build_config
+from benchmarks.servers import MockPlex, MockRadarr, MockSonarr, MockOverseerr, start_server
+
+
+def get_coverage(library, min_viewed_at):
+    """
+    Counts the items of the library that fall into each edge case the check has to cover.
+    """
+    views = library.history_by_rating_key
+    return {
+        "items without history": sum(1 for item in library.movies + library.shows if item.rating_key not in views),
+        "multi-part movies": sum(1 for movie in library.movies if movie.parts > 1),
+        "shows without episodes": sum(1 for show in library.shows if not show.episodes),
+        "items only viewed before the history window": sum(1 for item_views in views.values() if all(view.viewed_at <= min_viewed_at for view in item_views)),
+    }
+
+
+def get_rows(plex, section_type, thresholds, schedule_interval):
+    """
+    Reads the watch state of every item of a library type, with every item loaded as the deletion pipelines see it.
+
+    Returns:
+        tuple: The rows by rating key, and the MediaSnapshot they were read from.
+    """
+    # pylint: disable=import-outside-toplevel
+    from src.clients.plex import PlexClient
+    from src.policy import MediaSnapshot
+
+    media_states = plex.get_media_states(section_type, thresholds, schedule_interval)
+    for media_state in media_states:
+        PlexClient.reload_media(media_state)
+
+    snapshot = MediaSnapshot(media_states)
+    return {row["rating_key"]: row for row in snapshot.to_rows()}, snapshot
+
+
+def compare(section_type, api_rows, database_rows):
+    """
+    Compares the rows read from the API with the rows read from the database.
+
+    Returns:
+        list: A description of every difference.
+    """
+    differences = []
+    for rating_key in sorted(api_rows.keys() | database_rows.keys()):
+        api_row, database_row = api_rows.get(rating_key), database_rows.get(rating_key)
+        if api_row is None or database_row is None:
+            differences.append(f"{section_type} {rating_key}: only read from the {'database' if api_row is None else 'API'}")
+            continue
+
+        for key in api_row:
+            if api_row[key] != database_row[key]:
+                differences.append(f"{section_type} {rating_key} {key}: API {api_row[key]!r}, database {database_row[key]!r}")
+
+    return differences
+
+
+def check(size, seed):
+    """
+    Runs the check against a library of the given size.
+
+    Returns:
+        dict: The coverage of the edge cases, the number of items and expired items of every type, and the differences.
+    """
+    library = generate_library(size, seed, multi_part_ratio=0.2, empty_show_ratio=0.1)
+    database_path = os.path.abspath("plex.db")
+    build_database(library, database_path)
+
+    services = {"plex": MockPlex(library), "radarr": MockRadarr(library), "sonarr": MockSonarr(library), "overseerr": MockOverseerr(library)}
+    servers = {name: start_server(service) for name, service in services.items()}
+
+    try:
+        with open("config.json", "w", encoding="utf-8") as file:
+            json.dump(build_config({name: server.server_address[1] for name, server in servers.items()}, True, "WARN", database_path), file)
+
+        # pylint: disable=import-outside-toplevel
+        from src.config import Config
+        from src.clients.plex import PlexClient
+        from src.logger import configure_logger
+        from src.policy import ExpiryPolicy
+
+        config = Config()
+        configure_logger(config)
+        api_plex = PlexClient(config, dataclasses.replace(config.plex, database_path=""))
+        database_plex = PlexClient(config, config.plex)
+
+        result = {"coverage": get_coverage(library, time.time() - max(config.radarr.watched_deletion_threshold, config.sonarr.watched_deletion_threshold) - config.schedule_interval * 3), "items": {}, "expired": {}, "differences": []}
+        now = time.time()
+        for section_type, instance in (("movie", config.radarr), ("show", config.sonarr)):
+            thresholds = [(instance.watched_deletion_threshold, instance.unwatched_deletion_threshold)]
+            api_rows, api_snapshot = get_rows(api_plex, section_type, thresholds, config.schedule_interval)
+            database_rows, database_snapshot = get_rows(database_plex, section_type, thresholds, config.schedule_interval)
+            result["differences"].extend(compare(section_type, api_rows, database_rows))
+
+            policy = ExpiryPolicy(*thresholds[0])
+            api_expired = {media_state.media.ratingKey for media_state in api_snapshot.select(policy.get_expired(api_snapshot, now))}
+            database_expired = {media_state.media.ratingKey for media_state in database_snapshot.select(policy.get_expired(database_snapshot, now))}
+            if api_expired != database_expired:
+                result["differences"].append(f"{section_type} expired: only from the API {sorted(api_expired - database_expired)}, only from the database {sorted(database_expired - api_expired)}")
+
+            result["items"][section_type] = len(api_rows)
+            result["expired"][section_type] = len(api_expired)
+
+        return result
+    finally:
+        for server in servers.values():
+            server.shutdown()
+
+
+def main():
+    """
+    Parses the command line arguments, runs the check and exits with a non-zero status if it failed.
+    """
+    parser = argparse.ArgumentParser(description="Check that the Plex database backend matches the Plex API")
+    parser.add_argument("--size", type=int, default=300, help="number of library items")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the synthetic library")
+    args = parser.parse_args()
+
+    repository = os.getcwd()
+    sys.path.insert(0, repository)
+
+    with tempfile.TemporaryDirectory() as working_directory:
+        os.chdir(working_directory)
+        try:
+            result = check(args.size, args.seed)
+        finally:
+            os.chdir(repository)
+
+    print(json.dumps(result, indent=2))
+
+    uncovered = [case for case, count in result["coverage"].items() if not count]
+    if uncovered:
+        print(f"The library does not cover: {', '.join(uncovered)}. Use a larger --size.")
+        sys.exit(1)
+    if result["differences"]:
+        print(f"The database backend differs from the API in {len(result['differences'])} places.")
+        sys.exit(1)
+
+    print("The database backend matches the API.")
+
+
+if __name__ == "__main__":
+    main()
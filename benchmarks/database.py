@@ -0,0 +1,91 @@
+"""This module writes a synthetic library to a fixture database with the tables of the Plex library database."""
+import sqlite3
+
+from benchmarks.library import SyntheticLibrary
+
+# The subset of the Plex library schema that is read by PlexDatabase, with the indexes Plex creates on it.
+SCHEMA = """
+CREATE TABLE library_sections (id INTEGER PRIMARY KEY, name TEXT, section_type INTEGER);
+CREATE TABLE section_locations (id INTEGER PRIMARY KEY, library_section_id INTEGER, root_path TEXT);
+CREATE TABLE metadata_items (id INTEGER PRIMARY KEY, library_section_id INTEGER, parent_id INTEGER, metadata_type INTEGER, guid TEXT, title TEXT, "index" INTEGER, added_at INTEGER, updated_at INTEGER);
+CREATE TABLE media_items (id INTEGER PRIMARY KEY, library_section_id INTEGER, metadata_item_id INTEGER, size INTEGER);
+CREATE TABLE media_parts (id INTEGER PRIMARY KEY, media_item_id INTEGER, file TEXT, size INTEGER);
+CREATE TABLE tags (id INTEGER PRIMARY KEY, tag TEXT, tag_type INTEGER);
+CREATE TABLE taggings (id INTEGER PRIMARY KEY, metadata_item_id INTEGER, tag_id INTEGER, "index" INTEGER);
+CREATE TABLE metadata_item_views (id INTEGER PRIMARY KEY, account_id INTEGER, guid TEXT, metadata_type INTEGER, library_section_id INTEGER, grandparent_title TEXT, parent_index INTEGER, "index" INTEGER, title TEXT, viewed_at INTEGER, grandparent_guid TEXT);
+CREATE INDEX index_metadata_items_on_parent_id ON metadata_items (parent_id);
+CREATE INDEX index_metadata_items_on_metadata_type ON metadata_items (metadata_type);
+CREATE INDEX index_media_items_on_metadata_item_id ON media_items (metadata_item_id);
+CREATE INDEX index_media_parts_on_media_item_id ON media_parts (media_item_id);
+CREATE INDEX index_taggings_on_metadata_item_id ON taggings (metadata_item_id);
+CREATE INDEX index_metadata_item_views_on_guid ON metadata_item_views (guid);
+CREATE INDEX index_metadata_item_views_on_grandparent_guid ON metadata_item_views (grandparent_guid);
+CREATE INDEX index_metadata_item_views_on_viewed_at ON metadata_item_views (viewed_at);
+"""
+
+MOVIE_SECTION = 1
+SHOW_SECTION = 2
+GUID_TAG_TYPE = 314
+
+
+def build_database(library: SyntheticLibrary, path: str):
+    """
+    Writes the library to a fixture database that holds the same items, files, GUIDs and history as the mock Plex
+    server.
+
+    Args:
+        library: The synthetic library.
+        path: The path the database is written to.
+    """
+    connection = sqlite3.connect(path)
+    connection.executescript(SCHEMA)
+
+    connection.executemany("INSERT INTO library_sections VALUES (?, ?, ?)", [(MOVIE_SECTION, "Movies", 1), (SHOW_SECTION, "TV Shows", 2)])
+    connection.executemany("INSERT INTO section_locations VALUES (?, ?, ?)", [(1, MOVIE_SECTION, "/data/movies"), (2, SHOW_SECTION, "/data/tv")])
+
+    items = []
+    media = []
+    parts = []
+    tags = []
+    # Seasons are not served by the mock, so they get IDs after every rating key.
+    season_id = max([movie.rating_key for movie in library.movies] + [episode.rating_key for show in library.shows for episode in show.episodes] + [show.rating_key for show in library.shows], default=0)
+
+    for movie in library.movies:
+        items.append((movie.rating_key, MOVIE_SECTION, None, 1, f"plex://movie/{movie.rating_key}", movie.title, None, movie.added_at, movie.added_at))
+        media.append((movie.rating_key, MOVIE_SECTION, movie.rating_key, movie.size))
+        parts.extend((movie.rating_key * 10 + part, movie.rating_key, file, size) for part, (file, size) in enumerate(movie.files))
+        tags.append((movie.rating_key, f"tmdb://{movie.tmdb_id}"))
+
+    for show in library.shows:
+        items.append((show.rating_key, SHOW_SECTION, None, 2, f"plex://show/{show.rating_key}", show.title, None, show.added_at, show.added_at))
+        tags.append((show.rating_key, f"tvdb://{show.tvdb_id}"))
+
+        seasons = {}
+        for episode in show.episodes:
+            if episode.season not in seasons:
+                season_id += 1
+                seasons[episode.season] = season_id
+                items.append((season_id, SHOW_SECTION, show.rating_key, 3, f"plex://season/{season_id}", f"Season {episode.season}", episode.season, show.added_at, show.added_at))
+
+            items.append((episode.rating_key, SHOW_SECTION, seasons[episode.season], 4, f"plex://episode/{episode.rating_key}", f"Episode {episode.episode}", episode.episode, episode.added_at, episode.added_at))
+            media.append((episode.rating_key, SHOW_SECTION, episode.rating_key, episode.size))
+            parts.append((episode.rating_key * 10, episode.rating_key, f"{show.path}/Season {episode.season}/E{episode.episode}.mkv", episode.size))
+
+    connection.executemany("INSERT INTO metadata_items VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", items)
+    connection.executemany("INSERT INTO media_items VALUES (?, ?, ?, ?)", media)
+    connection.executemany("INSERT INTO media_parts VALUES (?, ?, ?, ?)", parts)
+    connection.executemany("INSERT INTO tags VALUES (?, ?, ?)", [(index + 1, tag, GUID_TAG_TYPE) for index, (_, tag) in enumerate(tags)])
+    connection.executemany("INSERT INTO taggings VALUES (?, ?, ?, ?)", [(index + 1, metadata_item_id, index + 1, 0) for index, (metadata_item_id, _) in enumerate(tags)])
+
+    shows = {show.rating_key: show for show in library.shows}
+    views = []
+    for view in library.history:
+        if view.media_type == "movie":
+            views.append((view.history_key, view.account_id, f"plex://movie/{view.rating_key}", 1, MOVIE_SECTION, None, None, None, None, view.viewed_at, None))
+        else:
+            show = shows[view.parent_rating_key]
+            views.append((view.history_key, view.account_id, f"plex://episode/{view.rating_key}", 4, SHOW_SECTION, show.title, view.season, view.episode, f"Episode {view.episode}", view.viewed_at, f"plex://show/{show.rating_key}"))
+    connection.executemany("INSERT INTO metadata_item_views VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", views)
+
+    connection.commit()
+    connection.close()
@@ -0,0 +1,162 @@
+"""This module generates the synthetic media libraries served by the benchmark mock servers."""
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+DAY = 86400
+
+
+@dataclass
+class SyntheticEpisode:
+    """This class is used to store a synthetic episode."""
+    rating_key: int
+    episode_id: int
+    season: int
+    episode: int
+    added_at: int
+    air_date: str
+    has_file: bool
+    size: int
+
+
+@dataclass
+class SyntheticMovie:
+    """This class is used to store a synthetic movie."""
+    rating_key: int
+    arr_id: int
+    title: str
+    tmdb_id: int
+    added_at: int
+    size: int
+    path: str
+    tags: List[int] = field(default_factory=list)
+    parts: int = 1
+
+    @property
+    def files(self):
+        """Returns the path and size of every part of the movie, splitting its size evenly over the parts."""
+        if self.parts == 1:
+            return [(f"{self.path}/{self.title}.mkv", self.size)]
+
+        part_size = self.size // self.parts
+        return [(f"{self.path}/{self.title} - pt{part}.mkv", part_size if part < self.parts else self.size - part_size * (self.parts - 1)) for part in range(1, self.parts + 1)]
+
+
+@dataclass
+class SyntheticShow:
+    """This class is used to store a synthetic show."""
+    rating_key: int
+    arr_id: int
+    title: str
+    tvdb_id: int
+    added_at: int
+    ended: bool
+    path: str
+    tags: List[int] = field(default_factory=list)
+    episodes: List[SyntheticEpisode] = field(default_factory=list)
+
+    @property
+    def size(self):
+        """Returns the total size of the episodes on disk."""
+        return sum(episode.size for episode in self.episodes if episode.has_file)
+
+
+@dataclass
+class SyntheticView:
+    """This class is used to store a synthetic history entry."""
+    history_key: int
+    rating_key: int
+    parent_rating_key: int
+    viewed_at: int
+    account_id: int
+    media_type: str
+    season: int = 0
+    episode: int = 0
+
+
+@dataclass
+class SyntheticLibrary:
+    """This class is used to store a complete synthetic library."""
+    movies: List[SyntheticMovie]
+    shows: List[SyntheticShow]
+    history: List[SyntheticView]
+    exempt_tag_id: int = 1
+    history_by_rating_key: Dict[int, List[SyntheticView]] = field(default_factory=dict)
+
+    def __post_init__(self):
+        for view in self.history:
+            self.history_by_rating_key.setdefault(view.parent_rating_key, []).append(view)
+        for views in self.history_by_rating_key.values():
+            views.sort(key=lambda view: view.viewed_at, reverse=True)
+        self.history.sort(key=lambda view: view.viewed_at, reverse=True)
+
+
+def generate_library(size: int, seed: int = 0, show_ratio: float = 0.3, episodes_per_show: int = 10, watched_ratio: float = 0.5, exempt_ratio: float = 0.02, max_age_days: int = 365, multi_part_ratio: float = 0.0, empty_show_ratio: float = 0.0):
+    """
+    Generates a deterministic synthetic library.
+
+    Args:
+        size: The total number of movies and shows.
+        seed: The random seed.
+        show_ratio: The fraction of items that are shows.
+        episodes_per_show: The number of episodes of each show.
+        watched_ratio: The fraction of items with at least one view in their history.
+        exempt_ratio: The fraction of items tagged with the exempt tag.
+        max_age_days: The maximum age of an item.
+        multi_part_ratio: The fraction of movies that are split over two or three files.
+        empty_show_ratio: The fraction of shows without any episodes.
+
+    Returns:
+        SyntheticLibrary: The generated library.
+    """
+    rng = random.Random(seed)
+    now = int(time.time())
+    show_count = int(size * show_ratio)
+    movie_count = size - show_count
+
+    rating_key = 1000
+    history_key = 1
+    movies = []
+    shows = []
+    history = []
+
+    for index in range(movie_count):
+        rating_key += 1
+        added_at = now - rng.randint(0, max_age_days * DAY)
+        tags = [1] if rng.random() < exempt_ratio else []
+        movie = SyntheticMovie(rating_key, index + 1, f"Movie {index + 1}", 100000 + index, added_at, rng.randint(1, 60) * 1024 ** 3, f"/data/movies/Movie {index + 1}", tags)
+        # The edge cases only draw from the generator when enabled, so the default libraries stay the same.
+        if multi_part_ratio and rng.random() < multi_part_ratio:
+            movie.parts = rng.randint(2, 3)
+        movies.append(movie)
+
+        if rng.random() < watched_ratio:
+            for _ in range(rng.randint(1, 3)):
+                history.append(SyntheticView(history_key, movie.rating_key, movie.rating_key, rng.randint(added_at, now), rng.randint(1, 5), "movie"))
+                history_key += 1
+
+    for index in range(show_count):
+        rating_key += 1
+        show_rating_key = rating_key
+        added_at = now - rng.randint(0, max_age_days * DAY)
+        tags = [1] if rng.random() < exempt_ratio else []
+        show = SyntheticShow(show_rating_key, index + 1, f"Show {index + 1}", 200000 + index, added_at, rng.random() < 0.5, f"/data/tv/Show {index + 1}", tags)
+
+        episode_count = 0 if empty_show_ratio and rng.random() < empty_show_ratio else episodes_per_show
+        for episode_index in range(episode_count):
+            rating_key += 1
+            season = episode_index // 10 + 1
+            episode_added_at = min(now, added_at + episode_index * DAY * rng.randint(0, 7))
+            air_date = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(episode_added_at - DAY))
+            episode_id = (index + 1) * 1000 + episode_index + 1
+            show.episodes.append(SyntheticEpisode(rating_key, episode_id, season, episode_index % 10 + 1, episode_added_at, air_date, True, rng.randint(1, 4) * 1024 ** 3))
+
+        shows.append(show)
+
+        if rng.random() < watched_ratio:
+            for episode in rng.sample(show.episodes, rng.randint(1, len(show.episodes))) if show.episodes else []:
+                history.append(SyntheticView(history_key, episode.rating_key, show.rating_key, rng.randint(episode.added_at, now), rng.randint(1, 5), "episode", episode.season, episode.episode))
+                history_key += 1
+
+    return SyntheticLibrary(movies, shows, history)
@@ -0,0 +1,180 @@
+"""
+Benchmark harness that runs Eraserr's jobs end to end against local mock Plex, Radarr, Sonarr and Overseerr servers.
+
+Usage:
+    python -m benchmarks.run --size 1000 --size 10000 --latency 0.005
+
+The mock servers run in a separate process so that the reported peak memory only covers Eraserr itself.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import urllib.request
+
+from benchmarks.database import build_database
+from benchmarks.library import generate_library
+from benchmarks.servers import RESET_PATH, STATS_PATH, MockOverseerr, MockPlex, MockRadarr, MockSonarr, start_server
+
+SERVICES = ("plex", "radarr", "sonarr", "overseerr")
+
+
+def serve(size, seed, latency, sessions, ready, database_path=None):
+    """
+    Generates a synthetic library and serves it from the mock servers until the process is terminated.
+
+    If a database path is given, the library is also written to a fixture Plex database.
+    """
+    library = generate_library(size, seed)
+    if database_path:
+        build_database(library, database_path)
+    services = {
+        "plex": MockPlex(library, latency, sessions),
+        "radarr": MockRadarr(library, latency),
+        "sonarr": MockSonarr(library, latency),
+        "overseerr": MockOverseerr(library, latency),
+    }
+    servers = {name: start_server(service) for name, service in services.items()}
+    ready.put({name: server.server_address[1] for name, server in servers.items()})
+
+    while True:
+        time.sleep(3600)
+
+
+def build_config(ports, dry_run, log_level, database_path=None):
+    """
+    Builds a config.json that points every client at the mock servers, and at the fixture Plex database if given.
+    """
+    return {
+        "dry_run": dry_run,
+        "log_level": log_level,
+        "schedule_interval": "1d",
+        "plex": {"base_url": f"http://127.0.0.1:{ports['plex']}", "token": "benchmark", "database_path": database_path or ""},
+        "radarr": {"enabled": True, "api_key": "benchmark", "base_url": f"http://127.0.0.1:{ports['radarr']}/api/v3", "exempt_tag_names": ["exempt-from-auto-delete"], "watched_deletion_threshold": "90d", "unwatched_deletion_threshold": "30d"},
+        "sonarr": {
+            "enabled": True,
+            "api_key": "benchmark",
+            "base_url": f"http://127.0.0.1:{ports['sonarr']}/api/v3",
+            "monitor_continuing_series": True,
+            "exempt_tag_names": ["exempt-from-auto-delete"],
+            "dynamic_load": {"enabled": True, "episodes_to_load": 3, "episodes_to_keep": 3, "watched_deletion_threshold": "30d", "schedule_interval": "5m"},
+            "watched_deletion_threshold": "90d",
+            "unwatched_deletion_threshold": "30d",
+        },
+        "overseerr": {"enabled": True, "api_key": "benchmark", "base_url": f"http://127.0.0.1:{ports['overseerr']}/api/v1", "fetch_limit": 100},
+    }
+
+
+def get_request_counts(ports, reset=False):
+    """
+    Retrieves the per-endpoint request counts from every mock server.
+    """
+    counts = {}
+    for name in SERVICES:
+        path = RESET_PATH if reset else STATS_PATH
+        with urllib.request.urlopen(f"http://127.0.0.1:{ports[name]}{path}", timeout=30) as response:
+            for endpoint, count in json.loads(response.read()).items():
+                counts[f"{name} {endpoint}"] = count
+
+    return counts
+
+
+def measure(job, ports):
+    """
+    Runs a job and measures its wall time, request counts and peak memory.
+    """
+    get_request_counts(ports, reset=True)
+    tracemalloc.start()
+    start = time.perf_counter()
+    error = None
+
+    try:
+        job()
+    except Exception as err:  # pylint: disable=broad-except
+        error = repr(err)
+
+    wall_time = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    request_counts = get_request_counts(ports)
+
+    return {"wall_time_seconds": round(wall_time, 3), "peak_memory_bytes": peak, "request_count": sum(request_counts.values()), "requests": dict(sorted(request_counts.items())), "error": error}
+
+
+def run_benchmark(size, args):
+    """
+    Runs every selected job against a mock library of the given size.
+    """
+    ready = multiprocessing.Queue()
+    database_path = os.path.abspath(f"plex-{size}.db") if args.plex_database else None
+    process = multiprocessing.Process(target=serve, args=(size, args.seed, args.latency, args.sessions, ready, database_path), daemon=True)
+    process.start()
+
+    try:
+        ports = ready.get(timeout=600)
+        with open("config.json", "w", encoding="utf-8") as file:
+            json.dump(build_config(ports, not args.live, args.log_level, database_path), file)
+
+        # pylint: disable=import-outside-toplevel
+        from src.config import Config
+        from src.jobs import JobRunner
+        from src.logger import configure_logger
+
+        config = Config()
+        configure_logger(config)
+        job_runner = JobRunner(config)
+        results = {"size": size, "latency_seconds": args.latency}
+
+        if "delete" in args.jobs:
+            results["get_and_delete_job"] = measure(job_runner.get_and_delete_job, ports)
+        if "dynamic" in args.jobs:
+            results["dynamic_load_job"] = measure(job_runner.dynamic_load_job, ports)
+
+        return results
+    finally:
+        process.terminate()
+        process.join()
+
+
+def main():
+    """
+    Parses the command line arguments and runs the benchmarks.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark Eraserr against local mock servers")
+    parser.add_argument("--size", type=int, action="append", help="number of library items (repeatable, default: 1000)")
+    parser.add_argument("--latency", type=float, default=0.0, help="latency in seconds injected into every mock request")
+    parser.add_argument("--sessions", type=int, default=5, help="number of active Plex sessions for the dynamic load job")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the synthetic library")
+    parser.add_argument("--jobs", default="delete,dynamic", help="comma separated jobs to run (delete, dynamic)")
+    parser.add_argument("--live", action="store_true", help="disable dry run so deletions are sent to the mock servers")
+    parser.add_argument("--plex-database", action="store_true", help="read the Plex library from a fixture database instead of the mock Plex API")
+    parser.add_argument("--log-level", default="WARN", help="log level of the benchmarked run")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+    args.jobs = args.jobs.split(",")
+
+    repository = os.getcwd()
+    output = os.path.abspath(args.output) if args.output else None
+    sys.path.insert(0, repository)
+
+    results = []
+    with tempfile.TemporaryDirectory() as working_directory:
+        os.chdir(working_directory)
+        try:
+            for size in args.size or [1000]:
+                results.append(run_benchmark(size, args))
+                print(json.dumps(results[-1], indent=2))
+        finally:
+            os.chdir(repository)
+
+    if output:
+        with open(output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,424 @@
+"""This module contains the local mock Plex, Radarr, Sonarr and Overseerr servers used by the benchmark harness."""
+import json
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from xml.sax.saxutils import quoteattr
+
+from benchmarks.library import SyntheticLibrary
+
+STATS_PATH = "/__benchmark/stats"
+RESET_PATH = "/__benchmark/reset"
+
+
+class MockService:
+    """
+    Base class for a mock service.
+
+    Subclasses register routes as (method, pattern, endpoint, handler) tuples. The endpoint is the templated
+    name the request is counted under, so `/movie/12` and `/movie/13` are both counted as `DELETE /movie/{id}`.
+    """
+    name = "mock"
+
+    def __init__(self, library: SyntheticLibrary, latency: float = 0.0):
+        self.library = library
+        self.latency = latency
+        self.routes = []
+        self.request_counts = Counter()
+        self.lock = threading.Lock()
+
+    def route(self, method, pattern, endpoint, handler):
+        """
+        Registers a route.
+        """
+        self.routes.append((method, re.compile(f"^{pattern}$"), endpoint, handler))
+
+    def handle(self, method, path, query, headers, body):
+        """
+        Dispatches a request to its route.
+
+        Returns:
+            tuple: The status code, the content type and the response body.
+        """
+        if path == STATS_PATH:
+            with self.lock:
+                return 200, "application/json", json.dumps(dict(self.request_counts)).encode()
+
+        if path == RESET_PATH:
+            with self.lock:
+                self.request_counts.clear()
+            return 200, "application/json", b"{}"
+
+        for route_method, pattern, endpoint, handler in self.routes:
+            match = pattern.match(path)
+            if route_method != method or not match:
+                continue
+
+            with self.lock:
+                self.request_counts[f"{method} {endpoint}"] += 1
+
+            if self.latency:
+                time.sleep(self.latency)
+
+            return handler(match, query, headers, body)
+
+        return 404, "text/plain", f"No mock route for {method} {path}".encode()
+
+
+class MockRequestHandler(BaseHTTPRequestHandler):
+    """Request handler that dispatches to the MockService attached to its server."""
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def __handle(self, method):
+        url = urlparse(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query, keep_blank_values=True).items()}
+        length = int(self.headers.get("Content-Length", 0) or 0)
+        body = self.rfile.read(length) if length else b""
+        status, content_type, payload = self.server.service.handle(method, url.path.rstrip("/") or "/", query, self.headers, body)
+
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Handles GET requests."""
+        self.__handle("GET")
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """Handles POST requests."""
+        self.__handle("POST")
+
+    def do_PUT(self):  # pylint: disable=invalid-name
+        """Handles PUT requests."""
+        self.__handle("PUT")
+
+    def do_DELETE(self):  # pylint: disable=invalid-name
+        """Handles DELETE requests."""
+        self.__handle("DELETE")
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+
+def json_response(status, data):
+    """Builds a JSON response tuple."""
+    return status, "application/json", json.dumps(data).encode()
+
+
+def xml_response(body):
+    """Builds an XML response tuple."""
+    return 200, "text/xml;charset=utf-8", body.encode()
+
+
+def xml_attrs(**attrs):
+    """Formats the given keyword arguments as XML attributes."""
+    return " ".join(f"{key}={quoteattr(str(value))}" for key, value in attrs.items() if value is not None)
+
+
+class MockPlex(MockService):
+    """Mock of the Plex Media Server endpoints used by PlexClient."""
+    name = "plex"
+    MOVIE_SECTION = 1
+    SHOW_SECTION = 2
+
+    def __init__(self, library: SyntheticLibrary, latency: float = 0.0, sessions: int = 0):
+        super().__init__(library, latency)
+        self.items = {}
+        self.episode_parents = {}
+        for movie in library.movies:
+            self.items[movie.rating_key] = movie
+        for show in library.shows:
+            self.items[show.rating_key] = show
+            for episode in show.episodes:
+                self.items[episode.rating_key] = episode
+                self.episode_parents[episode.rating_key] = show
+        self.shows_by_guid = {f"plex://show/{show.rating_key}": show for show in library.shows}
+        self.sessions = self.__build_sessions(sessions)
+
+        self.route("GET", "/", "/", self.get_root)
+        self.route("GET", "/library", "/library", self.get_library)
+        self.route("GET", "/library/sections", "/library/sections", self.get_sections)
+        self.route("GET", r"/library/sections/(\d+)/all", "/library/sections/{id}/all", self.get_section_all)
+        self.route("GET", r"/library/sections/(\d+)/collections", "/library/sections/{id}/collections", lambda *args: xml_response(self.__container([])))
+        self.route("GET", r"/library/metadata/(\d+)", "/library/metadata/{id}", self.get_metadata)
+        self.route("GET", r"/library/metadata/(\d+)/allLeaves", "/library/metadata/{id}/allLeaves", self.get_all_leaves)
+        self.route("GET", "/status/sessions/history/all", "/status/sessions/history/all", self.get_history)
+        self.route("GET", "/status/sessions", "/status/sessions", self.get_sessions)
+        self.route("GET", r"/library/sections/(\d+)/refresh", "/library/sections/{id}/refresh", lambda *args: xml_response(self.__container([])))
+        self.route("PUT", r"/library/sections/(\d+)/emptyTrash", "/library/sections/{id}/emptyTrash", lambda *args: xml_response(self.__container([])))
+
+    def __build_sessions(self, count):
+        sessions = []
+        for show in self.library.shows:
+            if len(sessions) >= count:
+                break
+            if len(show.episodes) > 1:
+                sessions.append((show, show.episodes[len(show.episodes) // 2]))
+
+        return sessions
+
+    @staticmethod
+    def __page(items, query, headers):
+        start = int(headers.get("X-Plex-Container-Start", query.get("X-Plex-Container-Start", 0)))
+        size = int(headers.get("X-Plex-Container-Size", query.get("X-Plex-Container-Size", len(items))))
+        return items[start:start + size], start
+
+    @staticmethod
+    def __container(children, total_size=None, offset=0, **attrs):
+        size = len(children)
+        total_size = size if total_size is None else total_size
+        return f"<MediaContainer {xml_attrs(size=size, totalSize=total_size, offset=offset, **attrs)}>{''.join(children)}</MediaContainer>"
+
+    def __movie_xml(self, movie):
+        view_count = len(self.library.history_by_rating_key.get(movie.rating_key, []))
+        return (
+            f"<Video {xml_attrs(ratingKey=movie.rating_key, key=f'/library/metadata/{movie.rating_key}', guid=f'plex://movie/{movie.rating_key}', type='movie', title=movie.title, librarySectionID=self.MOVIE_SECTION, addedAt=movie.added_at, updatedAt=movie.added_at, viewCount=view_count)}>"
+            f"<Media id=\"{movie.rating_key}\">{''.join(f'<Part {xml_attrs(id=movie.rating_key * 10 + part, file=file, size=size)}/>' for part, (file, size) in enumerate(movie.files))}</Media>"
+            f"<Guid id=\"tmdb://{movie.tmdb_id}\"/></Video>"
+        )
+
+    def __show_xml(self, show):
+        viewed = {view.rating_key for view in self.library.history_by_rating_key.get(show.rating_key, [])}
+        return (
+            f"<Directory {xml_attrs(ratingKey=show.rating_key, key=f'/library/metadata/{show.rating_key}/children', guid=f'plex://show/{show.rating_key}', type='show', title=show.title, librarySectionID=self.SHOW_SECTION, addedAt=show.added_at, updatedAt=show.added_at, leafCount=len(show.episodes), viewedLeafCount=len(viewed), childCount=max((episode.season for episode in show.episodes), default=0))}>"
+            # Plex locates a show by the folders of its episode files, so a show without episodes has no location.
+            f"<Guid id=\"tvdb://{show.tvdb_id}\"/>{f'<Location path={quoteattr(show.path)}/>' if show.episodes else ''}</Directory>"
+        )
+
+    def __episode_xml(self, episode, show, tag="Video", **extra):
+        return (
+            f"<{tag} {xml_attrs(ratingKey=episode.rating_key, key=f'/library/metadata/{episode.rating_key}', guid=f'plex://episode/{episode.rating_key}', type='episode', title=f'Episode {episode.episode}', grandparentTitle=show.title, grandparentRatingKey=show.rating_key, grandparentKey=f'/library/metadata/{show.rating_key}', grandparentGuid=f'plex://show/{show.rating_key}', parentIndex=episode.season, index=episode.episode, librarySectionID=self.SHOW_SECTION, addedAt=episode.added_at, updatedAt=episode.added_at, **extra)}>"
+            + ("" if tag != "Video" or extra else f"<Media id=\"{episode.rating_key}\"><Part {xml_attrs(id=episode.rating_key, file=f'{show.path}/Season {episode.season}/E{episode.episode}.mkv', size=episode.size)}/></Media>")
+            + f"</{tag}>"
+        )
+
+    def __item_xml(self, item):
+        if item.rating_key in self.episode_parents:
+            return self.__episode_xml(item, self.episode_parents[item.rating_key])
+        if hasattr(item, "episodes"):
+            return self.__show_xml(item)
+        return self.__movie_xml(item)
+
+    def get_root(self, match, query, headers, body):
+        """Handles GET /."""
+        return xml_response(self.__container([], machineIdentifier="benchmark", friendlyName="Eraserr Benchmark", version="1.40.0.0000", myPlex="0", platform="Linux"))
+
+    def get_library(self, match, query, headers, body):
+        """Handles GET /library."""
+        return xml_response(self.__container([], title1="Plex Library"))
+
+    def get_sections(self, match, query, headers, body):
+        """Handles GET /library/sections."""
+        directories = [
+            f"<Directory {xml_attrs(key=self.MOVIE_SECTION, type='movie', title='Movies', agent='tv.plex.agents.movie', scanner='Plex Movie', uuid='movies', refreshing=0)}><Location id=\"1\" path=\"/data/movies\"/></Directory>",
+            f"<Directory {xml_attrs(key=self.SHOW_SECTION, type='show', title='TV Shows', agent='tv.plex.agents.series', scanner='Plex TV Series', uuid='shows', refreshing=0)}><Location id=\"2\" path=\"/data/tv\"/></Directory>",
+        ]
+        return xml_response(self.__container(directories))
+
+    def get_section_all(self, match, query, headers, body):
+        """Handles GET /library/sections/{id}/all."""
+        section_id = int(match.group(1))
+        libtype = query.get("type")
+
+        if query.get("includeMeta"):
+            types = [("movie", 1)] if section_id == self.MOVIE_SECTION else [("show", 2), ("episode", 4)]
+            meta = "".join(f"<Type {xml_attrs(key=f'/library/sections/{section_id}/all?type={number}', type=name, title=name, active='1')}/>" for name, number in types)
+            return xml_response(f"<MediaContainer size=\"0\" totalSize=\"0\"><Meta>{meta}</Meta></MediaContainer>")
+
+        if section_id == self.MOVIE_SECTION:
+            items = [self.__movie_xml(movie) for movie in self.library.movies] if libtype in (None, "1") else []
+        elif libtype == "4":
+            items = [self.__episode_xml(episode, show) for show in self.library.shows for episode in show.episodes]
+        elif query.get("guid"):
+            show = self.shows_by_guid.get(query["guid"])
+            items = [self.__show_xml(show)] if show else []
+        else:
+            page, start = self.__page(self.library.shows, query, headers)
+            return xml_response(self.__container([self.__show_xml(show) for show in page], len(self.library.shows), start, librarySectionID=section_id))
+
+        page, start = self.__page(items, query, headers)
+        return xml_response(self.__container(page, len(items), start, librarySectionID=section_id))
+
+    def get_metadata(self, match, query, headers, body):
+        """Handles GET /library/metadata/{id}."""
+        item = self.items.get(int(match.group(1)))
+        if item is None:
+            return 404, "text/plain", b"Not Found"
+
+        return xml_response(self.__container([self.__item_xml(item)]))
+
+    def get_all_leaves(self, match, query, headers, body):
+        """Handles GET /library/metadata/{id}/allLeaves."""
+        show = self.items.get(int(match.group(1)))
+        if show is None or not hasattr(show, "episodes"):
+            return 404, "text/plain", b"Not Found"
+
+        page, start = self.__page(show.episodes, query, headers)
+        return xml_response(self.__container([self.__episode_xml(episode, show) for episode in page], len(show.episodes), start))
+
+    def get_history(self, match, query, headers, body):
+        """Handles GET /status/sessions/history/all."""
+        rating_key = query.get("metadataItemID")
+        views = self.library.history_by_rating_key.get(int(rating_key), []) if rating_key else self.library.history
+        min_viewed_at = query.get("viewedAt>")
+        if min_viewed_at:
+            views = [view for view in views if view.viewed_at > int(min_viewed_at)]
+        account_id = query.get("accountID")
+        if account_id:
+            views = [view for view in views if view.account_id == int(account_id)]
+
+        page, start = self.__page(views, query, headers)
+        entries = []
+        for view in page:
+            attrs = {"historyKey": f"/status/sessions/history/{view.history_key}", "ratingKey": view.rating_key, "key": f"/library/metadata/{view.rating_key}", "type": view.media_type, "viewedAt": view.viewed_at, "accountID": view.account_id, "deviceID": 1}
+            if view.media_type == "episode":
+                attrs.update(grandparentRatingKey=view.parent_rating_key, grandparentKey=f"/library/metadata/{view.parent_rating_key}", parentIndex=view.season, index=view.episode)
+            entries.append(f"<Video {xml_attrs(**attrs)}/>")
+
+        return xml_response(self.__container(entries, len(views), start))
+
+    def get_sessions(self, match, query, headers, body):
+        """Handles GET /status/sessions."""
+        entries = []
+        for index, (show, episode) in enumerate(self.sessions):
+            entries.append(
+                f"<Video {xml_attrs(sessionKey=index + 1, ratingKey=episode.rating_key, key=f'/library/metadata/{episode.rating_key}', type='episode', title=f'Episode {episode.episode}', grandparentTitle=show.title, grandparentRatingKey=show.rating_key, grandparentGuid=f'plex://show/{show.rating_key}', parentIndex=episode.season, index=episode.episode, librarySectionID=self.SHOW_SECTION)}>"
+                f"<User id=\"{index % 5 + 1}\" title=\"user{index % 5 + 1}\"/><Player {xml_attrs(machineIdentifier=f'player{index}', state='playing', title='Benchmark Player')}/></Video>"
+            )
+        return xml_response(self.__container(entries))
+
+
+class MockRadarr(MockService):
+    """Mock of the Radarr v3 endpoints used by RadarrClient."""
+    name = "radarr"
+
+    def __init__(self, library: SyntheticLibrary, latency: float = 0.0):
+        super().__init__(library, latency)
+        self.route("GET", "/api/v3/movie", "/movie", self.get_movies)
+        self.route("GET", "/api/v3/tag", "/tag", self.get_tags)
+        self.route("GET", "/api/v3/rootfolder", "/rootfolder", self.get_root_folders)
+        self.route("GET", "/api/v3/diskspace", "/diskspace", self.get_disk_space)
+        self.route("DELETE", r"/api/v3/movie/(\d+)", "/movie/{id}", lambda *args: json_response(200, {}))
+
+    def get_movies(self, match, query, headers, body):
+        """Handles GET /movie."""
+        return json_response(200, [{"id": movie.arr_id, "title": movie.title, "tmdbId": movie.tmdb_id, "sizeOnDisk": movie.size, "tags": movie.tags, "path": movie.path, "hasFile": True} for movie in self.library.movies])
+
+    def get_tags(self, match, query, headers, body):
+        """Handles GET /tag."""
+        return json_response(200, [{"id": self.library.exempt_tag_id, "label": "exempt-from-auto-delete"}])
+
+    def get_root_folders(self, match, query, headers, body):
+        """Handles GET /rootfolder."""
+        return json_response(200, [{"id": 1, "path": "/data/movies", "freeSpace": 1024 ** 4}])
+
+    def get_disk_space(self, match, query, headers, body):
+        """Handles GET /diskspace."""
+        return json_response(200, [{"path": "/data", "label": "data", "freeSpace": 1024 ** 4, "totalSpace": 8 * 1024 ** 4}])
+
+
+class MockSonarr(MockService):
+    """Mock of the Sonarr v3 endpoints used by SonarrClient."""
+    name = "sonarr"
+
+    def __init__(self, library: SyntheticLibrary, latency: float = 0.0):
+        super().__init__(library, latency)
+        self.series = {show.arr_id: show for show in library.shows}
+        self.route("GET", "/api/v3/series", "/series", self.get_all_series)
+        self.route("GET", r"/api/v3/series/(\d+)", "/series/{id}", self.get_series)
+        self.route("PUT", r"/api/v3/series/(\d+)", "/series/{id}", self.put_series)
+        self.route("DELETE", r"/api/v3/series/(\d+)", "/series/{id}", lambda *args: json_response(200, {}))
+        self.route("GET", "/api/v3/tag", "/tag", self.get_tags)
+        self.route("GET", "/api/v3/episode", "/episode", self.get_episodes)
+        self.route("PUT", "/api/v3/episode/monitor", "/episode/monitor", lambda *args: json_response(202, []))
+        self.route("DELETE", "/api/v3/episodefile/bulk", "/episodefile/bulk", lambda *args: json_response(200, {}))
+        self.route("POST", "/api/v3/command", "/command", lambda *args: json_response(201, {"id": 1, "name": "EpisodeSearch"}))
+        self.route("GET", "/api/v3/rootfolder", "/rootfolder", self.get_root_folders)
+        self.route("GET", "/api/v3/diskspace", "/diskspace", self.get_disk_space)
+
+    @staticmethod
+    def __series_json(show):
+        seasons = sorted({episode.season for episode in show.episodes})
+        return {
+            "id": show.arr_id,
+            "title": show.title,
+            "tvdbId": show.tvdb_id,
+            "ended": show.ended,
+            "tags": show.tags,
+            "path": show.path,
+            "monitored": True,
+            "seasons": [{"seasonNumber": season, "monitored": True, "statistics": {"episodeCount": sum(1 for episode in show.episodes if episode.season == season)}} for season in seasons],
+            "statistics": {"sizeOnDisk": show.size, "episodeCount": len(show.episodes), "episodeFileCount": len(show.episodes)},
+        }
+
+    def get_all_series(self, match, query, headers, body):
+        """Handles GET /series."""
+        return json_response(200, [self.__series_json(show) for show in self.library.shows])
+
+    def get_series(self, match, query, headers, body):
+        """Handles GET /series/{id}."""
+        show = self.series.get(int(match.group(1)))
+        if show is None:
+            return json_response(404, {"message": "NotFound"})
+        return json_response(200, self.__series_json(show))
+
+    def put_series(self, match, query, headers, body):
+        """Handles PUT /series/{id}."""
+        return json_response(202, json.loads(body or b"{}"))
+
+    def get_tags(self, match, query, headers, body):
+        """Handles GET /tag."""
+        return json_response(200, [{"id": self.library.exempt_tag_id, "label": "exempt-from-auto-delete"}])
+
+    def get_episodes(self, match, query, headers, body):
+        """Handles GET /episode."""
+        show = self.series.get(int(query.get("seriesId", 0)))
+        if show is None:
+            return json_response(200, [])
+        return json_response(200, [{"id": episode.episode_id, "seriesId": show.arr_id, "seasonNumber": episode.season, "episodeNumber": episode.episode, "airDate": episode.air_date[:10], "airDateUtc": episode.air_date, "monitored": True, "hasFile": episode.has_file, "episodeFileId": episode.episode_id} for episode in show.episodes])
+
+    def get_root_folders(self, match, query, headers, body):
+        """Handles GET /rootfolder."""
+        return json_response(200, [{"id": 1, "path": "/data/tv", "freeSpace": 1024 ** 4}])
+
+    def get_disk_space(self, match, query, headers, body):
+        """Handles GET /diskspace."""
+        return json_response(200, [{"path": "/data", "label": "data", "freeSpace": 1024 ** 4, "totalSpace": 8 * 1024 ** 4}])
+
+
+class MockOverseerr(MockService):
+    """Mock of the Overseerr v1 endpoints used by OverseerrClient."""
+    name = "overseerr"
+
+    def __init__(self, library: SyntheticLibrary, latency: float = 0.0):
+        super().__init__(library, latency)
+        self.media = [{"id": index + 1, "mediaType": "movie", "tmdbId": movie.tmdb_id} for index, movie in enumerate(library.movies)]
+        self.media += [{"id": len(self.media) + index + 1, "mediaType": "tv", "tvdbId": show.tvdb_id} for index, show in enumerate(library.shows)]
+        self.route("GET", "/api/v1/media", "/media", self.get_media)
+        self.route("DELETE", r"/api/v1/media/(\d+)", "/media/{id}", lambda *args: (204, "application/json", b""))
+
+    def get_media(self, match, query, headers, body):
+        """Handles GET /media."""
+        take = int(query.get("take", 20))
+        skip = int(query.get("skip", 0))
+        return json_response(200, {"pageInfo": {"pages": -(-len(self.media) // take), "pageSize": take, "results": len(self.media)}, "results": self.media[skip:skip + take]})
+
+
+def start_server(service: MockService, host: str = "127.0.0.1", port: int = 0):
+    """
+    Starts a mock service on a background thread.
+
+    Returns:
+        ThreadingHTTPServer: The running server.
+    """
+    server = ThreadingHTTPServer((host, port), MockRequestHandler)
+    server.daemon_threads = True
+    server.service = service
+    threading.Thread(target=server.serve_forever, name=f"mock-{service.name}", daemon=True).start()
+    return server
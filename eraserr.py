@@ -1,5 +1,6 @@
 """eraserr.py: A script to remove expired media from Plex, Radarr, Sonarr, and Overseerr."""
 import argparse
+import sys
 from src.main import main
 
 __version__ = "2.2.2"
@@ -20,6 +21,21 @@ def add_arguments(arg_parser: argparse.ArgumentParser):
 
     arg_parser.add_argument("-d", "--dry-run", action="store_true", help="perform a trial run without any changes made")
 
+    arg_parser.add_argument("-o", "--once", action="store_true", help="run a single cycle and exit with a non-zero status if it failed")
+
+    arg_parser.add_argument(
+        "-p", "--profile", nargs="?", const="eraserr.prof", metavar="PATH", help="run a single cycle under cProfile and tracemalloc and write the CPU profile to PATH (default: eraserr.prof)"
+    )
+
+    plan_group = arg_parser.add_mutually_exclusive_group()
+    plan_group.add_argument("--plan", metavar="PATH", help="evaluate a single cycle without deleting anything and write the deletion plan to PATH")
+    plan_group.add_argument("--apply", metavar="PATH", help="execute the deletion plan at PATH without evaluating the Plex libraries again (ignores dry_run in the configuration, use --dry-run to preview)")
+    plan_group.add_argument("--snapshot", metavar="PATH", help="capture the Plex, Radarr, Sonarr and Overseerr data of a single cycle to PATH without deleting anything")
+    plan_group.add_argument("--replay", metavar="PATH", help="replay the deletion decisions of the snapshot at PATH offline and report what each threshold combination deletes")
+
+    arg_parser.add_argument("--watched-thresholds", metavar="LIST", help="comma separated watched deletion thresholds to replay (e.g. 30d,90d,180d, default: configured)")
+    arg_parser.add_argument("--unwatched-thresholds", metavar="LIST", help="comma separated unwatched deletion thresholds to replay (e.g. 14d,30d, default: configured)")
+
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Parse command line arguments")
@@ -27,6 +43,6 @@ if __name__ == "__main__":
     args = parser.parse_args()
 
     try:
-        main(args)
+        sys.exit(main(args))
     except KeyboardInterrupt:
         print("\nCtrl+C pressed. Stopping all checks")
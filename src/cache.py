@@ -0,0 +1,123 @@
+"""This module contains the TTL cache shared by the clients to avoid fetching slow-changing resources more than once."""
+import threading
+import time
+from src.metrics import CACHE_REQUESTS
+
+
+class _Flight:
+    """
+    A fetch in progress that concurrent callers of the same resource wait on.
+    """
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+        self.invalidated = False
+
+
+class Cache:
+    """
+    Class for caching resources with a per-resource time to live.
+
+    Concurrent or repeated requests for the same resource while it is being fetched share a single fetch.
+    """
+    def __init__(self, service: str, enabled: bool = True):
+        self.service = service
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.flights = {}
+
+    def get(self, key: str, loader, ttl: int):
+        """
+        Gets a resource from the cache, fetching it with the loader if it is missing or expired.
+
+        Args:
+            key: The name of the resource.
+            loader: A function without arguments that fetches the resource.
+            ttl: The number of seconds the fetched resource stays valid. 0 disables caching of the resource.
+
+        Returns:
+            The cached or fetched resource.
+        """
+        if not self.enabled or ttl <= 0:
+            return loader()
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                CACHE_REQUESTS.labels(self.service, key, "hit").inc()
+                return entry[1]
+
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self.flights[key] = flight
+
+        if not leader:
+            CACHE_REQUESTS.labels(self.service, key, "shared").inc()
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        CACHE_REQUESTS.labels(self.service, key, "miss").inc()
+        try:
+            flight.value = loader()
+        except BaseException as err:
+            flight.error = err
+            raise
+        finally:
+            with self.lock:
+                if flight.error is None and not flight.invalidated:
+                    self.entries[key] = (time.monotonic() + ttl, flight.value)
+                if self.flights.get(key) is flight:
+                    del self.flights[key]
+            flight.event.set()
+
+        return flight.value
+
+    def set(self, key: str, value, ttl: float):
+        """
+        Stores a resource that was obtained without the loader, such as from a snapshot.
+
+        Args:
+            key: The name of the resource.
+            value: The resource.
+            ttl: The number of seconds the resource stays valid.
+        """
+        with self.lock:
+            self.entries[key] = (time.monotonic() + ttl, value)
+            self.__detach_flight(key)
+
+    def update(self, key: str, func):
+        """
+        Applies a change made by one of our own writes to a cached resource, so it does not need to be fetched again.
+
+        A fetch of the resource that is in progress may have started before the write, so its result is not cached.
+
+        Args:
+            key: The name of the resource.
+            func: A function that takes the cached resource and returns the updated resource.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries[key] = (entry[0], func(entry[1]))
+            self.__detach_flight(key)
+
+    def invalidate(self, key: str = None):
+        """
+        Drops a resource, or every resource if no key is given, after one of our own writes changed it.
+        """
+        with self.lock:
+            keys = [key] if key is not None else list(self.entries.keys() | self.flights.keys())
+            for invalidated_key in keys:
+                self.entries.pop(invalidated_key, None)
+                self.__detach_flight(invalidated_key)
+
+    def __detach_flight(self, key: str):
+        flight = self.flights.pop(key, None)
+        if flight is not None:
+            flight.invalidated = True
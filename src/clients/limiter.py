@@ -0,0 +1,110 @@
+"""Module for the adaptive limiter that paces the requests sent to each service."""
+import threading
+import time
+from collections import deque
+from src.logger import logger
+from src.metrics import LIMITER_CONCURRENCY, LIMITER_DECREASES, LIMITER_RATE
+
+
+class AdaptiveLimiter:
+    """
+    Class for limiting the concurrency and rate of the requests sent to a service.
+
+    The limits follow additive increase, multiplicative decrease: every healthy response raises them a little,
+    while a 429, a 5xx, a connection error or a response slower than the latency target halves them. The
+    request rate is unlimited until the service first shows signs of overload.
+    """
+    def __init__(self, service: str, rate_limit):
+        self.service = service
+        self.min_concurrency = 1
+        self.max_concurrency = rate_limit.max_concurrency
+        self.max_rate = rate_limit.max_rate
+        self.min_rate = rate_limit.min_rate
+        self.latency_target = rate_limit.latency_target
+        self.concurrency = float(rate_limit.initial_concurrency)
+        self.rate = None
+        self.in_flight = 0
+        self.next_slot = 0.0
+        self.last_decrease = 0.0
+        self.started = deque(maxlen=1024)
+        self.condition = threading.Condition()
+        self.__update_metrics()
+
+    def acquire(self):
+        """
+        Waits until a request can be sent within the current concurrency and rate limits.
+        """
+        with self.condition:
+            while self.in_flight >= int(self.concurrency):
+                self.condition.wait()
+            self.in_flight += 1
+
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            if self.rate is not None:
+                self.next_slot = slot + 1 / self.rate
+            self.started.append(slot)
+
+        if slot > now:
+            time.sleep(slot - now)
+
+    def release(self, latency: float, status_code: int = None, retry_after: str = None):
+        """
+        Releases a request slot and adjusts the limits from the outcome of the request.
+
+        Args:
+            latency: The number of seconds the request took.
+            status_code: The status code of the response, or None if the request failed without a response.
+            retry_after: The Retry-After header of the response, if any.
+        """
+        with self.condition:
+            self.in_flight -= 1
+
+            if status_code is None:
+                self.__decrease("connection error", latency)
+            elif status_code == 429:
+                self.__decrease("429", latency)
+                if retry_after is not None and retry_after.isdigit():
+                    self.next_slot = max(self.next_slot, time.monotonic() + int(retry_after))
+            elif status_code >= 500:
+                self.__decrease(str(status_code), latency)
+            elif latency > self.latency_target:
+                self.__decrease("latency", latency)
+            else:
+                self.__increase()
+
+            self.condition.notify_all()
+
+    def __increase(self):
+        concurrency = int(self.concurrency)
+        self.concurrency = min(self.max_concurrency, self.concurrency + 1 / self.concurrency)
+        if int(self.concurrency) > concurrency:
+            logger.debug("[%s][LIMITER] Increasing concurrency to %s.", self.service.upper(), int(self.concurrency))
+
+        if self.rate is not None:
+            self.rate += 1 / self.rate
+            if self.rate >= self.max_rate:
+                self.rate = None
+                logger.info("[%s][LIMITER] Recovered. Request rate is no longer limited.", self.service.upper())
+
+        self.__update_metrics()
+
+    def __decrease(self, reason: str, latency: float):
+        now = time.monotonic()
+        # A burst of concurrent responses reports the same overload, so decrease at most once per round trip.
+        if now - self.last_decrease < max(latency, 1):
+            return
+
+        self.last_decrease = now
+        self.concurrency = max(self.min_concurrency, self.concurrency / 2)
+        self.rate = max(self.min_rate, (self.rate or self.__get_observed_rate(now)) / 2)
+        LIMITER_DECREASES.labels(self.service, reason).inc()
+        self.__update_metrics()
+        logger.info("[%s][LIMITER] Backing off after %s. Latency: %.2fs. Concurrency: %s. Rate: %.1f requests/s.", self.service.upper(), reason, latency, int(self.concurrency), self.rate)
+
+    def __get_observed_rate(self, now: float):
+        return float(sum(1 for started in self.started if started > now - 1))
+
+    def __update_metrics(self):
+        LIMITER_CONCURRENCY.labels(self.service).set(int(self.concurrency))
+        LIMITER_RATE.labels(self.service).set(self.rate or 0)
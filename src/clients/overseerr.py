@@ -1,19 +1,51 @@
 """Module for interacting with the Overseerr API."""
 import requests
 from retry import retry
+from src.cache import Cache
 from src.logger import logger
+from src.metrics import RetryLogger, CANDIDATES, record_failure
+from src.clients.session import create_session
+from src.profiling import span
 
 class OverseerrClient:
     """
     Class for interacting with the Overseerr API.
     """
     def __init__(self, config):
-        self.config = config
         self.api_key = config.overseerr.api_key
         self.base_url = config.overseerr.base_url
-        self.fetch_limit = config.overseerr.fetch_limit
+        self.session = create_session("overseerr", config.rate_limit)
+        self.cache = Cache("overseerr", config.cache.enabled)
+        self.apply_config(config, config.overseerr)
+
+    def get_connection(self):
+        """
+        Gets the settings used to connect to the instance. Changing them requires a new client.
+        """
+        return self.base_url, self.api_key
+
+    def close(self):
+        """
+        Closes the session of a client that is no longer used.
+        """
+        self.session.close()
+
+    def apply_config(self, config, instance):
+        """
+        Applies the settings of the instance that do not change how it is connected to.
+
+        The session and cache of the client are kept.
+        """
+        self.config = config
+        self.fetch_limit = instance.fetch_limit
+        self.cache.enabled = config.cache.enabled
+        self.media_ttl = config.cache.media_ttl
 
     def __get_media(self):
+        return self.cache.get("media", self.__fetch_media, self.media_ttl)
+
+    @span("overseerr.media")
+    def __fetch_media(self):
         url = f"{self.base_url}/media"
         headers = {"X-API-KEY": self.api_key}
         params = {"take": self.fetch_limit, "skip": 0}
@@ -21,7 +53,7 @@ class OverseerrClient:
         media_list = []
 
         for _ in range(1000):
-            response = requests.get(url, headers=headers, params=params, timeout=30)
+            response = self.session.get(url, headers=headers, params=params, timeout=30)
             if response.status_code != 200:
                 raise requests.exceptions.RequestException(f"{response.url} : {response.status_code} - {response.text}")
             
@@ -34,15 +66,27 @@ class OverseerrClient:
 
         return media_list
 
+    def get_snapshot(self):
+        """
+        Gets the media of the instance, so the requests that a deletion would remove can be replayed offline.
+
+        Returns:
+            list: The media of the instance.
+        """
+        return self.__get_media()
+
+    @span("overseerr.delete")
     def __delete_media(self, media_id: int):
         url = f"{self.base_url}/media/{media_id}"
         headers = {"X-API-KEY": self.api_key}
 
-        response = requests.delete(url, headers=headers, timeout=30)
+        response = self.session.delete(url, headers=headers, timeout=30)
         if response.status_code != 204:
             raise requests.exceptions.RequestException(f"{response.url} : {response.status_code} - {response.text}")
 
-    @retry(tries=3, delay=5)
+        self.cache.update("media", lambda media: [item for item in media if item.get("id") != media_id])
+
+    @retry(tries=3, delay=5, logger=RetryLogger("overseerr"))
     def get_and_delete_media(self, media_to_delete: dict, dry_run: bool = False):
         """
         Gets and deletes media with the given IDs from the Overseerr API.
@@ -71,11 +115,14 @@ class OverseerrClient:
                 if media_id_key and item.get(media_id_key) == int(media_id):
                     if dry_run:
                         logger.info("[OVERSEERR][DRY RUN] Would have deleted %s.", media_title)
+                        CANDIDATES.labels("overseerr", "deleted", dry_run).inc()
                         continue
 
                     try:
                         self.__delete_media(item.get("id"))
                         logger.info("[OVERSEERR] Deleted %s.", media_title)
+                        CANDIDATES.labels("overseerr", "deleted", dry_run).inc()
                     except requests.exceptions.RequestException as err:
                         logger.error("[OVERSEERR] Failed to delete %s. Error: %s", media_title, err)
+                        record_failure("overseerr", "delete")
                         continue
@@ -1,38 +1,113 @@
 """Module for interacting with Plex."""
+import ntpath
 import time
+from collections import defaultdict
 from datetime import datetime, timedelta
+from functools import cached_property
 from plexapi.server import PlexServer
 from plexapi.exceptions import NotFound
 from retry import retry
+from src.cache import Cache
 from src.logger import logger
 from src.models.dynamicmedia import DynamicMedia
+from src.models.mediastate import MediaState
+from src.models.snapshotmedia import SnapshotMedia
+from src.metrics import RetryLogger, CANDIDATES
+from src.clients.plexdatabase import PlexDatabase
+from src.clients.session import create_session
+from src.profiling import advance_progress, span, start_progress
+from src.state import StateStore, compute_next_expiry
+
+SCAN_POLL_INTERVAL = 5
+SCAN_START_POLL_INTERVAL = 1
+SCAN_START_GRACE_PERIOD = 30
 
 
 class PlexClient:
     """Client for interacting with Plex."""
 
-    def __init__(self, config):
+    def __init__(self, config, plex_config=None, state_path=None):
+        plex_config = plex_config or config.plex
+        self.config = config
+        self.name = plex_config.name
+        self.base_url = plex_config.base_url
+        self.token = plex_config.token
+        self.state = StateStore(state_path or config.state.path) if config.state.enabled else None
+        self.cache = Cache(self.name, config.cache.enabled)
+        self.walk_progress = {}
+        self.apply_config(config, plex_config)
+
+    def get_connection(self):
+        """
+        Gets the settings used to connect to the server. Changing them requires a new client.
+        """
+        return self.base_url, self.token
+
+    def apply_config(self, config, plex_config):
+        """
+        Applies the settings that do not change how the server is connected to.
+
+        The connection, cache and state store of the client are kept.
+        """
         self.config = config
-        self.base_url = config.plex.base_url
-        self.token = config.plex.token
-        self.plex = PlexServer(self.base_url, self.token, timeout=60)
+        self.cache.enabled = config.cache.enabled
+        self.sections_ttl = config.cache.sections_ttl
+        self.database = PlexDatabase(plex_config.database_path) if plex_config.database_path else None
+
+    @cached_property
+    def plex(self):
+        """
+        The connection to the Plex server, established on first use.
+        """
+        return PlexServer(self.base_url, self.token, session=self.session, timeout=60)
+
+    @cached_property
+    def session(self):
+        """
+        The HTTP session of the connection, created on first use.
+        """
+        return create_session(self.name, self.config.rate_limit)
+
+    def close(self):
+        """
+        Closes the session and the state store of a client that is no longer used.
+        """
+        if "session" in self.__dict__:
+            self.session.close()
+        if self.state is not None:
+            self.state.close()
 
+    @span("plex.sections")
     def __get_media(self, section_type):
         sections = self.__get_sections_by_type(section_type)
 
         media_list = []
         for section in sections:
             for media in section.all():
-                media_list.append(media)
+                media_list.append((section.title, media))
 
         return media_list
 
     def __get_sections_by_type(self, section_type):
-        return [section for section in self.plex.library.sections() if section.type == section_type]
+        sections = self.cache.get("sections", self.plex.library.sections, self.sections_ttl)
+        return [section for section in sections if section.type == section_type]
+
+    def has_section(self, section_type, title):
+        """
+        Checks whether the server has a library section of the given type and title.
+        """
+        return any(section.title == title for section in self.__get_sections_by_type(section_type))
 
     def __get_episode_sessions(self):
         return [session for session in self.plex.sessions() if session.type == "episode"]
 
+    def get_stream_count(self):
+        """
+        Gets the number of movies and episodes currently being streamed, whether transcoded or played directly.
+        """
+        return sum(1 for session in self.plex.sessions() if session.type in ("movie", "episode"))
+
+    @span("plex.series_by_guid")
     def __get_series_by_guid(self, series_guid):
         sections = self.__get_sections_by_type("show")
         for section in sections:
@@ -62,31 +137,110 @@ class PlexClient:
 
         return episodes_to_check
 
-    def __media_is_expired(self, media, watched_media_expiry_seconds, unwatched_media_expiry_seconds, schedule_interval):
-        current_time = time.time()
-        watched_media_expiry_date = datetime.fromtimestamp(current_time - watched_media_expiry_seconds)
-        unwatched_media_expiry_date = datetime.fromtimestamp(current_time - unwatched_media_expiry_seconds)
-        min_date = datetime.now() - timedelta(seconds=max(watched_media_expiry_seconds, unwatched_media_expiry_seconds)) - timedelta(seconds=schedule_interval * 3)
+    def __get_media_signature(self, media):
+        signature = [media.addedAt, media.updatedAt, media.viewCount]
+        if media.type == "show":
+            signature.extend([media.leafCount, media.viewedLeafCount])
+
+        return "|".join(str(value) for value in signature)
+
+    @staticmethod
+    def __get_history_min_date(thresholds, schedule_interval):
+        return datetime.now() - timedelta(seconds=max(max(threshold) for threshold in thresholds)) - timedelta(seconds=schedule_interval * 3)
+
+    def __get_media_state(self, media, thresholds, schedule_interval, section=None):
+        min_date = self.__get_history_min_date(thresholds, schedule_interval)
 
         added_at = media.addedAt if media.addedAt else datetime.fromtimestamp(0)
         if media.type == "show":
-            added_at = max(episode.addedAt for episode in media.episodes()) if media.episodes() else added_at
-        history = media.history(mindate=min_date)
+            with span("plex.episodes"):
+                episodes = media.episodes()
+            added_at = max(episode.addedAt for episode in episodes) if episodes else added_at
+        with span("plex.history"):
+            history = media.history(mindate=min_date)
         watched_date = max(entry.viewedAt for entry in history) if history else None
 
-        if watched_date is None and added_at < unwatched_media_expiry_date:
-            logger.info("[PLEX] %s is unwatched and expired. Added at %s. Expired at %s.", media.title, added_at, datetime.fromtimestamp(added_at.timestamp() + unwatched_media_expiry_seconds))
-            return True
+        return MediaState(media, added_at, watched_date, self.name, section or getattr(media, "librarySectionTitle", None))
+
+    def __store_media_states(self, media_states, thresholds):
+        """
+        Stores the evaluated watch state of the given items in the state store, in a single transaction.
+        """
+        if self.state is None or not media_states:
+            return
+
+        watched_media_expiry_seconds = min(watched for watched, _ in thresholds)
+        unwatched_media_expiry_seconds = min(unwatched for _, unwatched in thresholds)
+        rows = []
+        for media_state in media_states:
+            media = media_state.media
+            added_at = media_state.added_at.timestamp()
+            last_watched = media_state.watched_date.timestamp() if media_state.watched_date else None
+            next_expiry = compute_next_expiry(added_at, last_watched, watched_media_expiry_seconds, unwatched_media_expiry_seconds)
+            rows.append((media.ratingKey, media.type, media.title, self.__get_media_signature(media), added_at, last_watched, next_expiry))
+
+        self.state.update_many(rows)
+
+    def __get_database_media_states(self, section_type, thresholds, schedule_interval, rating_keys=None):
+        """
+        Reads the watch state of the given items, or of every item, from the Plex database.
+
+        Every item is evaluated, as the whole library is read at once. The items hold everything the deletion
+        pipelines need, so they are never reloaded from the API.
+        """
+        watched_media_expiry_seconds = min(watched for watched, _ in thresholds)
+        unwatched_media_expiry_seconds = min(unwatched for _, unwatched in thresholds)
+        min_date = self.__get_history_min_date(thresholds, schedule_interval)
+
+        with span("plex.database"):
+            rows = self.database.get_media(section_type, min_date.timestamp(), rating_keys)
+
+        stored_states = self.state.get_watch_states(section_type) if self.state is not None else {}
+        state_rows = []
+        media_states = []
+        for row in rows:
+            added_at = datetime.fromtimestamp(row["added_at"])
+            watched_date = datetime.fromtimestamp(row["last_watched"]) if row["last_watched"] is not None else None
+
+            # Only items whose watch state changed are written. The listing signature is not read from the database, so
+            # switching back to the API re-evaluates every item written here once.
+            if self.state is not None and stored_states.get(str(row["rating_key"])) != (row["added_at"], row["last_watched"]):
+                next_expiry = compute_next_expiry(row["added_at"], row["last_watched"], watched_media_expiry_seconds, unwatched_media_expiry_seconds)
+                state_rows.append((row["rating_key"], section_type, row["title"], None, row["added_at"], row["last_watched"], next_expiry))
+
+            media_state = MediaState(SnapshotMedia(row), added_at, watched_date, self.name, row["section"])
+            media_state.reloaded = True
+            media_states.append(media_state)
 
-        if watched_date is not None and watched_date < watched_media_expiry_date:
-            logger.info("[PLEX] %s is watched and expired. Added at %s. Watched at %s. Expired at %s.", media.title, added_at, watched_date, datetime.fromtimestamp(watched_date.timestamp() + watched_media_expiry_seconds))
+        if state_rows:
+            self.state.update_many(state_rows)
+
+        return media_states
+
+    def __media_is_due(self, media, thresholds):
+        if self.state is None:
             return True
-        
-        return False
+
+        watched_media_expiry_seconds = min(watched for watched, _ in thresholds)
+        unwatched_media_expiry_seconds = min(unwatched for _, unwatched in thresholds)
+
+        return self.state.is_due(media.ratingKey, self.__get_media_signature(media), watched_media_expiry_seconds, unwatched_media_expiry_seconds)
+
+    @staticmethod
+    def __may_be_expired(media_state, thresholds):
+        """
+        Checks whether an item evaluated by a previous walk could have expired since, under the given thresholds.
+        """
+        watched_media_expiry_seconds = min(watched for watched, _ in thresholds)
+        unwatched_media_expiry_seconds = min(unwatched for _, unwatched in thresholds)
+        last_watched = media_state.watched_date.timestamp() if media_state.watched_date else None
+
+        return compute_next_expiry(media_state.added_at.timestamp(), last_watched, watched_media_expiry_seconds, unwatched_media_expiry_seconds) <= time.time()
 
     def __media_is_unloadable(self, media, session, watched_media_expiry_seconds):
         min_date = datetime.now() - timedelta(seconds=watched_media_expiry_seconds)
-        history = media.history(mindate=min_date)
+        with span("plex.history"):
+            history = media.history(mindate=min_date)
         for entry in history:
             if entry.accountID != session.user.id:
                 logger.debug("[PLEX][DYNAMIC LOAD] %s has been watched by a different user. It should not be unloaded.", media.grandparentTitle)
@@ -94,30 +248,222 @@ class PlexClient:
 
         return True
 
-    @retry(tries=3, delay=5)
-    def get_expired_media(self, section_type, watched_media_expiry_seconds, unwatched_media_expiry_seconds, schedule_interval):
+    @staticmethod
+    def reload_media(media_state):
         """
-        Retrieves a list of expired media.
-        
+        Reloads the full metadata of a media item once, no matter how many instances it is routed to.
+        """
+        if media_state.reloaded:
+            return
+
+        with span("plex.reload"):
+            media_state.media.reload()
+        media_state.reloaded = True
+
+    @retry(tries=3, delay=5, logger=RetryLogger("plex"))
+    def get_media_states(self, section_type, thresholds, schedule_interval, deadline: float = None):
+        """
+        Retrieves the watch state of every media item that could be expired under any of the given thresholds.
+
+        A walk that reaches the deadline stops and keeps the items it evaluated. The next walk only re-evaluates
+        those of them that could have expired in the meantime.
+
         Args:
             section_type: The type of media to retrieve.
-            watched_media_expiry_seconds: The number of seconds after which watched media is considered expired.
-            unwatched_media_expiry_seconds: The number of seconds after which unwatched media is considered expired.
-            
+            thresholds: A list of (watched_media_expiry_seconds, unwatched_media_expiry_seconds) tuples, one per
+            instance the media may be deleted from.
+            schedule_interval: The number of seconds between runs.
+            deadline: The timestamp at which the walk stops. Defaults to no deadline.
+
         Returns:
-            List[PlexMedia]: A list of PlexMedia objects representing the expired media.
+            List[MediaState]: A list of MediaState objects representing every media item, or None if the walk
+            reached the deadline. Items that the state store proves are not yet due are not evaluated and have no
+            added or watched date.
         """
+        if self.database is not None:
+            media_states = self.__get_database_media_states(section_type, thresholds, schedule_interval)
+            if self.state is not None:
+                self.state.prune(section_type, [media_state.media.ratingKey for media_state in media_states])
+            CANDIDATES.labels(self.name, "evaluated", self.config.dry_run).inc(len(media_states))
+            logger.debug("[PLEX][DATABASE] Read %s %s items from the database.", len(media_states), section_type)
+            return media_states
+
         media = self.__get_media(section_type)
-        expired_media = []
+        media_states = []
+        evaluated_count = 0
+
+        if self.state is not None:
+            pruned_count = self.state.prune(section_type, [item.ratingKey for _, item in media])
+            logger.debug("[PLEX][STATE] Pruned %s %s items no longer in Plex.", pruned_count, section_type)
+
+        progress = self.walk_progress.setdefault(section_type, {})
+        step = f"{self.name}.{section_type}"
+        start_progress(step, len(media))
+        # The evaluated items are stored once per walk, including a walk that pauses or fails part way.
+        evaluated_media_states = []
+        try:
+            for section, item in media:
+                advance_progress(step)
+                if deadline is not None and time.time() >= deadline:
+                    CANDIDATES.labels(self.name, "evaluated", self.config.dry_run).inc(evaluated_count)
+                    logger.info("[PLEX][OFF-PEAK] Pausing the walk of %s items after %s of %s items.", section_type, len(media_states), len(media))
+                    return None
+
+                if not self.__media_is_due(item, thresholds):
+                    media_states.append(MediaState(item, None, None, self.name, section))
+                    continue
+
+                media_state = progress.get(item.ratingKey)
+                if media_state is None or self.__may_be_expired(media_state, thresholds):
+                    evaluated_count += 1
+                    media_state = self.__get_media_state(item, thresholds, schedule_interval, section)
+                    progress[item.ratingKey] = media_state
+                    evaluated_media_states.append(media_state)
+                media_states.append(media_state)
+        finally:
+            self.__store_media_states(evaluated_media_states, thresholds)
+
+        self.walk_progress.pop(section_type, None)
+        CANDIDATES.labels(self.name, "evaluated", self.config.dry_run).inc(evaluated_count)
+
+        if self.state is not None:
+            logger.info("[PLEX][STATE] Total %s items: %s. Items evaluated: %s. Items skipped: %s.", section_type, len(media), evaluated_count, len(media) - evaluated_count)
+
+        return media_states
+
+    @retry(tries=3, delay=5, logger=RetryLogger("plex"))
+    def get_media_states_by_keys(self, section_type, rating_keys, thresholds, schedule_interval):
+        """
+        Re-validates the watch state of the given items.
+
+        Args:
+            section_type: The type of media to retrieve.
+            rating_keys: The Plex rating keys of the items to re-validate.
+            thresholds: A list of (watched_media_expiry_seconds, unwatched_media_expiry_seconds) tuples.
+            schedule_interval: The number of seconds between runs.
+
+        Returns:
+            List[MediaState]: A list of MediaState objects representing the items that still exist.
+        """
+        if self.database is not None:
+            media_states = self.__get_database_media_states(section_type, thresholds, schedule_interval, rating_keys)
+            missing_rating_keys = {str(rating_key) for rating_key in rating_keys} - {str(media_state.media.ratingKey) for media_state in media_states}
+            if missing_rating_keys and self.state is not None:
+                logger.debug("[PLEX][STATE] %s items no longer exist in Plex.", len(missing_rating_keys))
+                self.state.remove(list(missing_rating_keys))
+            return media_states
+
+        media_states = []
+
+        for rating_key in rating_keys:
+            try:
+                item = self.plex.fetchItem(int(rating_key))
+            except NotFound:
+                logger.debug("[PLEX][STATE] Item %s no longer exists in Plex.", rating_key)
+                if self.state is not None:
+                    self.state.remove([rating_key])
+                continue
+
+            if item.type != section_type:
+                continue
+
+            media_state = self.__get_media_state(item, thresholds, schedule_interval)
+            media_state.reloaded = True
+            media_states.append(media_state)
 
-        for item in media:
-            if self.__media_is_expired(item, watched_media_expiry_seconds, unwatched_media_expiry_seconds, schedule_interval):
-                item.reload()
-                expired_media.append(item)
+        self.__store_media_states(media_states, thresholds)
 
-        return expired_media
+        return media_states
+
+    @staticmethod
+    def get_folder(section_type, location):
+        """
+        Gets the folder of a deleted item from one of its Plex locations. Movies are located by their files and
+        series by their folders.
+        """
+        # ntpath splits on both separators, so this also works for Plex servers that run on Windows.
+        return ntpath.dirname(location) if section_type == "movie" else location
+
+    def scan_folders(self, folders, empty_trash: bool, timeout: int):
+        """
+        Scans the given folders so Plex removes the items that were deleted from them, waits for the scans to
+        finish and empties the trash of the scanned sections.
+
+        Every folder is scanned once, in the library section whose location contains it.
+
+        Args:
+            folders: The folders, as seen by Plex, that items were deleted from.
+            empty_trash: Whether to empty the trash of the scanned sections once the scans finished.
+            timeout: The number of seconds to wait for the scans to finish.
+
+        Returns:
+            bool: True if the scans finished within the timeout.
+        """
+        sections = self.__get_sections_by_type("movie") + self.__get_sections_by_type("show")
+        folders_by_section = defaultdict(set)
+        for folder in folders:
+            section = next((section for section in sections if any(self.__location_contains(location, folder) for location in section.locations)), None)
+            if section is None:
+                logger.warning("[PLEX][SCAN] No library section contains %s. It will be removed at the next scheduled scan.", folder)
+                continue
+
+            folders_by_section[section].add(folder)
+
+        if not folders_by_section:
+            return True
+
+        for section, section_folders in folders_by_section.items():
+            logger.info("[PLEX][SCAN] Scanning %s folders of %s.", len(section_folders), section.title)
+            for folder in sorted(section_folders):
+                with span("plex.scan"):
+                    section.update(path=folder)
+
+        finished = self.__wait_for_scans([section.key for section in folders_by_section], timeout)
+        if not finished:
+            logger.warning("[PLEX][SCAN] The scans did not finish within %s seconds. Not emptying the trash.", timeout)
+            return False
+
+        if empty_trash:
+            for section in folders_by_section:
+                logger.info("[PLEX][SCAN] Emptying the trash of %s.", section.title)
+                with span("plex.empty_trash"):
+                    section.emptyTrash()
+
+        return True
+
+    @staticmethod
+    def __location_contains(location, folder):
+        root = location.rstrip("/\\")
+        return folder.startswith(root) and folder[len(root):len(root) + 1] in ("/", "\\")
+
+    def __wait_for_scans(self, section_keys, timeout: int):
+        """
+        Waits until the scans of the given sections finished.
+
+        The scans are queued rather than started by the request, so a section that is not refreshing yet only counts
+        as scanned once a section was seen refreshing, or once the grace period for the scans to start has passed.
+        """
+        started = time.monotonic()
+        deadline = started + timeout
+        grace_end = started + min(SCAN_START_GRACE_PERIOD, timeout)
+        refreshing_seen = False
+        while True:
+            interval = SCAN_POLL_INTERVAL if refreshing_seen else SCAN_START_POLL_INTERVAL
+            time.sleep(min(interval, max(deadline - time.monotonic(), 0)))
+            with span("plex.sections"):
+                sections = self.plex.library.sections()
+            if any(section.refreshing for section in sections if section.key in section_keys):
+                refreshing_seen = True
+            elif refreshing_seen:
+                return True
+            elif time.monotonic() >= grace_end:
+                logger.debug("[PLEX][SCAN] No scan was seen running within %s seconds. Assuming the scans finished.", SCAN_START_GRACE_PERIOD)
+                return True
+
+            if time.monotonic() >= deadline:
+                return False
 
-    @retry(tries=3, delay=5)
+    @retry(tries=3, delay=5, logger=RetryLogger("plex"))
     def get_dynamic_load_media(self, watched_media_expiry_seconds):
         """
         Retrieves a list of media that should be dynamically loaded.
@@ -144,7 +490,8 @@ class PlexClient:
                     unload_media = False
                     break
 
-            series.reload()
+            with span("plex.reload"):
+                series.reload()
             media_to_load.append(DynamicMedia(series, unload_media, current_season, current_episode))
 
         return media_to_load
@@ -0,0 +1,171 @@
+"""Module for reading the library and watch history of a Plex server directly from its SQLite database."""
+import re
+import sqlite3
+from collections import defaultdict
+from contextlib import closing
+from pathlib import Path
+
+SECTION_TYPES = {"movie": 1, "show": 2}
+METADATA_TYPES = {"movie": 1, "show": 2, "season": 3, "episode": 4}
+LABEL_TAG_TYPE = 11
+GUID_TAG_TYPE = 314
+
+
+class PlexDatabase:
+    """
+    Class for reading the items of a Plex library from a read-only copy or snapshot of its database.
+
+    Every item is read with a handful of queries that each cover a whole library type, in place of the listings,
+    episodes and history requests of the API. Rows have the same shape as the rows of a MediaSnapshot, so they can
+    be wrapped in a SnapshotMedia.
+    """
+    def __init__(self, path: str):
+        self.path = path
+
+    def __connect(self):
+        # The database is never written to, and opening it read-only also keeps Plex's own locks untouched.
+        return closing(sqlite3.connect(f"{Path(self.path).absolute().as_uri()}?mode=ro", uri=True))
+
+    def get_media(self, section_type: str, min_viewed_at: float, rating_keys=None):
+        """
+        Reads every item of the given type with its newest addition, its newest view and its files.
+
+        Args:
+            section_type: The type of media to read, movie or show.
+            min_viewed_at: The timestamp after which views are taken into account.
+            rating_keys: The rating keys of the items to read. Defaults to every item.
+
+        Returns:
+            list: One row per item, with the timestamp it (or its newest episode) was added and was last watched.
+        """
+        with self.__connect() as connection:
+            items = self.__get_items(connection, section_type, rating_keys)
+            if not items:
+                return []
+
+            added_at = self.__get_episode_added_at(connection) if section_type == "show" else {}
+            locations, sizes = self.__get_files(connection, section_type)
+            guids, labels = self.__get_tags(connection, section_type)
+            last_watched = self.__get_last_watched(connection, section_type, min_viewed_at)
+
+        rows = []
+        for rating_key, guid, title, item_added_at, section in items:
+            rows.append({
+                "section": section,
+                "rating_key": rating_key,
+                "guid": guid,
+                "type": section_type,
+                "title": title,
+                "guids": guids.get(rating_key, []),
+                "labels": labels.get(rating_key, []),
+                "locations": locations.get(rating_key, []),
+                "added_at": added_at.get(rating_key) or item_added_at or 0,
+                "last_watched": last_watched.get(guid),
+                "size": sizes.get(rating_key, 0),
+            })
+
+        return rows
+
+    @staticmethod
+    def __get_items(connection, section_type, rating_keys):
+        query = (
+            "SELECT items.id, items.guid, items.title, items.added_at, sections.name FROM metadata_items items "
+            "JOIN library_sections sections ON items.library_section_id = sections.id "
+            "WHERE items.metadata_type = ? AND sections.section_type = ?"
+        )
+        parameters = [METADATA_TYPES[section_type], SECTION_TYPES[section_type]]
+        if rating_keys is not None:
+            query += f" AND items.id IN ({','.join('?' * len(rating_keys))})"
+            parameters.extend(int(rating_key) for rating_key in rating_keys)
+
+        return connection.execute(query, parameters).fetchall()
+
+    @staticmethod
+    def __get_episode_added_at(connection):
+        return dict(connection.execute(
+            "SELECT seasons.parent_id, MAX(episodes.added_at) FROM metadata_items episodes "
+            "JOIN metadata_items seasons ON episodes.parent_id = seasons.id "
+            "WHERE episodes.metadata_type = ? GROUP BY seasons.parent_id",
+            (METADATA_TYPES["episode"],),
+        ).fetchall())
+
+    def __get_files(self, connection, section_type):
+        """
+        Gets the locations and the size of every item, as the API lists them.
+
+        Movies are located by their files. Series are located by their folders, which are the top level folders of
+        their episode files within a library location, and list no size.
+        """
+        locations = defaultdict(list)
+        sizes = defaultdict(int)
+
+        if section_type == "movie":
+            files = connection.execute(
+                "SELECT media.metadata_item_id, parts.file, parts.size FROM media_parts parts "
+                "JOIN media_items media ON parts.media_item_id = media.id "
+                "JOIN metadata_items items ON media.metadata_item_id = items.id "
+                "WHERE items.metadata_type = ? ORDER BY media.id, parts.id",
+                (METADATA_TYPES["movie"],),
+            )
+            for rating_key, file, size in files:
+                locations[rating_key].append(file)
+                sizes[rating_key] += size or 0
+
+            return locations, sizes
+
+        roots = defaultdict(list)
+        for section_id, root_path in connection.execute("SELECT library_section_id, root_path FROM section_locations"):
+            roots[section_id].append(root_path.rstrip("/\\"))
+
+        files = connection.execute(
+            "SELECT seasons.parent_id, episodes.library_section_id, parts.file FROM media_parts parts "
+            "JOIN media_items media ON parts.media_item_id = media.id "
+            "JOIN metadata_items episodes ON media.metadata_item_id = episodes.id "
+            "JOIN metadata_items seasons ON episodes.parent_id = seasons.id "
+            "WHERE episodes.metadata_type = ? ORDER BY media.id, parts.id",
+            (METADATA_TYPES["episode"],),
+        )
+        for rating_key, section_id, file in files:
+            folder = self.__get_series_folder(roots[section_id], file)
+            if folder is not None and folder not in locations[rating_key]:
+                locations[rating_key].append(folder)
+
+        return locations, sizes
+
+    @staticmethod
+    def __get_series_folder(roots, file):
+        for root in roots:
+            if file.startswith(root) and file[len(root):len(root) + 1] in ("/", "\\"):
+                # Split on both separators, so this also works for Plex servers that run on Windows.
+                components = re.split(r"[/\\]", file[len(root) + 1:], maxsplit=1)
+                return f"{root}{file[len(root)]}{components[0]}" if len(components) > 1 else None
+
+        return None
+
+    @staticmethod
+    def __get_tags(connection, section_type):
+        guids = defaultdict(list)
+        labels = defaultdict(list)
+        tags = connection.execute(
+            "SELECT taggings.metadata_item_id, tags.tag_type, tags.tag FROM taggings "
+            "JOIN tags ON taggings.tag_id = tags.id "
+            "JOIN metadata_items items ON taggings.metadata_item_id = items.id "
+            "WHERE items.metadata_type = ? AND tags.tag_type IN (?, ?) ORDER BY taggings.id",
+            (METADATA_TYPES[section_type], GUID_TAG_TYPE, LABEL_TAG_TYPE),
+        )
+        for rating_key, tag_type, tag in tags:
+            (guids if tag_type == GUID_TAG_TYPE else labels)[rating_key].append(tag)
+
+        return guids, labels
+
+    @staticmethod
+    def __get_last_watched(connection, section_type, min_viewed_at):
+        # Views are kept by GUID, so they survive items being re-added. Episodes are counted towards their series.
+        if section_type == "movie":
+            query = "SELECT guid, MAX(viewed_at) FROM metadata_item_views WHERE metadata_type = ? AND viewed_at > ? GROUP BY guid"
+            metadata_type = METADATA_TYPES["movie"]
+        else:
+            query = "SELECT grandparent_guid, MAX(viewed_at) FROM metadata_item_views WHERE metadata_type = ? AND viewed_at > ? GROUP BY grandparent_guid"
+            metadata_type = METADATA_TYPES["episode"]
+
+        return dict(connection.execute(query, (metadata_type, int(min_viewed_at))).fetchall())
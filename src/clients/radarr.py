@@ -1,50 +1,245 @@
 """Radarr API client."""
+import math
 import requests
 from retry import retry
+from src.cache import Cache
 from src.logger import logger
+from src.metrics import RetryLogger, CANDIDATES, BYTES_FREED, record_failure
+from src.clients.session import create_session
+from src.clients.throttle import DeletionThrottle
+from src.models.volume import Volume, get_volume
+from src.profiling import advance_progress, span, start_progress
 from src.util import convert_bytes
 
 class RadarrClient:
     """Class for interacting with the Radarr API."""
-    def __init__(self, config):
+    def __init__(self, config, instance=None, throttle=None):
+        instance = instance or config.radarr
+        self.name = instance.name
+        self.api_key = instance.api_key
+        self.base_url = instance.base_url
+        self.session = create_session(self.name, config.rate_limit)
+        self.cache = Cache(self.name, config.cache.enabled)
+        self.throttle = throttle or DeletionThrottle(config.deletion_throttle)
+        self.volumes = None
+        self.apply_config(config, instance)
+
+    def get_connection(self):
+        """
+        Gets the settings used to connect to the instance. Changing them requires a new client.
+        """
+        return self.base_url, self.api_key
+
+    def close(self):
+        """
+        Closes the session of a client that is no longer used.
+        """
+        self.session.close()
+
+    def apply_config(self, config, instance):
+        """
+        Applies the settings of the instance that do not change how it is connected to.
+
+        The session and cache of the client are kept.
+        """
         self.config = config
-        self.api_key = config.radarr.api_key
-        self.base_url = config.radarr.base_url
-        self.exempt_tag_names = config.radarr.exempt_tag_names
+        self.cache.enabled = config.cache.enabled
+        self.media_ttl = config.cache.media_ttl
+        self.tags_ttl = config.cache.tags_ttl
+        self.root_folders = instance.root_folders
+        self.route_tag_names = instance.route_tag_names
+        self.watched_deletion_threshold = instance.watched_deletion_threshold
+        self.unwatched_deletion_threshold = instance.unwatched_deletion_threshold
+        self.section_thresholds = {section: (thresholds.watched_deletion_threshold, thresholds.unwatched_deletion_threshold) for section, thresholds in instance.section_thresholds.items()}
+        self.exempt_tag_names = instance.exempt_tag_names
 
     def __get_media(self):
+        return self.cache.get("movies", self.__fetch_media, self.media_ttl)
+
+    @span("radarr.movies")
+    def __fetch_media(self):
         url = f"{self.base_url}/movie"
         headers = {"X-Api-Key": self.api_key}
 
-        response = requests.get(url, headers=headers, timeout=30)
+        response = self.session.get(url, headers=headers, timeout=30)
         if response.status_code != 200:
             raise requests.exceptions.RequestException(f"{response.url} : {response.status_code} - {response.text}")
 
         return response.json()
 
-    def __get_exempt_tag_ids(self, tag_names: list):
+    def __get_tags(self):
+        return self.cache.get("tags", self.__fetch_tags, self.tags_ttl)
+
+    @span("radarr.tags")
+    def __fetch_tags(self):
         url = f"{self.base_url}/tag"
         headers = {"X-Api-Key": self.api_key}
 
-        response = requests.get(url, headers=headers, timeout=30)
+        response = self.session.get(url, headers=headers, timeout=30)
         if response.status_code != 200:
             raise requests.exceptions.RequestException(f"{response.url} : {response.status_code} - {response.text}")
 
-        tags = response.json()
-        tag_ids = [tag["id"] for tag in tags if tag["label"] in tag_names]
+        return response.json()
+
+    @retry(tries=3, delay=5, logger=RetryLogger("radarr"))
+    def __get_media_and_tags(self):
+        return self.__get_media(), self.__get_tags()
+
+    def __get_tag_ids(self, tags: list, tag_names: list):
+        return [tag["id"] for tag in tags if tag["label"] in tag_names]
+
+    def __is_routed(self, item, route_tag_ids: list):
+        if not self.route_tag_names:
+            return True
+
+        return any(tag in route_tag_ids for tag in item.get("tags", []))
+
+    def get_snapshot(self):
+        """
+        Gets the media and tags that deletion decisions are based on, so they can be replayed offline.
+
+        Returns:
+            dict: The media and tags of the instance.
+        """
+        return {"media": self.__get_media(), "tags": self.__get_tags()}
+
+    def load_snapshot(self, snapshot: dict):
+        """
+        Serves the media and tags of a snapshot written by get_snapshot instead of fetching them from the API.
+
+        Args:
+            snapshot: The snapshot of the instance.
+        """
+        self.cache.enabled = True
+        self.media_ttl = self.tags_ttl = math.inf
+        self.cache.set("movies", snapshot["media"], math.inf)
+        self.cache.set("tags", snapshot["tags"], math.inf)
+
+    @retry(tries=3, delay=5, logger=RetryLogger("radarr"))
+    def get_media_ids(self):
+        """
+        Gets the TMDB IDs of the movies held by this instance.
+
+        Returns:
+            set: The IDs as strings, matching the keys of the media passed to get_and_delete_media.
+
+        Raises:
+            requests.exceptions.RequestException: If the API request fails.
+        """
+        return {str(item.get("tmdbId")) for item in self.__get_media() if item.get("tmdbId") is not None}
+
+    def owns_locations(self, locations: list):
+        """
+        Checks whether media stored at the given Plex locations belongs to this instance.
 
-        return tag_ids
+        An instance without root folders accepts media from any location.
 
-    def __delete_media(self, media_id: int):
+        Args:
+            locations: The file or folder paths of the media as seen by Plex.
+
+        Returns:
+            bool: True if the media should be routed to this instance.
+        """
+        if not self.root_folders:
+            return True
+
+        return any(location.startswith(root_folder.rstrip("/") + "/") for location in locations for root_folder in self.root_folders)
+
+    @span("radarr.rootfolders")
+    def __fetch_root_folders(self):
+        url = f"{self.base_url}/rootfolder"
+        headers = {"X-Api-Key": self.api_key}
+
+        response = self.session.get(url, headers=headers, timeout=30)
+        if response.status_code != 200:
+            raise requests.exceptions.RequestException(f"{response.url} : {response.status_code} - {response.text}")
+
+        return response.json()
+
+    @span("radarr.diskspace")
+    def __fetch_disk_space(self):
+        url = f"{self.base_url}/diskspace"
+        headers = {"X-Api-Key": self.api_key}
+
+        response = self.session.get(url, headers=headers, timeout=30)
+        if response.status_code != 200:
+            raise requests.exceptions.RequestException(f"{response.url} : {response.status_code} - {response.text}")
+
+        return response.json()
+
+    @retry(tries=3, delay=5, logger=RetryLogger("radarr"))
+    def get_volumes(self):
+        """
+        Gets the disks that the root folders of the instance are stored on.
+
+        A root folder is stored on the listed disk with the longest path that contains it. A root folder on a disk
+        that is not listed, such as a network share, counts as a disk of its own if its total space is known.
+
+        Returns:
+            List[dict]: The path, free space and total space of every disk, as seen by the instance.
+
+        Raises:
+            requests.exceptions.RequestException: If the API request fails.
+        """
+        disks = [Volume(disk["path"], disk.get("freeSpace", 0), disk["totalSpace"], 0) for disk in self.__fetch_disk_space() if disk.get("totalSpace")]
+        volumes = {}
+
+        for root_folder in self.__fetch_root_folders():
+            volume = get_volume(disks, root_folder.get("path"))
+            if volume is None and root_folder.get("totalSpace"):
+                volume = Volume(root_folder["path"], root_folder.get("freeSpace", 0), root_folder["totalSpace"], 0)
+
+            if volume is None:
+                logger.warning("[RADARR][FREE SPACE] The disk of the root folder %s is not listed. Its free space is not checked.", root_folder.get("path"))
+                continue
+
+            volumes[volume.path] = {"path": volume.path, "free_space": volume.free_space, "total_space": volume.total_space}
+
+        return list(volumes.values())
+
+    def __is_on_low_volume(self, movie):
+        """
+        Checks whether the movie is stored on a volume below its free space target, while deletions are limited to
+        those volumes.
+        """
+        if self.volumes is None:
+            return True
+
+        volume = get_volume(self.volumes, movie.get("path"))
+        return volume is not None and volume.is_below_minimum()
+
+    @span("radarr.delete")
+    def __delete_media(self, media_id: int, size_on_disk: int = 0):
+        self.throttle.acquire(self.name, 1, size_on_disk)
         url = f"{self.base_url}/movie/{media_id}"
         headers = {"X-Api-Key": self.api_key}
         params = {"deleteFiles": True, "addImportExclusion": False}
 
-        response = requests.delete(url, headers=headers, params=params, timeout=30)
+        response = self.session.delete(url, headers=headers, params=params, timeout=30)
         if response.status_code != 200:
             raise requests.exceptions.RequestException(f"{response.url} : {response.status_code} - {response.text}")
 
-    @retry(tries=3, delay=5)
+        self.cache.update("movies", lambda media: [movie for movie in media if movie.get("id") != media_id])
+
+    def __handle_movie(self, movie, dry_run: bool = False):
+        """
+        Deletes a movie and returns whether it was deleted.
+        """
+        if dry_run:
+            logger.info("[RADARR][DRY RUN] Would have deleted %s. Space freed: %s.", movie.get("title"), convert_bytes(movie.get("sizeOnDisk", 0)))
+            return True
+
+        try:
+            self.__delete_media(movie.get("id"), movie.get("sizeOnDisk", 0))
+            logger.info("[RADARR] Deleted %s. Space freed: %s.", movie.get("title"), convert_bytes(movie.get("sizeOnDisk", 0)))
+        except requests.exceptions.RequestException as err:
+            logger.error("[RADARR] Failed to delete %s. Error: %s", movie.get("title"), err)
+            record_failure(self.name, "delete")
+            return False
+
+        return True
+
+    @retry(tries=3, delay=5, logger=RetryLogger("radarr"))
     def get_and_delete_media(self, media_to_delete: dict, dry_run: bool = False):
         """
         Gets and deletes media with the given ID from the Radarr API.
@@ -60,16 +255,31 @@ class RadarrClient:
             requests.exceptions.RequestException: If the API request fails.
         """
         media = self.__get_media()
-        exempt_tag_ids = self.__get_exempt_tag_ids(self.exempt_tag_names)
+        tags = self.__get_tags()
+        exempt_tag_ids = self.__get_tag_ids(tags, self.exempt_tag_names)
+        route_tag_ids = self.__get_tag_ids(tags, self.route_tag_names)
         original_deletion_count = len(media_to_delete)
         exempt_count = 0
 
         total_size = 0
+        step = f"{self.name}.delete"
+        start_progress(step, len(media_to_delete))
 
         for movie in media:
             if str(movie.get("tmdbId")) not in media_to_delete.keys():
                 continue
 
+            advance_progress(step)
+            if not self.__is_routed(movie, route_tag_ids):
+                media_to_delete.pop(str(movie.get("tmdbId")))
+                original_deletion_count -= 1
+                continue
+
+            if not self.__is_on_low_volume(movie):
+                media_to_delete.pop(str(movie.get("tmdbId")))
+                logger.debug("[RADARR] Skipping %s because its volume is above the minimum free space.", movie.get("title"))
+                continue
+
             if any(tag in exempt_tag_ids for tag in movie.get("tags", [])):
                 media_to_delete.pop(str(movie.get("tmdbId")))
                 exempt_count += 1
@@ -77,17 +287,15 @@ class RadarrClient:
                 continue
 
             if movie.get("id") is not None:
-                total_size += movie.get("sizeOnDisk", 0)
-                if dry_run:
-                    logger.info("[RADARR][DRY RUN] Would have deleted %s. Space freed: %s.", movie.get("title"), convert_bytes(movie.get("sizeOnDisk", 0)))
+                if not self.__handle_movie(movie, dry_run):
+                    media_to_delete.pop(str(movie.get("tmdbId")))
                     continue
+                total_size += movie.get("sizeOnDisk", 0)
 
-                try:
-                    self.__delete_media(movie.get("id"))
-                    logger.info("[RADARR] Deleted %s. Space freed: %s.", movie.get("title"), convert_bytes(movie.get("sizeOnDisk", 0)))
-                except requests.exceptions.RequestException as err:
-                    logger.error("[RADARR] Failed to delete %s. Error: %s", movie.get("title"), err)
-                    continue
+        CANDIDATES.labels(self.name, "evaluated", dry_run).inc(original_deletion_count)
+        CANDIDATES.labels(self.name, "deleted", dry_run).inc(len(media_to_delete))
+        CANDIDATES.labels(self.name, "exempt", dry_run).inc(exempt_count)
+        BYTES_FREED.labels(self.name, dry_run).inc(total_size)
 
         if dry_run:
             logger.info("[RADARR][DRY RUN] Total movies: %s. Movies eligible for deletion: %s. Movies deleted: %s. Movies exempt: %s. Total space freed: %s.", len(media), original_deletion_count, len(media_to_delete), exempt_count, convert_bytes(total_size))
@@ -95,3 +303,99 @@ class RadarrClient:
             logger.info("[RADARR] Total movies: %s. Movies eligible for deletion: %s. Movies deleted: %s. Movies exempt: %s. Total space freed: %s.\n", len(media), original_deletion_count, len(media_to_delete), exempt_count, convert_bytes(total_size))
 
         return media_to_delete
+
+    @retry(tries=3, delay=5, logger=RetryLogger("radarr"))
+    def get_deletion_plan(self, media_to_delete: dict):
+        """
+        Gets the movies that would be deleted for the given IDs, without deleting them.
+
+        Args:
+            media_to_delete: A dictionary where the key is the ID of the media to delete and the value is the title of the media.
+
+        Returns:
+            List[dict]: The Radarr ID, TMDB ID, title and size on disk of every movie that would be deleted.
+
+        Raises:
+            requests.exceptions.RequestException: If the API request fails.
+        """
+        media = self.__get_media()
+        tags = self.__get_tags()
+        exempt_tag_ids = self.__get_tag_ids(tags, self.exempt_tag_names)
+        route_tag_ids = self.__get_tag_ids(tags, self.route_tag_names)
+        planned_media = []
+
+        for movie in media:
+            if str(movie.get("tmdbId")) not in media_to_delete.keys() or movie.get("id") is None:
+                continue
+
+            if not self.__is_routed(movie, route_tag_ids) or not self.__is_on_low_volume(movie):
+                continue
+
+            if any(tag in exempt_tag_ids for tag in movie.get("tags", [])):
+                logger.info("[RADARR][PLAN] Skipping %s because it is exempt.", movie.get("title"))
+                continue
+
+            planned_media.append({"service": self.name, "id": movie.get("id"), "tmdb_id": str(movie.get("tmdbId")), "title": movie.get("title"), "size_on_disk": movie.get("sizeOnDisk", 0)})
+
+        logger.info("[RADARR][PLAN] Movies planned for deletion: %s. Total space to free: %s.", len(planned_media), convert_bytes(sum(movie["size_on_disk"] for movie in planned_media)))
+
+        return planned_media
+
+    def apply_deletion_plan(self, planned_media: list, dry_run: bool = False):
+        """
+        Deletes the planned movies that still exist, are not exempt, are still routed to this instance and, while
+        deletions are limited to low volumes, are still on one.
+
+        The plan is not retried as a whole, so a failed call never repeats the movies that were already deleted.
+
+        Args:
+            planned_media: The movies returned by get_deletion_plan.
+            dry_run: Whether to perform a dry run.
+
+        Returns:
+            dict: A dictionary where the key is the TMDB ID of a deleted movie and the value is its title.
+
+        Raises:
+            requests.exceptions.RequestException: If the API request fails.
+        """
+        all_media, tags = self.__get_media_and_tags()
+        media = {movie.get("id"): movie for movie in all_media}
+        exempt_tag_ids = self.__get_tag_ids(tags, self.exempt_tag_names)
+        route_tag_ids = self.__get_tag_ids(tags, self.route_tag_names)
+        media_deleted = {}
+        exempt_count = 0
+        total_size = 0
+
+        for planned_movie in planned_media:
+            movie = media.get(planned_movie["id"])
+            if movie is None:
+                logger.info("[RADARR] Skipping %s because it no longer exists.", planned_movie["title"])
+                continue
+
+            if any(tag in exempt_tag_ids for tag in movie.get("tags", [])):
+                exempt_count += 1
+                logger.info("[RADARR] Skipping %s because it is exempt.", movie.get("title"))
+                continue
+
+            if not self.__is_routed(movie, route_tag_ids):
+                logger.warning("[RADARR] Skipping %s because it is no longer routed to this instance.", movie.get("title"))
+                continue
+
+            if not self.__is_on_low_volume(movie):
+                logger.info("[RADARR] Skipping %s because its volume is no longer below the minimum free space.", movie.get("title"))
+                continue
+
+            if not self.__handle_movie(movie, dry_run):
+                continue
+
+            total_size += movie.get("sizeOnDisk", 0)
+            media_deleted[str(movie.get("tmdbId"))] = movie.get("title")
+
+        CANDIDATES.labels(self.name, "evaluated", dry_run).inc(len(planned_media))
+        CANDIDATES.labels(self.name, "deleted", dry_run).inc(len(media_deleted))
+        CANDIDATES.labels(self.name, "exempt", dry_run).inc(exempt_count)
+        BYTES_FREED.labels(self.name, dry_run).inc(total_size)
+
+        logger.info("[RADARR] Movies planned for deletion: %s. Movies deleted: %s. Movies exempt: %s. Total space freed: %s.", len(planned_media), len(media_deleted), exempt_count, convert_bytes(total_size))
+
+        return media_deleted
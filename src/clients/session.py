@@ -0,0 +1,51 @@
+"""Module for creating the HTTP sessions shared by the clients."""
+import time
+import requests
+from src.clients.limiter import AdaptiveLimiter
+from src.metrics import instrument_session
+
+
+class LimitedSession(requests.Session):
+    """
+    Session that paces its requests with an adaptive limiter.
+    """
+    def __init__(self, limiter: AdaptiveLimiter):
+        super().__init__()
+        self.limiter = limiter
+
+    def request(self, method, url, *args, **kwargs):  # pylint: disable=arguments-differ
+        self.limiter.acquire()
+        start = time.perf_counter()
+        response = None
+
+        try:
+            response = super().request(method, url, *args, **kwargs)
+            return response
+        finally:
+            # Any error, not only a failed request, must give the slot back, while only a response carries a status.
+            if response is None:
+                self.limiter.release(time.perf_counter() - start)
+            else:
+                self.limiter.release(time.perf_counter() - start, response.status_code, response.headers.get("Retry-After"))
+
+
+def create_session(service: str, rate_limit=None):
+    """
+    Creates a requests session for the given service.
+
+    Reusing a session keeps connections to the service alive between requests, and every response is
+    recorded in the request metrics of the service.
+
+    Args:
+        service: The name of the service the session is used for.
+        rate_limit: The rate limit configuration. The requests are paced by an adaptive limiter if it is enabled.
+
+    Returns:
+        requests.Session: The session.
+    """
+    if rate_limit is not None and rate_limit.enabled:
+        session = LimitedSession(AdaptiveLimiter(service, rate_limit))
+    else:
+        session = requests.Session()
+
+    return instrument_session(session, service)
@@ -1,60 +1,172 @@
 """Sonarr API client."""
-import time
-from datetime import datetime
+import math
 import requests
 from retry import retry
+from src.cache import Cache
 from src.logger import logger
+from src.models.episodeindex import EpisodeIndex
+from src.models.volume import Volume, get_volume
+from src.metrics import RetryLogger, CANDIDATES, BYTES_FREED, record_failure
+from src.clients.session import create_session
+from src.clients.throttle import DeletionThrottle
+from src.profiling import advance_progress, span, start_progress
 from src.util import convert_bytes
 
 class SonarrClient:
     """Class for interacting with the Sonarr API."""
-    def __init__(self, config):
+    def __init__(self, config, instance=None, throttle=None):
+        instance = instance or config.sonarr
+        self.name = instance.name
+        self.api_key = instance.api_key
+        self.base_url = instance.base_url
+        self.session = create_session(self.name, config.rate_limit)
+        self.cache = Cache(self.name, config.cache.enabled)
+        self.throttle = throttle or DeletionThrottle(config.deletion_throttle)
+        self.volumes = None
+        self.episode_indexes = {}
+        self.apply_config(config, instance)
+
+    def get_connection(self):
+        """
+        Gets the settings used to connect to the instance. Changing them requires a new client.
+        """
+        return self.base_url, self.api_key
+
+    def close(self):
+        """
+        Closes the session of a client that is no longer used.
+        """
+        self.session.close()
+
+    def apply_config(self, config, instance):
+        """
+        Applies the settings of the instance that do not change how it is connected to.
+
+        The session and cache of the client are kept.
+        """
         self.config = config
-        self.api_key = config.sonarr.api_key
-        self.base_url = config.sonarr.base_url
-        self.monitor_continuing_series = config.sonarr.monitor_continuing_series
-        self.exempt_tag_names = config.sonarr.exempt_tag_names
-        self.dynamic_load = config.sonarr.dynamic_load
+        self.cache.enabled = config.cache.enabled
+        self.media_ttl = config.cache.media_ttl
+        self.tags_ttl = config.cache.tags_ttl
+        self.root_folders = instance.root_folders
+        self.route_tag_names = instance.route_tag_names
+        self.watched_deletion_threshold = instance.watched_deletion_threshold
+        self.unwatched_deletion_threshold = instance.unwatched_deletion_threshold
+        self.section_thresholds = {section: (thresholds.watched_deletion_threshold, thresholds.unwatched_deletion_threshold) for section, thresholds in instance.section_thresholds.items()}
+        self.monitor_continuing_series = instance.monitor_continuing_series
+        self.exempt_tag_names = instance.exempt_tag_names
+        self.dynamic_load = instance.dynamic_load
 
     def __get_media(self):
+        return self.cache.get("series", self.__fetch_media, self.media_ttl)
+
+    @span("sonarr.series")
+    def __fetch_media(self):
         url = f"{self.base_url}/series"
         headers = {"X-Api-Key": self.api_key}
 
-        response = requests.get(url, headers=headers, timeout=30)
+        response = self.session.get(url, headers=headers, timeout=30)
         if response.status_code != 200:
             raise requests.exceptions.RequestException(f"{response.url} : {response.status_code} - {response.text}")
 
         return response.json()
     
+    @span("sonarr.series_by_id")
     def __get_media_by_id(self, media_id: int):
         url = f"{self.base_url}/series/{media_id}"
         headers = {"X-Api-Key": self.api_key}
 
-        response = requests.get(url, headers=headers, timeout=30)
+        response = self.session.get(url, headers=headers, timeout=30)
         if response.status_code != 200:
             raise requests.exceptions.RequestException(f"{response.url} : {response.status_code} - {response.text}")
 
         return response.json()
 
-    def __get_exempt_tag_ids(self, tag_names: list):
+    def __get_tags(self):
+        return self.cache.get("tags", self.__fetch_tags, self.tags_ttl)
+
+    @span("sonarr.tags")
+    def __fetch_tags(self):
         url = f"{self.base_url}/tag"
         headers = {"X-Api-Key": self.api_key}
 
-        response = requests.get(url, headers=headers, timeout=30)
+        response = self.session.get(url, headers=headers, timeout=30)
         if response.status_code != 200:
             raise requests.exceptions.RequestException(f"{response.url} : {response.status_code} - {response.text}")
 
-        tags = response.json()
-        tag_ids = [tag["id"] for tag in tags if tag["label"] in tag_names]
+        return response.json()
+
+    @retry(tries=3, delay=5, logger=RetryLogger("sonarr"))
+    def __get_media_and_tags(self):
+        return self.__get_media(), self.__get_tags()
+
+    def __get_tag_ids(self, tags: list, tag_names: list):
+        return [tag["id"] for tag in tags if tag["label"] in tag_names]
+
+    def __is_routed(self, item, route_tag_ids: list):
+        if not self.route_tag_names:
+            return True
+
+        return any(tag in route_tag_ids for tag in item.get("tags", []))
+
+    def get_snapshot(self):
+        """
+        Gets the media and tags that deletion decisions are based on, so they can be replayed offline.
+
+        Returns:
+            dict: The media and tags of the instance.
+        """
+        return {"media": self.__get_media(), "tags": self.__get_tags()}
+
+    def load_snapshot(self, snapshot: dict):
+        """
+        Serves the media and tags of a snapshot written by get_snapshot instead of fetching them from the API.
+
+        Args:
+            snapshot: The snapshot of the instance.
+        """
+        self.cache.enabled = True
+        self.media_ttl = self.tags_ttl = math.inf
+        self.cache.set("series", snapshot["media"], math.inf)
+        self.cache.set("tags", snapshot["tags"], math.inf)
+
+    @retry(tries=3, delay=5, logger=RetryLogger("sonarr"))
+    def get_media_ids(self):
+        """
+        Gets the TVDB IDs of the series held by this instance.
+
+        Returns:
+            set: The IDs as strings, matching the keys of the media passed to get_and_delete_media.
+
+        Raises:
+            requests.exceptions.RequestException: If the API request fails.
+        """
+        return {str(item.get("tvdbId")) for item in self.__get_media() if item.get("tvdbId") is not None}
+
+    def owns_locations(self, locations: list):
+        """
+        Checks whether media stored at the given Plex locations belongs to this instance.
+
+        An instance without root folders accepts media from any location.
+
+        Args:
+            locations: The file or folder paths of the media as seen by Plex.
+
+        Returns:
+            bool: True if the media should be routed to this instance.
+        """
+        if not self.root_folders:
+            return True
 
-        return tag_ids
+        return any(location.startswith(root_folder.rstrip("/") + "/") for location in locations for root_folder in self.root_folders)
 
+    @span("sonarr.episodes")
     def __get_media_episodes(self, media_id: int):
         url = f"{self.base_url}/episode"
         headers = {"X-Api-Key": self.api_key}
         params = {"seriesId": media_id}
 
-        response = requests.get(url, headers=headers, params=params, timeout=30)
+        response = self.session.get(url, headers=headers, params=params, timeout=30)
         if response.status_code != 200:
             raise requests.exceptions.RequestException(f"{response.url} : {response.status_code} - {response.text}")
 
@@ -65,7 +177,7 @@ class SonarrClient:
         headers = {"X-Api-Key": self.api_key}
         body = {"name": "EpisodeSearch", "episodeIds": episode_ids}
 
-        response = requests.post(url, headers=headers, json=body, timeout=30)
+        response = self.session.post(url, headers=headers, json=body, timeout=30)
         if response.status_code != 201:
             raise requests.exceptions.RequestException(f"{response.url} : {response.status_code} - {response.text}")
 
@@ -75,7 +187,8 @@ class SonarrClient:
         url = f"{self.base_url}/series/{series.get('id')}"
         headers = {"X-Api-Key": self.api_key}
 
-        response = requests.put(url, headers=headers, json=series, timeout=30)
+        response = self.session.put(url, headers=headers, json=series, timeout=30)
+        self.cache.invalidate("series")
         if response.status_code != 202:
             raise requests.exceptions.RequestException(f"{response.url} : {response.status_code} - {response.text}")
 
@@ -86,7 +199,8 @@ class SonarrClient:
         headers = {"X-Api-Key": self.api_key}
         body = {"episodeIds": episode_ids, "monitored": monitored}
 
-        response = requests.put(url, headers=headers, json=body, timeout=30)
+        response = self.session.put(url, headers=headers, json=body, timeout=30)
+        self.cache.invalidate("series")
         if response.status_code != 202:
             raise requests.exceptions.RequestException(f"{response.url} : {response.status_code} - {response.text}")
 
@@ -100,39 +214,128 @@ class SonarrClient:
 
         return series
 
-    def __delete_media(self, media_id: int):
+    @span("sonarr.rootfolders")
+    def __fetch_root_folders(self):
+        url = f"{self.base_url}/rootfolder"
+        headers = {"X-Api-Key": self.api_key}
+
+        response = self.session.get(url, headers=headers, timeout=30)
+        if response.status_code != 200:
+            raise requests.exceptions.RequestException(f"{response.url} : {response.status_code} - {response.text}")
+
+        return response.json()
+
+    @span("sonarr.diskspace")
+    def __fetch_disk_space(self):
+        url = f"{self.base_url}/diskspace"
+        headers = {"X-Api-Key": self.api_key}
+
+        response = self.session.get(url, headers=headers, timeout=30)
+        if response.status_code != 200:
+            raise requests.exceptions.RequestException(f"{response.url} : {response.status_code} - {response.text}")
+
+        return response.json()
+
+    @retry(tries=3, delay=5, logger=RetryLogger("sonarr"))
+    def get_volumes(self):
+        """
+        Gets the disks that the root folders of the instance are stored on.
+
+        A root folder is stored on the listed disk with the longest path that contains it. A root folder on a disk
+        that is not listed, such as a network share, counts as a disk of its own if its total space is known.
+
+        Returns:
+            List[dict]: The path, free space and total space of every disk, as seen by the instance.
+
+        Raises:
+            requests.exceptions.RequestException: If the API request fails.
+        """
+        disks = [Volume(disk["path"], disk.get("freeSpace", 0), disk["totalSpace"], 0) for disk in self.__fetch_disk_space() if disk.get("totalSpace")]
+        volumes = {}
+
+        for root_folder in self.__fetch_root_folders():
+            volume = get_volume(disks, root_folder.get("path"))
+            if volume is None and root_folder.get("totalSpace"):
+                volume = Volume(root_folder["path"], root_folder.get("freeSpace", 0), root_folder["totalSpace"], 0)
+
+            if volume is None:
+                logger.warning("[SONARR][FREE SPACE] The disk of the root folder %s is not listed. Its free space is not checked.", root_folder.get("path"))
+                continue
+
+            volumes[volume.path] = {"path": volume.path, "free_space": volume.free_space, "total_space": volume.total_space}
+
+        return list(volumes.values())
+
+    def __is_on_low_volume(self, series):
+        """
+        Checks whether the series is stored on a volume below its free space target, while deletions are limited to
+        those volumes.
+        """
+        if self.volumes is None:
+            return True
+
+        volume = get_volume(self.volumes, series.get("path"))
+        return volume is not None and volume.is_below_minimum()
+
+    @span("sonarr.delete")
+    def __delete_media(self, media_id: int, files: int = 1, size_on_disk: int = 0):
+        self.throttle.acquire(self.name, files, size_on_disk)
         url = f"{self.base_url}/series/{media_id}"
         headers = {"X-Api-Key": self.api_key}
         params = {"deleteFiles": True, "addImportListExclusion": False}
 
-        response = requests.delete(url, headers=headers, params=params, timeout=30)
+        response = self.session.delete(url, headers=headers, params=params, timeout=30)
         if response.status_code != 200:
             raise requests.exceptions.RequestException(f"{response.url} : {response.status_code} - {response.text}")
+
+        self.cache.update("series", lambda media: [series for series in media if series.get("id") != media_id])
   
-    def __delete_media_episodes(self, episode_file_ids: list):
+    @span("sonarr.delete_episodes")
+    def __delete_media_episodes(self, episode_file_ids: list, file_size: int = 0):
         url = f"{self.base_url}/episodefile/bulk"
         headers = {"X-Api-Key": self.api_key}
-        body = {"episodeFileIds": episode_file_ids}
 
-        response = requests.delete(url, headers=headers, json=body, timeout=60)
-        if response.status_code != 200:
-            raise requests.exceptions.RequestException(f"{response.url} : {response.status_code} - {response.text}")
+        for batch in self.throttle.batch(episode_file_ids):
+            self.throttle.acquire(self.name, len(batch), file_size * len(batch))
+            response = self.session.delete(url, headers=headers, json={"episodeFileIds": batch}, timeout=60)
+            self.cache.invalidate("series")
+            if response.status_code != 200:
+                raise requests.exceptions.RequestException(f"{response.url} : {response.status_code} - {response.text}")
+
+    @staticmethod
+    def __get_file_size(series):
+        statistics = series.get("statistics", {})
+        return statistics.get("sizeOnDisk", 0) // max(statistics.get("episodeFileCount", 0), 1)
 
     def __handle_ended_series(self, series, dry_run: bool = False):
+        """
+        Deletes a series.
+
+        Returns:
+            tuple: Whether the series was deleted, and the space freed.
+        """
         size_on_disk = series.get("statistics", {}).get("sizeOnDisk", 0)
         if dry_run:
             logger.info("[SONARR][DRY RUN] Would have deleted %s. Space freed: %s.", series.get("title"), convert_bytes(size_on_disk))
-            return size_on_disk
+            return True, size_on_disk
         
         try:
-            self.__delete_media(series.get("id"))
+            self.__delete_media(series.get("id"), series.get("statistics", {}).get("episodeFileCount", 1), size_on_disk)
             logger.info("[SONARR] Deleted %s. Space freed: %s.", series.get("title"), convert_bytes(size_on_disk))
         except requests.exceptions.RequestException as err:
             logger.error("[SONARR] Failed to delete %s. Error: %s", series.get("title"), err)
+            record_failure(self.name, "delete")
+            return False, 0
 
-        return series.get("statistics", {}).get("sizeOnDisk", 0)
+        return True, size_on_disk
 
     def __handle_continuing_series(self, series, dry_run: bool = False):
+        """
+        Loads the first episodes of a series, and unmonitors and deletes the files of the others.
+
+        Returns:
+            tuple: Whether the series was unmonitored, and the space freed.
+        """
         episodes = self.__get_media_episodes(series.get("id"))
         filtered_episodes = [episode for episode in episodes if episode['seasonNumber'] != 0]
         sorted_episodes = sorted(filtered_episodes, key=lambda x: (x['seasonNumber'], x['episodeNumber']))
@@ -155,7 +358,8 @@ class SonarrClient:
                 self.__search_media_episodes(search_episode_ids)
         except requests.exceptions.RequestException as err:
             logger.error("[SONARR] Failed to monitor %s. Error: %s", series.get("title"), err)
-            return 0
+            record_failure(self.name, "monitor")
+            return False, 0
 
         unmonitor_episode_ids = []
         delete_episode_file_ids = []
@@ -170,14 +374,14 @@ class SonarrClient:
 
         if dry_run:
             logger.info("[SONARR][DRY RUN] Would have unmonitored %s. Episodes unmonitored: %s", series.get("title"), len(unmonitor_episode_ids))
-            return size_on_disk
+            return True, size_on_disk
 
         try:
             if unmonitor_episode_ids:
                 self.__monitor_media_episodes(unmonitor_episode_ids, False)
                 logger.info("[SONARR] Unmonitored %s. Episodes unmonitored: %s", series.get("title"), len(unmonitor_episode_ids))
             if delete_episode_file_ids:
-                self.__delete_media_episodes(delete_episode_file_ids)
+                self.__delete_media_episodes(delete_episode_file_ids, self.__get_file_size(series))
                 original_size_on_disk = series.get("statistics", {}).get("sizeOnDisk", 0)
                 series = self.__get_media_by_id(series.get("id"))
                 series = self.__unmonitor_empty_seasons(series)
@@ -186,15 +390,28 @@ class SonarrClient:
   
         except requests.exceptions.RequestException as err:
             logger.error("[SONARR] Failed to unmonitor %s. Error: %s", series.get("title"), err)
-            return size_on_disk
+            record_failure(self.name, "unmonitor")
+            return False, size_on_disk
 
-        return size_on_disk
+        return True, size_on_disk
+
+    def __get_episode_index(self, series):
+        """
+        Gets the episode index of a series, fetching its episodes only if Sonarr reports a change to the series.
+        """
+        # The statistics count the monitored episodes and files, so they change with every episode that is
+        # monitored, unmonitored, downloaded or deleted.
+        signature = (series.get("statistics"), [season.get("monitored") for season in series.get("seasons", [])])
+        episode_index = self.episode_indexes.get(series.get("id"))
+        if episode_index is None or episode_index.signature != signature:
+            episode_index = EpisodeIndex(self.__get_media_episodes(series.get("id")), signature)
+            self.episode_indexes[series.get("id")] = episode_index
+
+        return episode_index
 
     def __get_episodes_to_load_and_unload(self, series, dynamic_media):
-        episodes = self.__get_media_episodes(series.get("id"))
-        filtered_episodes = [episode for episode in episodes if episode.get("seasonNumber", -1) != 0 and episode.get("airDate") < datetime.now().isoformat() and episode.get("airDate") > datetime.fromtimestamp(time.time() - self.dynamic_load.watched_deletion_threshold).isoformat()]
-        sorted_episodes = sorted(filtered_episodes, key=lambda x: (x['seasonNumber'], x['episodeNumber']))
-        episode_index = next((index for (index, episode) in enumerate(sorted_episodes) if episode.get("seasonNumber", 0) == dynamic_media.season and episode.get("episodeNumber", 0) == dynamic_media.episode), None)
+        sorted_episodes, positions = self.__get_episode_index(series).get_aired_episodes(self.dynamic_load.watched_deletion_threshold)
+        episode_index = positions.get((dynamic_media.season, dynamic_media.episode))
 
         episodes_to_load = []
         episodes_to_unload = []
@@ -223,6 +440,8 @@ class SonarrClient:
                 self.__log_episode_loading(episode, series, dry_run)
                 search_episode_ids.append(episode["id"])
         if not dry_run:
+            if monitor_episode_ids:
+                self.episode_indexes.pop(series.get("id"), None)
             if monitor_episode_ids:
                 self.__monitor_media_episodes(monitor_episode_ids, True)
             if search_episode_ids:
@@ -249,10 +468,12 @@ class SonarrClient:
                     delete_episode_file_ids.append(episode.get("episodeFileId"))
         size_on_disk = 0
         if not dry_run:
+            if unmonitor_episode_ids or delete_episode_file_ids:
+                self.episode_indexes.pop(series.get("id"), None)
             if unmonitor_episode_ids:
                 self.__monitor_media_episodes(unmonitor_episode_ids, False)
             if delete_episode_file_ids:
-                self.__delete_media_episodes(delete_episode_file_ids)
+                self.__delete_media_episodes(delete_episode_file_ids, self.__get_file_size(series))
                 original_size_on_disk = series.get("statistics", {}).get("sizeOnDisk", 0)
                 series = self.__get_media_by_id(series.get("id"))
                 series = self.__unmonitor_empty_seasons(series)
@@ -275,7 +496,19 @@ class SonarrClient:
         size_on_disk = self.__handle_episode_unloading(episodes_to_unload, series, dry_run)
         return size_on_disk
 
-    @retry(tries=3, delay=5)
+    def __get_series_action(self, series):
+        if not self.dynamic_load.enabled and (not self.monitor_continuing_series or series.get("ended", False)):
+            return "delete"
+
+        return "unmonitor"
+
+    def __handle_series(self, series, dry_run: bool = False):
+        if self.__get_series_action(series) == "delete":
+            return self.__handle_ended_series(series, dry_run)
+
+        return self.__handle_continuing_series(series, dry_run)
+
+    @retry(tries=3, delay=5, logger=RetryLogger("sonarr"))
     def get_and_delete_media(self, media_to_delete: dict, dry_run: bool = False):
         """
         Gets and deletes media with the given ID from the Sonarr API.
@@ -291,16 +524,31 @@ class SonarrClient:
             requests.exceptions.RequestException: If the API request fails.
         """
         media = self.__get_media()
-        exempt_tag_ids = self.__get_exempt_tag_ids(self.exempt_tag_names)
+        tags = self.__get_tags()
+        exempt_tag_ids = self.__get_tag_ids(tags, self.exempt_tag_names)
+        route_tag_ids = self.__get_tag_ids(tags, self.route_tag_names)
         original_deletion_count = len(media_to_delete)
         exempt_count = 0
 
         total_size = 0
+        step = f"{self.name}.delete"
+        start_progress(step, len(media_to_delete))
 
         for series in media:
             if str(series.get("tvdbId")) not in media_to_delete.keys():
                 continue
 
+            advance_progress(step)
+            if not self.__is_routed(series, route_tag_ids):
+                media_to_delete.pop(str(series.get("tvdbId")))
+                original_deletion_count -= 1
+                continue
+
+            if not self.__is_on_low_volume(series):
+                media_to_delete.pop(str(series.get("tvdbId")))
+                logger.debug("[SONARR] Skipping %s because its volume is above the minimum free space.", series.get("title"))
+                continue
+
             if any(tag in exempt_tag_ids for tag in series.get("tags", [])):
                 media_to_delete.pop(str(series.get("tvdbId")))
                 exempt_count += 1
@@ -308,13 +556,15 @@ class SonarrClient:
                 continue
 
             if series.get("id") is not None:
-                ended = series.get("ended", False)
-                if self.dynamic_load.enabled:
-                    total_size += self.__handle_continuing_series(series, dry_run)
-                elif not self.monitor_continuing_series or ended:
-                    total_size += self.__handle_ended_series(series, dry_run)
-                else:
-                    total_size += self.__handle_continuing_series(series, dry_run)
+                handled, size_on_disk = self.__handle_series(series, dry_run)
+                total_size += size_on_disk
+                if not handled:
+                    media_to_delete.pop(str(series.get("tvdbId")))
+
+        CANDIDATES.labels(self.name, "evaluated", dry_run).inc(original_deletion_count)
+        CANDIDATES.labels(self.name, "deleted", dry_run).inc(len(media_to_delete))
+        CANDIDATES.labels(self.name, "exempt", dry_run).inc(exempt_count)
+        BYTES_FREED.labels(self.name, dry_run).inc(total_size)
 
         if dry_run:
             logger.info("[SONARR][DRY RUN] Total series: %s. Series eligible for deletion: %s. Series deleted: %s. Series exempt: %s. Total space freed: %s.", len(media), original_deletion_count, len(media_to_delete), exempt_count, convert_bytes(total_size))
@@ -323,7 +573,7 @@ class SonarrClient:
 
         return media_to_delete
 
-    @retry(tries=3, delay=5)
+    @retry(tries=3, delay=5, logger=RetryLogger("sonarr"))
     def get_dynamic_load_media(self, media_to_load: dict, dry_run: bool = False):
         """
         Gets and deletes media with the given ID from the Sonarr API.
@@ -339,14 +589,26 @@ class SonarrClient:
             requests.exceptions.RequestException: If the API request fails.
         """
         media = self.__get_media()
-        exempt_tag_ids = self.__get_exempt_tag_ids(self.exempt_tag_names)
+        tags = self.__get_tags()
+        exempt_tag_ids = self.__get_tag_ids(tags, self.exempt_tag_names)
+        route_tag_ids = self.__get_tag_ids(tags, self.route_tag_names)
 
         total_size = 0
+        # Only the series that are playing keep their episode index.
+        self.episode_indexes = {series.get("id"): self.episode_indexes[series.get("id")] for series in media if str(series.get("tvdbId")) in media_to_load and series.get("id") in self.episode_indexes}
+
+        step = f"{self.name}.dynamic_load"
+        start_progress(step, len(media_to_load))
 
         for series in media:
             if str(series.get("tvdbId")) not in media_to_load.keys():
                 continue
 
+            advance_progress(step)
+            if not self.__is_routed(series, route_tag_ids):
+                media_to_load.pop(str(series.get("tvdbId")))
+                continue
+
             if any(tag in exempt_tag_ids for tag in series.get("tags", [])):
                 media_to_load.pop(str(series.get("tvdbId")))
                 logger.info("[SONARR][DYNAMIC LOAD] Skipping %s because it is exempt.", series.get("title"))
@@ -357,9 +619,117 @@ class SonarrClient:
                 if dynamic_media is not None:
                     total_size += self.__handle_dynamic_load(series, dynamic_media, dry_run)
 
+        BYTES_FREED.labels(self.name, dry_run).inc(total_size)
+
         if dry_run and total_size > 0:
             logger.info("[SONARR][DYNAMIC LOAD][DRY RUN] Would have total space freed: %s.", convert_bytes(total_size))
         elif total_size > 0:
             logger.info("[SONARR][DYNAMIC LOAD] Total space freed: %s.", convert_bytes(total_size))
 
         return media_to_load
+
+    @retry(tries=3, delay=5, logger=RetryLogger("sonarr"))
+    def get_deletion_plan(self, media_to_delete: dict):
+        """
+        Gets the series that would be deleted or unmonitored for the given IDs, without changing them.
+
+        Args:
+            media_to_delete: A dictionary where the key is the ID of the media to delete and the value is the title of the media.
+
+        Returns:
+            List[dict]: The Sonarr ID, TVDB ID, title, size on disk and action ("delete" or "unmonitor") of every series.
+
+        Raises:
+            requests.exceptions.RequestException: If the API request fails.
+        """
+        media = self.__get_media()
+        tags = self.__get_tags()
+        exempt_tag_ids = self.__get_tag_ids(tags, self.exempt_tag_names)
+        route_tag_ids = self.__get_tag_ids(tags, self.route_tag_names)
+        planned_media = []
+
+        for series in media:
+            if str(series.get("tvdbId")) not in media_to_delete.keys() or series.get("id") is None:
+                continue
+
+            if not self.__is_routed(series, route_tag_ids) or not self.__is_on_low_volume(series):
+                continue
+
+            if any(tag in exempt_tag_ids for tag in series.get("tags", [])):
+                logger.info("[SONARR][PLAN] Skipping %s because it is exempt.", series.get("title"))
+                continue
+
+            planned_media.append({"service": self.name, "id": series.get("id"), "tvdb_id": str(series.get("tvdbId")), "title": series.get("title"), "size_on_disk": series.get("statistics", {}).get("sizeOnDisk", 0), "action": self.__get_series_action(series)})
+
+        # Unmonitored series keep the episodes of their load window, so only deleted series count towards the space freed.
+        deleted_media = [series for series in planned_media if series["action"] == "delete"]
+        logger.info("[SONARR][PLAN] Series planned for deletion: %s. Series planned for unmonitoring: %s. Total size on disk of the deleted series: %s.", len(deleted_media), len(planned_media) - len(deleted_media), convert_bytes(sum(series["size_on_disk"] for series in deleted_media)))
+
+        return planned_media
+
+    def apply_deletion_plan(self, planned_media: list, dry_run: bool = False):
+        """
+        Carries out the planned action of every planned series that still exists, is not exempt, is still routed to
+        this instance and, while deletions are limited to low volumes, is still on one. A series whose action would
+        now differ from the planned one is skipped.
+
+        The plan is not retried as a whole, so a failed call never repeats the series that were already handled.
+
+        Args:
+            planned_media: The series returned by get_deletion_plan.
+            dry_run: Whether to perform a dry run.
+
+        Returns:
+            dict: A dictionary where the key is the TVDB ID of a handled series and the value is its title.
+
+        Raises:
+            requests.exceptions.RequestException: If the API request fails.
+        """
+        all_media, tags = self.__get_media_and_tags()
+        media = {series.get("id"): series for series in all_media}
+        exempt_tag_ids = self.__get_tag_ids(tags, self.exempt_tag_names)
+        route_tag_ids = self.__get_tag_ids(tags, self.route_tag_names)
+        media_deleted = {}
+        exempt_count = 0
+        total_size = 0
+
+        for planned_series in planned_media:
+            series = media.get(planned_series["id"])
+            if series is None:
+                logger.info("[SONARR] Skipping %s because it no longer exists.", planned_series["title"])
+                continue
+
+            if any(tag in exempt_tag_ids for tag in series.get("tags", [])):
+                exempt_count += 1
+                logger.info("[SONARR] Skipping %s because it is exempt.", series.get("title"))
+                continue
+
+            if not self.__is_routed(series, route_tag_ids):
+                logger.warning("[SONARR] Skipping %s because it is no longer routed to this instance.", series.get("title"))
+                continue
+
+            if not self.__is_on_low_volume(series):
+                logger.info("[SONARR] Skipping %s because its volume is no longer below the minimum free space.", series.get("title"))
+                continue
+
+            action = self.__get_series_action(series)
+            if action != planned_series.get("action"):
+                logger.warning("[SONARR] Skipping %s because it was planned to %s, but would now %s.", series.get("title"), planned_series.get("action"), action)
+                continue
+
+            if action == "delete":
+                handled, size_on_disk = self.__handle_ended_series(series, dry_run)
+            else:
+                handled, size_on_disk = self.__handle_continuing_series(series, dry_run)
+            total_size += size_on_disk
+            if handled:
+                media_deleted[str(series.get("tvdbId"))] = series.get("title")
+
+        CANDIDATES.labels(self.name, "evaluated", dry_run).inc(len(planned_media))
+        CANDIDATES.labels(self.name, "deleted", dry_run).inc(len(media_deleted))
+        CANDIDATES.labels(self.name, "exempt", dry_run).inc(exempt_count)
+        BYTES_FREED.labels(self.name, dry_run).inc(total_size)
+
+        logger.info("[SONARR] Series planned for deletion: %s. Series deleted: %s. Series exempt: %s. Total space freed: %s.", len(planned_media), len(media_deleted), exempt_count, convert_bytes(total_size))
+
+        return media_deleted
@@ -0,0 +1,156 @@
+"""Module for the deletion throttle that spreads deletions over time to protect disk I/O and active streams."""
+import threading
+import time
+from src.logger import logger
+from src.metrics import DELETION_THROTTLE_SECONDS
+from src.profiling import check_cancelled
+
+PLAYBACK_CHECK_INTERVAL = 30
+CANCEL_CHECK_INTERVAL = 1
+
+
+class DeletionThrottle:
+    """
+    Class for pacing the deletions sent to every Radarr and Sonarr instance.
+
+    Every deletion reserves the next slot of the budget, sized by its files and bytes, and waits for it without
+    blocking the other instances from reserving theirs. While Plex is streaming, the budget is divided by the playback slowdown or deletions are
+    paused. A single throttle is shared by all instances, as their media usually lives on the same disks.
+    """
+    def __init__(self, throttle_config, get_stream_count=None):
+        self.get_stream_count = get_stream_count
+        self.lock = threading.Lock()
+        self.playback_lock = threading.Lock()
+        self.next_slot = 0.0
+        self.stream_count = 0
+        self.streams_checked_at = None
+        self.playback_started_at = None
+        self.apply_config(throttle_config)
+
+    def apply_config(self, throttle_config):
+        """
+        Applies new throttle settings. Deletions that are waiting keep their current slot.
+        """
+        self.config = throttle_config
+
+    def batch(self, items: list):
+        """
+        Splits the items of a bulk deletion into batches that are each sent as a single deletion.
+
+        Args:
+            items: The IDs of the files to delete.
+
+        Returns:
+            list: The batches, or a single batch with every item if the throttle is disabled.
+        """
+        if not self.config.enabled:
+            return [items] if items else []
+
+        return [items[index:index + self.config.batch_size] for index in range(0, len(items), self.config.batch_size)]
+
+    def acquire(self, service: str, files: int = 1, size: int = 0):
+        """
+        Waits until a deletion fits within the budget and reserves the budget for it.
+
+        Args:
+            service: The name of the instance that deletes.
+            files: The number of files the deletion removes.
+            size: The number of bytes the deletion frees.
+
+        Raises:
+            RunCancelledError: If the run was cancelled while waiting.
+        """
+        if not self.config.enabled:
+            return
+
+        stream_count = self.__wait_for_playback(service)
+
+        cost = max(files / self.config.files_per_second if self.config.files_per_second > 0 else 0, size / (self.config.megabytes_per_second * 1000000) if self.config.megabytes_per_second > 0 else 0)
+        if stream_count and self.config.during_playback != "ignore":
+            cost *= self.config.playback_slowdown
+
+        # The slot is reserved under the lock and waited for outside of it, so waiting never blocks the other instances.
+        with self.lock:
+            now = time.monotonic()
+            slot = max(self.next_slot, now)
+            self.next_slot = slot + cost
+
+        delay = slot - now
+        if delay > 0:
+            DELETION_THROTTLE_SECONDS.labels(service, "budget").inc(delay)
+            self.__sleep(delay)
+
+    def __wait_for_playback(self, service: str):
+        """
+        Pauses while Plex is streaming, if configured, and returns the number of active streams.
+
+        A pause lasts at most the max pause per continuous period of playback, after which deletions continue at
+        the reduced rate until playback stops.
+        """
+        stream_count = self.__get_stream_count(service)
+        with self.playback_lock:
+            if not stream_count:
+                self.playback_started_at = None
+                return stream_count
+
+            if self.playback_started_at is None:
+                self.playback_started_at = time.monotonic()
+
+            remaining = self.config.max_pause - (time.monotonic() - self.playback_started_at)
+
+        if self.config.during_playback != "pause" or remaining <= 0:
+            return stream_count
+
+        logger.info("[%s][THROTTLE] Pausing deletions while %s streams are playing.", service.upper(), stream_count)
+        started = time.monotonic()
+        while stream_count and time.monotonic() - started < remaining:
+            # The stream count is only fetched from Plex once per check interval, so the cancellation is checked more often.
+            time.sleep(min(CANCEL_CHECK_INTERVAL, max(remaining - (time.monotonic() - started), 0)))
+            check_cancelled()
+            stream_count = self.__get_stream_count(service)
+
+        waited = time.monotonic() - started
+        DELETION_THROTTLE_SECONDS.labels(service, "playback").inc(waited)
+        if stream_count:
+            logger.warning("[%s][THROTTLE] %s streams are still playing after %.0fs. Resuming deletions at a reduced rate.", service.upper(), stream_count, waited)
+        else:
+            with self.playback_lock:
+                self.playback_started_at = None
+            logger.info("[%s][THROTTLE] Playback stopped. Resuming deletions after %.0fs.", service.upper(), waited)
+
+        return stream_count
+
+    def __get_stream_count(self, service: str):
+        """
+        Gets the number of active Plex streams, checking Plex at most once per check interval.
+        """
+        if self.get_stream_count is None:
+            return 0
+
+        with self.playback_lock:
+            now = time.monotonic()
+            if self.streams_checked_at is not None and now - self.streams_checked_at < PLAYBACK_CHECK_INTERVAL:
+                return self.stream_count
+
+            try:
+                self.stream_count = self.get_stream_count()
+            except Exception as err:  # pylint: disable=broad-except
+                logger.warning("[%s][THROTTLE] Failed to check the active Plex streams. Error: %s", service.upper(), err)
+                self.stream_count = 0
+            self.streams_checked_at = now
+
+            return self.stream_count
+
+    @staticmethod
+    def __sleep(seconds: float):
+        """
+        Sleeps for the given number of seconds, stopping early if the run was cancelled.
+        """
+        deadline = time.monotonic() + seconds
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+
+            time.sleep(min(CANCEL_CHECK_INTERVAL, remaining))
+            check_cancelled()
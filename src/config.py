@@ -1,17 +1,30 @@
 """This module contains the Config class which is used to store the configuration values for the application."""
+import ipaddress
 import json
+import logging
+import os
 import sys
 import re
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Tuple
 from dataclasses import dataclass, field
+from src.logger import logger
 
 CONFIG_FILE_NAME = "config.json"
+CONFIG_ERROR_EXIT_CODE = 2
 
 @dataclass
 class PlexConfig:
     """This class is used to store the configuration values for the Plex client."""
     base_url: str
     token: str
+    name: str = "plex"
+    database_path: str = ""
+
+@dataclass
+class SectionThresholds:
+    """This class is used to store the deletion thresholds of a Plex library section."""
+    watched_deletion_threshold: int
+    unwatched_deletion_threshold: int
 
 @dataclass
 class RadarrConfig:
@@ -22,6 +35,10 @@ class RadarrConfig:
     exempt_tag_names: List[str] = field(default_factory=list)
     watched_deletion_threshold: int = 7776000
     unwatched_deletion_threshold: int = 2592000
+    name: str = "radarr"
+    root_folders: List[str] = field(default_factory=list)
+    route_tag_names: List[str] = field(default_factory=list)
+    section_thresholds: Dict[str, SectionThresholds] = field(default_factory=dict)
 
 @dataclass
 class DynamicLoad:
@@ -43,6 +60,10 @@ class SonarrConfig:
     dynamic_load: DynamicLoad = field(default_factory=DynamicLoad)
     watched_deletion_threshold: int = 7776000
     unwatched_deletion_threshold: int = 2592000
+    name: str = "sonarr"
+    root_folders: List[str] = field(default_factory=list)
+    route_tag_names: List[str] = field(default_factory=list)
+    section_thresholds: Dict[str, SectionThresholds] = field(default_factory=dict)
 
 @dataclass
 class OverseerrConfig:
@@ -59,6 +80,12 @@ class ProgressiveDeletion:
     maximum_deletion_cycles: int
     threshold_reduction_per_cycle: int
 
+@dataclass
+class VolumeConfig:
+    """This class is used to store the free space target of a single volume."""
+    path: str
+    minimum_free_space_percentage: int
+
 @dataclass
 class FreeSpace:
     """This class is used to store the configuration values for the free space feature."""
@@ -68,6 +95,79 @@ class FreeSpace:
     prevent_age_based_deletion: bool
     prevent_dynamic_load: bool
     progressive_deletion: field(default_factory=ProgressiveDeletion)
+    discover_volumes: bool = False
+    volumes: List[VolumeConfig] = field(default_factory=list)
+
+
+@dataclass
+class StateConfig:
+    """This class is used to store the configuration values for the persistent state store."""
+    enabled: bool
+    path: str = "state.db"
+
+@dataclass
+class RateLimitConfig:
+    """This class is used to store the configuration values for the adaptive rate limiter."""
+    enabled: bool
+    initial_concurrency: int = 4
+    max_concurrency: int = 16
+    min_rate: int = 1
+    max_rate: int = 100
+    latency_target: int = 10
+
+@dataclass
+class DeletionThrottleConfig:
+    """This class is used to store the configuration values for the deletion throttle."""
+    enabled: bool
+    files_per_second: float = 1
+    megabytes_per_second: float = 0
+    batch_size: int = 20
+    during_playback: str = "slow"
+    playback_slowdown: float = 4
+    max_pause: int = 7200
+
+@dataclass
+class OffPeakConfig:
+    """This class is used to store the off-peak windows the scheduled fetch and delete job runs in."""
+    enabled: bool
+    windows: List[Tuple[int, int]] = field(default_factory=list)
+    jitter: int = 0
+
+@dataclass
+class ScanConfig:
+    """This class is used to store the configuration values for the Plex scans after deletions."""
+    enabled: bool
+    empty_trash: bool = True
+    timeout: int = 1800
+
+@dataclass
+class MetricsConfig:
+    """This class is used to store the configuration values for the Prometheus metrics endpoint."""
+    enabled: bool
+    address: str = "0.0.0.0"
+    port: int = 8000
+
+@dataclass
+class ControlConfig:
+    """This class is used to store the configuration values for the HTTP control endpoint."""
+    enabled: bool
+    address: str = "127.0.0.1"
+    port: int = 8001
+    token: str = ""
+
+@dataclass
+class CacheConfig:
+    """This class is used to store the configuration values for the resource cache."""
+    enabled: bool
+    media_ttl: int = 600
+    tags_ttl: int = 3600
+    sections_ttl: int = 3600
+
+@dataclass
+class RunReportConfig:
+    """This class is used to store the configuration values for the run report."""
+    enabled: bool
+    path: str = "run_report.json"
 
 
 @dataclass
@@ -81,30 +181,81 @@ class Config:
     plex: PlexConfig
     radarr: RadarrConfig
     sonarr: SonarrConfig
+    plex_instances: List[PlexConfig]
+    radarr_instances: List[RadarrConfig]
+    sonarr_instances: List[SonarrConfig]
     overseerr: OverseerrConfig
+    state: StateConfig
+    cache: CacheConfig
+    rate_limit: RateLimitConfig
+    deletion_throttle: DeletionThrottleConfig
+    scan: ScanConfig
+    off_peak: OffPeakConfig
+    metrics: MetricsConfig
+    control: ControlConfig
+    run_report: RunReportConfig
     dry_run: bool
     log_level: str
+    log_format: str = "text"
+    log_rate_limit: int = 0
     schedule_interval: int = 86400
+    schedule_mode: str = "interval"
+    reconcile_interval: int = 604800
     
 
-    def __init__(self):
+    def __init__(self, exit_on_error: bool = True):
         self.dry_run = True
         self.log_level = "INFO"
+        self.log_format = "text"
+        self.log_rate_limit = 0
         self.schedule_interval = 86400
+        self.schedule_mode = "interval"
+        self.reconcile_interval = 604800
         self.plex = PlexConfig("https://plex.domain.com", "")
         self.radarr = RadarrConfig(False, "", "https://radarr.domain.com/api/v3", [], 7776000, 2592000)
         self.sonarr = SonarrConfig(False, "", "https://sonarr.domain.com/api/v3", True, [], DynamicLoad(False, 3, 3, 7776000, 600), 7776000, 2592000)
+        self.plex_instances = [self.plex]
+        self.radarr_instances = [self.radarr]
+        self.sonarr_instances = [self.sonarr]
         self.overseerr = OverseerrConfig(False, "", "https://overseerr.domain.com/api/v1", 10)
+        self.state = StateConfig(False, "state.db")
+        self.cache = CacheConfig(True, 600, 3600, 3600)
+        self.rate_limit = RateLimitConfig(True, 4, 16, 1, 100, 10)
+        self.deletion_throttle = DeletionThrottleConfig(False, 1, 0, 20, "slow", 4, 7200)
+        self.scan = ScanConfig(False, True, 1800)
+        self.off_peak = OffPeakConfig(False, [], 0)
+        self.metrics = MetricsConfig(False, "0.0.0.0", 8000)
+        self.control = ControlConfig(False, "127.0.0.1", 8001, "")
+        self.run_report = RunReportConfig(False, "run_report.json")
         self.experimental = Experimental(FreeSpace(False, 0, "", False, False, ProgressiveDeletion(False, 0, 86400)))
         
-        config = self._get_config()
+        self.mtime = self.get_mtime()
 
         try:
+            config = self._get_config()
             self._parse_config(config)
-        except TypeError as err:
+        except (AttributeError, KeyError, TypeError, ValueError) as err:
+            if not exit_on_error:
+                raise ValueError(f"Error in configuration file: {err}") from err
             print("Error in configuration file:")
             print(err)
-            sys.exit()
+            sys.exit(CONFIG_ERROR_EXIT_CODE)
+
+    @staticmethod
+    def get_mtime():
+        """
+        Gets the modification time of the configuration file, or None if it does not exist.
+        """
+        try:
+            return os.stat(CONFIG_FILE_NAME).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def has_changed(self) -> bool:
+        """
+        Checks whether the configuration file was modified since it was parsed.
+        """
+        return self.get_mtime() != self.mtime
 
     def _get_config(self) -> Dict[str, Any]:
         config = {}
@@ -128,31 +279,138 @@ class Config:
             if key not in config:
                 raise KeyError(f"Missing required configuration key: {key}")
 
+        self.dry_run = self._get_value_or_default(config, "dry_run", True)
+        self.log_level = self._get_value_or_default(config, "log_level", "INFO")
+        if not isinstance(logging.getLevelName(self.log_level), int):
+            raise ValueError(f"log_level must be one of DEBUG, INFO, WARNING, ERROR or CRITICAL. Got: {self.log_level}")
+        self.log_format = self._get_value_or_default(config, "log_format", "text")
+        if self.log_format not in ("text", "json"):
+            raise ValueError("log_format must be either text or json.")
+        self.log_rate_limit = self._get_value_or_default(config, "log_rate_limit", 0)
+        self.schedule_interval = self._get_value_or_default(config, "schedule_interval", 86400, True)
+        self.schedule_mode = self._get_value_or_default(config, "schedule_mode", "interval")
+        if self.schedule_mode not in ("interval", "deadline"):
+            raise ValueError("schedule_mode must be either interval or deadline.")
+        self.reconcile_interval = self._get_value_or_default(config, "reconcile_interval", 604800, True)
+        self.plex_instances = [self._parse_plex_config(plex_config, index) for index, plex_config in enumerate(self._get_instances(config, "plex"))]
+        self.radarr_instances = [self._parse_radarr_config(radarr_config, index) for index, radarr_config in enumerate(self._get_instances(config, "radarr"))]
+        self.sonarr_instances = [self._parse_sonarr_config(sonarr_config, index) for index, sonarr_config in enumerate(self._get_instances(config, "sonarr"))]
+        self.plex, self.radarr, self.sonarr = self.plex_instances[0], self.radarr_instances[0], self.sonarr_instances[0]
+        overseerr_config = self._get_value_or_default(config, "overseerr", {})
+        self.overseerr = OverseerrConfig(self._get_value_or_default(overseerr_config, "enabled", False), self._get_value_or_default(overseerr_config, "api_key", ""), self._get_value_or_default(overseerr_config, "base_url", "https://overseerr.domain.com/api/v1"), self._get_value_or_default(overseerr_config, "fetch_limit", 10))
+        state_config = self._get_value_or_default(config, "state", {})
+        self.state = StateConfig(self._get_value_or_default(state_config, "enabled", False), self._get_value_or_default(state_config, "path", "state.db"))
+        cache_config = self._get_value_or_default(config, "cache", {})
+        self.cache = CacheConfig(self._get_value_or_default(cache_config, "enabled", True), self._get_value_or_default(cache_config, "media_ttl", 600, True), self._get_value_or_default(cache_config, "tags_ttl", 3600, True), self._get_value_or_default(cache_config, "sections_ttl", 3600, True))
+        rate_limit_config = self._get_value_or_default(config, "rate_limit", {})
+        self.rate_limit = RateLimitConfig(self._get_value_or_default(rate_limit_config, "enabled", True), self._get_value_or_default(rate_limit_config, "initial_concurrency", 4), self._get_value_or_default(rate_limit_config, "max_concurrency", 16), self._get_value_or_default(rate_limit_config, "min_rate", 1), self._get_value_or_default(rate_limit_config, "max_rate", 100), self._get_value_or_default(rate_limit_config, "latency_target", 10, True))
+        if self.rate_limit.initial_concurrency < 1 or self.rate_limit.max_concurrency < self.rate_limit.initial_concurrency:
+            raise ValueError("rate_limit.initial_concurrency must be at least 1 and at most rate_limit.max_concurrency.")
+        deletion_throttle_config = self._get_value_or_default(config, "deletion_throttle", {})
+        self.deletion_throttle = DeletionThrottleConfig(self._get_value_or_default(deletion_throttle_config, "enabled", False), self._get_value_or_default(deletion_throttle_config, "files_per_second", 1), self._get_value_or_default(deletion_throttle_config, "megabytes_per_second", 0), self._get_value_or_default(deletion_throttle_config, "batch_size", 20), self._get_value_or_default(deletion_throttle_config, "during_playback", "slow"), self._get_value_or_default(deletion_throttle_config, "playback_slowdown", 4), self._get_value_or_default(deletion_throttle_config, "max_pause", 7200, True))
+        if self.deletion_throttle.during_playback not in ("ignore", "slow", "pause"):
+            raise ValueError("deletion_throttle.during_playback must be ignore, slow or pause.")
+        if self.deletion_throttle.batch_size < 1:
+            raise ValueError("deletion_throttle.batch_size must be at least 1.")
+        scan_config = self._get_value_or_default(config, "scan", {})
+        self.scan = ScanConfig(self._get_value_or_default(scan_config, "enabled", False), self._get_value_or_default(scan_config, "empty_trash", True), self._get_value_or_default(scan_config, "timeout", 1800, True))
+        off_peak_config = self._get_value_or_default(config, "off_peak", {})
+        self.off_peak = OffPeakConfig(self._get_value_or_default(off_peak_config, "enabled", False), self._parse_windows(self._get_value_or_default(off_peak_config, "windows", [])), self._get_value_or_default(off_peak_config, "jitter", 0, True))
+        if self.off_peak.enabled and not self.off_peak.windows:
+            raise ValueError("off_peak.windows must contain at least one window.")
+        metrics_config = self._get_value_or_default(config, "metrics", {})
+        self.metrics = MetricsConfig(self._get_value_or_default(metrics_config, "enabled", False), self._get_value_or_default(metrics_config, "address", "0.0.0.0"), self._get_value_or_default(metrics_config, "port", 8000))
+        control_config = self._get_value_or_default(config, "control", {})
+        self.control = ControlConfig(self._get_value_or_default(control_config, "enabled", False), self._get_value_or_default(control_config, "address", "127.0.0.1"), self._get_value_or_default(control_config, "port", 8001), self._get_value_or_default(control_config, "token", ""))
+        if self.control.enabled and not self.control.token and not self._is_loopback_address(self.control.address):
+            raise ValueError("control.token must be set when control.address is not a loopback address.")
+        run_report_config = self._get_value_or_default(config, "run_report", {})
+        self.run_report = RunReportConfig(self._get_value_or_default(run_report_config, "enabled", False), self._get_value_or_default(run_report_config, "path", "run_report.json"))
+        experimental_config = self._get_value_or_default(config, "experimental", {})
+        free_space_config = self._get_value_or_default(experimental_config, "free_space", {})
+        progressive_deletion_config = self._get_value_or_default(free_space_config, "progressive_deletion", {})
+        self.experimental = Experimental(FreeSpace(self._get_value_or_default(free_space_config, "enabled", False), self._get_value_or_default(free_space_config, "minimum_free_space_percentage", 0), self._get_value_or_default(free_space_config, "path", ""), self._get_value_or_default(free_space_config, "prevent_age_based_deletion", False), self._get_value_or_default(free_space_config, "prevent_dynamic_load", False), ProgressiveDeletion(self._get_value_or_default(progressive_deletion_config, "enabled", False), self._get_value_or_default(progressive_deletion_config, "maximum_deletion_cycles", 0), self._get_value_or_default(progressive_deletion_config, "threshold_reduction_per_cycle", 86400, True)), free_space_config.get("discover_volumes", False), [VolumeConfig(volume.get("path", ""), volume.get("minimum_free_space_percentage", free_space_config.get("minimum_free_space_percentage", 0))) for volume in free_space_config.get("volumes", [])]))
+        if any(not volume.path for volume in self.experimental.free_space.volumes):
+            raise ValueError("experimental.free_space.volumes must each have a path.")
+
+    def _get_instances(self, config: Dict[str, Any], key: str) -> List[Dict[str, Any]]:
+        """
+        Gets the instances configured under the given key, which is either a single object or a list of objects.
+        """
+        instances = self._get_value_or_default(config, key, {})
+        if isinstance(instances, dict):
+            instances = [instances]
+
+        if not instances:
+            instances = [{}]
+
+        names = [instance.get("name", key if index == 0 else f"{key}-{index + 1}") for index, instance in enumerate(instances)]
+        if len(set(names)) != len(names):
+            raise ValueError(f"{key} instance names must be unique.")
+
+        return instances
+
+    def _parse_plex_config(self, plex_config: Dict[str, Any], index: int) -> PlexConfig:
+        default_name = "plex" if index == 0 else f"plex-{index + 1}"
+        return PlexConfig(self._get_value_or_default(plex_config, "base_url", "https://plex.domain.com"), self._get_value_or_default(plex_config, "token", ""), plex_config.get("name", default_name), plex_config.get("database_path", ""))
+
+    def _parse_radarr_config(self, radarr_config: Dict[str, Any], index: int) -> RadarrConfig:
+        default_name = "radarr" if index == 0 else f"radarr-{index + 1}"
+        return RadarrConfig(self._get_value_or_default(radarr_config, "enabled", False), self._get_value_or_default(radarr_config, "api_key", ""), self._get_value_or_default(radarr_config, "base_url", "https://radarr.domain.com/api/v3"), self._get_value_or_default(radarr_config, "exempt_tag_names", []), self._get_value_or_default(radarr_config, "watched_deletion_threshold", 7776000, True), self._get_value_or_default(radarr_config, "unwatched_deletion_threshold", 2592000, True), radarr_config.get("name", default_name), radarr_config.get("root_folders", []), radarr_config.get("route_tag_names", []), self._parse_section_thresholds(radarr_config))
+
+    def _parse_sonarr_config(self, sonarr_config: Dict[str, Any], index: int) -> SonarrConfig:
+        default_name = "sonarr" if index == 0 else f"sonarr-{index + 1}"
+        dynamic_load_config = self._get_value_or_default(sonarr_config, "dynamic_load", {})
+        return SonarrConfig(self._get_value_or_default(sonarr_config, "enabled", False), self._get_value_or_default(sonarr_config, "api_key", ""), self._get_value_or_default(sonarr_config, "base_url", "https://sonarr.domain.com/api/v3"), self._get_value_or_default(sonarr_config, "monitor_continuing_series", True), self._get_value_or_default(sonarr_config, "exempt_tag_names", []), DynamicLoad(self._get_value_or_default(dynamic_load_config, "enabled", False), self._get_value_or_default(dynamic_load_config, "episodes_to_load", 3), self._get_value_or_default(dynamic_load_config, "episodes_to_keep", 3), self._get_value_or_default(dynamic_load_config, "watched_deletion_threshold", 7776000, True), self._get_value_or_default(dynamic_load_config, "schedule_interval", 600, True)), self._get_value_or_default(sonarr_config, "watched_deletion_threshold", 7776000, True), self._get_value_or_default(sonarr_config, "unwatched_deletion_threshold", 2592000, True), sonarr_config.get("name", default_name), sonarr_config.get("root_folders", []), sonarr_config.get("route_tag_names", []), self._parse_section_thresholds(sonarr_config))
+
+    def _parse_section_thresholds(self, instance_config: Dict[str, Any]) -> Dict[str, SectionThresholds]:
+        """
+        Parses the deletion thresholds of the Plex library sections of an instance. Sections that only override one
+        threshold inherit the other from the instance.
+        """
+        section_thresholds = {}
+        for section, section_config in instance_config.get("section_thresholds", {}).items():
+            section_thresholds[section] = SectionThresholds(self._convert_to_seconds(section_config.get("watched_deletion_threshold", instance_config.get("watched_deletion_threshold", 7776000)), "watched_deletion_threshold"), self._convert_to_seconds(section_config.get("unwatched_deletion_threshold", instance_config.get("unwatched_deletion_threshold", 2592000)), "unwatched_deletion_threshold"))
+
+        return section_thresholds
+
+    def _is_loopback_address(self, address: str) -> bool:
+        """
+        Checks whether the address only accepts connections from the same host.
+        """
+        if address == "localhost":
+            return True
+
         try:
-            self.dry_run = self._get_value_or_default(config, "dry_run", True)
-            self.log_level = self._get_value_or_default(config, "log_level", "INFO")
-            self.schedule_interval = self._get_value_or_default(config, "schedule_interval", 86400, True)
-            plex_config = self._get_value_or_default(config, "plex", {})
-            self.plex = PlexConfig(self._get_value_or_default(plex_config, "base_url", "https://plex.domain.com"), self._get_value_or_default(plex_config, "token", ""))
-            radarr_config = self._get_value_or_default(config, "radarr", {})
-            self.radarr = RadarrConfig(self._get_value_or_default(radarr_config, "enabled", False), self._get_value_or_default(radarr_config, "api_key", ""), self._get_value_or_default(radarr_config, "base_url", "https://radarr.domain.com/api/v3"), self._get_value_or_default(radarr_config, "exempt_tag_names", []), self._get_value_or_default(radarr_config, "watched_deletion_threshold", 7776000, True), self._get_value_or_default(radarr_config, "unwatched_deletion_threshold", 2592000, True))
-            sonarr_config = self._get_value_or_default(config, "sonarr", {})
-            dynamic_load_config = self._get_value_or_default(sonarr_config, "dynamic_load", {})
-            self.sonarr = SonarrConfig(self._get_value_or_default(sonarr_config, "enabled", False), self._get_value_or_default(sonarr_config, "api_key", ""), self._get_value_or_default(sonarr_config, "base_url", "https://sonarr.domain.com/api/v3"), self._get_value_or_default(sonarr_config, "monitor_continuing_series", True), self._get_value_or_default(sonarr_config, "exempt_tag_names", []), DynamicLoad(self._get_value_or_default(dynamic_load_config, "enabled", False), self._get_value_or_default(dynamic_load_config, "episodes_to_load", 3), self._get_value_or_default(dynamic_load_config, "episodes_to_keep", 3), self._get_value_or_default(dynamic_load_config, "watched_deletion_threshold", 7776000, True), self._get_value_or_default(dynamic_load_config, "schedule_interval", 600, True)), self._get_value_or_default(sonarr_config, "watched_deletion_threshold", 7776000, True), self._get_value_or_default(sonarr_config, "unwatched_deletion_threshold", 2592000, True))
-            overseerr_config = self._get_value_or_default(config, "overseerr", {})
-            self.overseerr = OverseerrConfig(self._get_value_or_default(overseerr_config, "enabled", False), self._get_value_or_default(overseerr_config, "api_key", ""), self._get_value_or_default(overseerr_config, "base_url", "https://overseerr.domain.com/api/v1"), self._get_value_or_default(overseerr_config, "fetch_limit", 10))
-            experimental_config = self._get_value_or_default(config, "experimental", {})
-            free_space_config = self._get_value_or_default(experimental_config, "free_space", {})
-            progressive_deletion_config = self._get_value_or_default(free_space_config, "progressive_deletion", {})
-            self.experimental = Experimental(FreeSpace(self._get_value_or_default(free_space_config, "enabled", False), self._get_value_or_default(free_space_config, "minimum_free_space_percentage", 0), self._get_value_or_default(free_space_config, "path", ""), self._get_value_or_default(free_space_config, "prevent_age_based_deletion", False), self._get_value_or_default(free_space_config, "prevent_dynamic_load", False), ProgressiveDeletion(self._get_value_or_default(progressive_deletion_config, "enabled", False), self._get_value_or_default(progressive_deletion_config, "maximum_deletion_cycles", 0), self._get_value_or_default(progressive_deletion_config, "threshold_reduction_per_cycle", 86400, True))))
-        except ValueError as err:
-            print("Error in configuration file:")
-            print(err)
-            sys.exit()
+            return ipaddress.ip_address(address).is_loopback
+        except ValueError:
+            return False
+
+    def _parse_windows(self, windows: List[str]) -> List[Tuple[int, int]]:
+        """
+        Parses daily time windows, such as 01:00-06:00, into the minutes of the day they start and end at. A window
+        that ends before it starts ends on the next day.
+        """
+        parsed_windows = []
+        for window in windows:
+            match = re.match(r"^(\d{1,2}):(\d{2})-(\d{1,2}):(\d{2})$", window.strip())
+            if not match:
+                raise ValueError(f"off_peak.windows must be in the format of HH:MM-HH:MM. (e.g. 01:00-06:00) Got: {window}")
+
+            start_hour, start_minute, end_hour, end_minute = (int(value) for value in match.groups())
+            if start_hour > 23 or end_hour > 24 or start_minute > 59 or end_minute > 59 or (end_hour == 24 and end_minute > 0):
+                raise ValueError(f"off_peak.windows contains an invalid time: {window}")
+
+            start, end = start_hour * 60 + start_minute, end_hour * 60 + end_minute
+            if start == end % 1440:
+                raise ValueError(f"off_peak.windows must not start and end at the same time: {window}")
+            parsed_windows.append((start, end))
+
+        return parsed_windows
 
     def _get_value_or_default(self, config: Dict[str, Any], key: str, default: Any, convert_to_seconds: bool = False) -> Any:
         if key not in config:
-            print("Missing configuration key: %s. Using default value: %s", key, default)
+            logger.debug("[CONFIG] Missing configuration key: %s. Using default value: %s", key, default)
             return default
         
         if convert_to_seconds:
@@ -0,0 +1,160 @@
+"""This module contains the HTTP control endpoint, which reports the progress of the jobs and triggers or cancels them."""
+import hmac
+import json
+import threading
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from src.logger import logger
+
+JOBS = ("get_and_delete", "dynamic_load")
+MAX_BODY_SIZE = 65536
+
+
+@dataclass(frozen=True)
+class JobScope:
+    """
+    The part of the library a triggered job is limited to.
+
+    Attributes:
+        section: The title of the Plex library section. Defaults to every section.
+        series: The title of the series, which also limits the job to series. Defaults to every item.
+    """
+    section: str = None
+    series: str = None
+
+    def is_empty(self):
+        """
+        Checks whether the scope covers the whole library.
+        """
+        return self.section is None and self.series is None
+
+    def contains(self, section, title):
+        """
+        Checks whether an item of the given section and title is in the scope.
+        """
+        return (self.section is None or section == self.section) and (self.series is None or (title or "").lower() == self.series.lower())
+
+    def to_dict(self):
+        """
+        Converts the scope to a JSON serializable dictionary.
+        """
+        return {"section": self.section, "series": self.series}
+
+
+class ControlHandler(BaseHTTPRequestHandler):
+    """
+    Handles the requests of the control endpoint.
+
+    GET /status reports the running job, its progress and the last run of every job. POST /jobs/<job> queues a
+    run of a job, limited to a section or series if given. POST /jobs/cancel cancels the running or paused job.
+    """
+    job_runner = None
+    token = ""
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Handles GET requests."""
+        if not self.__is_authorized():
+            return
+
+        if urlparse(self.path).path.rstrip("/") != "/status":
+            self.__respond(404, {"error": "Not found."})
+            return
+
+        self.__respond(200, self.job_runner.get_status())
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """Handles POST requests."""
+        if not self.__is_authorized():
+            return
+
+        path = urlparse(self.path).path.rstrip("/")
+        try:
+            parameters = self.__get_parameters()
+        except ValueError as err:
+            self.__respond(400, {"error": str(err)})
+            return
+
+        if path == "/jobs/cancel":
+            job = parameters.get("job")
+            if job is not None and job not in JOBS:
+                self.__respond(400, {"error": f"Unknown job: {job}."})
+                return
+
+            cancelled = self.job_runner.cancel_job(job)
+            if cancelled is None:
+                self.__respond(409, {"error": "No job is running or paused."})
+                return
+
+            self.__respond(200, {"cancelled": cancelled})
+            return
+
+        job = path[len("/jobs/"):] if path.startswith("/jobs/") else None
+        if job not in JOBS:
+            self.__respond(404, {"error": "Not found."})
+            return
+
+        scope = JobScope(parameters.get("section") or None, parameters.get("series") or None)
+        if not self.job_runner.trigger_job(job, scope):
+            self.__respond(409, {"error": f"The {job} job is already queued with the same scope."})
+            return
+
+        self.__respond(202, {"queued": job, "scope": scope.to_dict()})
+
+    def __is_authorized(self):
+        if not self.token or hmac.compare_digest(self.headers.get("X-Api-Key", ""), self.token):
+            return True
+
+        self.__respond(401, {"error": "Unauthorized."})
+        return False
+
+    def __get_parameters(self):
+        """
+        Gets the parameters of a request from its query string, or from its JSON body.
+        """
+        parameters = {key: values[-1] for key, values in parse_qs(urlparse(self.path).query).items()}
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_SIZE:
+            raise ValueError("The request body is too large.")
+
+        if length:
+            try:
+                body = json.loads(self.rfile.read(length))
+            except json.JSONDecodeError as err:
+                raise ValueError(f"The request body is not valid JSON: {err}") from err
+
+            if not isinstance(body, dict):
+                raise ValueError("The request body must be a JSON object.")
+            parameters.update({key: str(value) for key, value in body.items() if value is not None})
+
+        return parameters
+
+    def __respond(self, status, body):
+        content = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        logger.debug("[CONTROL] %s - %s", self.address_string(), format % args)
+
+
+def start_control_server(job_runner, control_config):
+    """
+    Starts the HTTP control endpoint of the job runner in a background thread.
+
+    Args:
+        job_runner: The JobRunner whose jobs are reported and triggered.
+        control_config: The configuration of the control endpoint.
+
+    Returns:
+        ThreadingHTTPServer: The running server.
+    """
+    handler = type("BoundControlHandler", (ControlHandler,), {"job_runner": job_runner, "token": control_config.token})
+    server = ThreadingHTTPServer((control_config.address, control_config.port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="control", daemon=True).start()
+    logger.info("[CONTROL] Serving the control endpoint on %s:%s", control_config.address, server.server_address[1])
+    return server
@@ -2,46 +2,137 @@
 This module contains the JobRunner class, 
 which is responsible for running the job function on a schedule.
 """
+import os
+import json
 import time
 import shutil
-from collections import defaultdict
+import heapq
+import itertools
+import logging
+import threading
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import cached_property
+import numpy as np
 import schedule
+from src.config import Config
 from src.clients.plex import PlexClient
 from src.clients.radarr import RadarrClient
 from src.clients.sonarr import SonarrClient
 from src.clients.overseerr import OverseerrClient
+from src.clients.throttle import DeletionThrottle
+from src.control import JobScope
+from src.models.volume import Volume
+from src.metrics import CANDIDATES, FREE_SPACE_PERCENTAGE, record_failure, time_phase, timed_job
+from src.policy import ExpiryPolicy, MediaSnapshot
+from src.profiling import RunCancelledError, cancel_run, check_cancelled, configure as configure_run_report, get_current_report, get_last_report, get_last_reports
 from src.util import convert_bytes, convert_seconds
-from src.logger import logger
+from src.window import OffPeakWindows, WindowClosedError
+from src.logger import logger, configure_logger
+
+CONFIG_CHECK_INTERVAL = 30
+
 
 class JobRunner:
     """
     Class for running the job function on a schedule.
     """
-    def __init__(self, config):
+    def __init__(self, config, force_dry_run: bool = False):
+        self.force_dry_run = force_dry_run
+        self.deadlines = []
+        # The section and the names of the *arr instances of every walked item, to compute its deadline from their thresholds.
+        self.deadline_owners = {}
+        self.plan = None
+        self.deleted_folders = defaultdict(set)
+        self.pending_job = None
+        self.window_end = None
+        # Replaced instead of mutated, so the control endpoint can read it from its own threads.
+        self.completed_phases = frozenset()
+        self.volumes = {}
+        self.scope = None
+        self.triggers = deque()
+        self.trigger_lock = threading.Lock()
+        self.trigger_event = threading.Event()
+        self.cancel_paused_job = False
+        self.__apply_settings(config)
+        self.deletion_throttle = DeletionThrottle(config.deletion_throttle, self.__get_stream_count)
+
+    def __apply_settings(self, config):
+        """
+        Applies the job settings of the given configuration.
+        """
         self.config = config
-        self.dry_run = config.dry_run
+        self.dry_run = config.dry_run or self.force_dry_run
         self.schedule_interval = config.schedule_interval
-        self.plex = PlexClient(config)
-        self.radarr = RadarrClient(config)
-        self.sonarr = SonarrClient(config)
-        self.overseerr = OverseerrClient(config)
-        self.radarr_enabled = config.radarr.enabled
-        self.radarr_watched_deletion_threshold = config.radarr.watched_deletion_threshold
-        self.radarr_unwatched_deletion_threshold = config.radarr.unwatched_deletion_threshold
-        self.sonarr_enabled = config.sonarr.enabled
-        self.dynamic_load = config.sonarr.dynamic_load
-        self.sonarr_watched_deletion_threshold = config.sonarr.watched_deletion_threshold
-        self.sonarr_unwatched_deletion_threshold = config.sonarr.unwatched_deletion_threshold
+        self.schedule_mode = config.schedule_mode
+        self.reconcile_interval = config.reconcile_interval
+        self.radarr_enabled = any(instance.enabled for instance in config.radarr_instances)
+        self.sonarr_enabled = any(instance.enabled for instance in config.sonarr_instances)
+        self.dynamic_load = next((instance.dynamic_load for instance in config.sonarr_instances if instance.enabled and instance.dynamic_load.enabled), config.sonarr.dynamic_load)
         self.overseerr_enabled = config.overseerr.enabled
         self.free_space = config.experimental.free_space
         self.progressive_deletion = config.experimental.free_space.progressive_deletion
+        self.off_peak = OffPeakWindows(config.off_peak) if config.off_peak.enabled else None
+
+    @cached_property
+    def plex_clients(self):
+        """
+        The Plex clients, one per configured server, constructed on first use.
+        """
+        return [self.__create_plex_client(index, instance) for index, instance in enumerate(self.config.plex_instances)]
+
+    def __create_plex_client(self, index, instance):
+        """
+        Creates the client of a Plex server. Every server after the first keeps its own state store next to the configured path.
+        """
+        root, extension = os.path.splitext(self.config.state.path)
+        return PlexClient(self.config, instance, self.config.state.path if index == 0 else f"{root}.{instance.name}{extension}")
+
+    @cached_property
+    def plex(self):
+        """
+        The client of the first Plex server.
+        """
+        return self.plex_clients[0]
+
+    @cached_property
+    def radarr_clients(self):
+        """
+        The clients of the enabled Radarr instances, constructed on first use.
+        """
+        return [RadarrClient(self.config, instance, self.deletion_throttle) for instance in self.config.radarr_instances if instance.enabled]
+
+    @cached_property
+    def sonarr_clients(self):
+        """
+        The clients of the enabled Sonarr instances, constructed on first use.
+        """
+        return [SonarrClient(self.config, instance, self.deletion_throttle) for instance in self.config.sonarr_instances if instance.enabled]
+
+    @cached_property
+    def overseerr(self):
+        """
+        The Overseerr client, constructed on first use.
+        """
+        return OverseerrClient(self.config)
+
+    def __get_stream_count(self):
+        """
+        Gets the number of streams playing on every Plex server.
+        """
+        return sum(plex.get_stream_count() for plex in self.plex_clients)
 
     def __free_space_below_minimum(self):
         """
-        Checks the free space on the drive where the media is stored.
+        Checks the free space on the drive where the media is stored, or on every volume of the *arr instances.
         """
+        if self.__uses_volumes():
+            return self.__volumes_below_minimum()
+
         total, used, free = shutil.disk_usage(self.config.experimental.free_space.path)
         free_space_percentage = round(free / total * 100)
+        FREE_SPACE_PERCENTAGE.labels(self.config.experimental.free_space.path).set(free / total * 100)
         logger.info("[JOB][FREE SPACE] Total: %s. Used: %s. Free: %s. Free space percentage: %d%%.", convert_bytes(total), convert_bytes(used), convert_bytes(free), free_space_percentage)
         if free_space_percentage < self.config.experimental.free_space.minimum_free_space_percentage:
             logger.info("[JOB][FREE SPACE] Free space is below the minimum threshold of %d%%.", self.config.experimental.free_space.minimum_free_space_percentage)
@@ -49,21 +140,1063 @@ class JobRunner:
 
         return False
 
+    def __uses_volumes(self):
+        """
+        Checks whether free space is checked per volume instead of on the free space path.
+        """
+        return self.free_space.discover_volumes or bool(self.free_space.volumes)
+
+    def __get_volumes(self):
+        """
+        Gets the volumes of every enabled *arr instance with their free space target.
+
+        Discovered volumes take the target of the configured volume with the same path, or the minimum free space
+        percentage. Configured volumes that an instance does not list are measured on this host at the same path.
+        """
+        targets = {volume.path.rstrip("/\\") or volume.path: volume.minimum_free_space_percentage for volume in self.free_space.volumes}
+        measured = {}
+        volumes = {}
+
+        for client in (self.radarr_clients if self.radarr_enabled else []) + (self.sonarr_clients if self.sonarr_enabled else []):
+            discovered = client.get_volumes() if self.free_space.discover_volumes else []
+            volumes[client.name] = [Volume(volume["path"], volume["free_space"], volume["total_space"], targets.get(volume["path"], self.free_space.minimum_free_space_percentage)) for volume in discovered]
+
+            for path, minimum_free_space_percentage in targets.items():
+                if any(volume.path == path for volume in volumes[client.name]):
+                    continue
+
+                if path not in measured:
+                    try:
+                        total, _, free = shutil.disk_usage(path)
+                        measured[path] = (free, total)
+                    except OSError as err:
+                        logger.warning("[JOB][FREE SPACE] Failed to check the free space of %s. Error: %s", path, err)
+                        measured[path] = None
+
+                if measured[path] is not None:
+                    volumes[client.name].append(Volume(path, *measured[path], minimum_free_space_percentage))
+
+        return volumes
+
+    def __volumes_below_minimum(self):
+        """
+        Checks the free space on every volume of the *arr instances, and keeps the volumes for limiting deletions.
+        """
+        self.volumes = self.__get_volumes()
+        below_minimum = False
+
+        for name, volumes in self.volumes.items():
+            for volume in volumes:
+                FREE_SPACE_PERCENTAGE.labels(volume.path).set(volume.free_space_percentage)
+                logger.info("[JOB][FREE SPACE] %s %s: Total: %s. Free: %s. Free space percentage: %d%%.", name, volume.path, convert_bytes(volume.total_space), convert_bytes(volume.free_space), round(volume.free_space_percentage))
+                if volume.is_below_minimum():
+                    logger.info("[JOB][FREE SPACE] Free space of %s on %s is below the minimum threshold of %d%%.", volume.path, name, volume.minimum_free_space_percentage)
+                    below_minimum = True
+
+        return below_minimum
+
+    def __limit_deletions_to_low_volumes(self, limit: bool):
+        """
+        Limits the deletions of every *arr instance to titles on volumes below their free space target, or lifts the
+        limit. Titles on volumes that are not known are not deleted while the limit applies.
+        """
+        for client in (self.radarr_clients if self.radarr_enabled else []) + (self.sonarr_clients if self.sonarr_enabled else []):
+            client.volumes = self.volumes.get(client.name, []) if limit else None
+
     def run(self):
         """
         Runs the job function on a schedule.
         """
-        self.get_and_delete_job()
-        schedule.every(self.schedule_interval).seconds.do(self.get_and_delete_job)
+        self.__check_schedule_mode()
+
+        if self.schedule_mode == "deadline":
+            self.__run_in_window(self.reconcile_job)
+        else:
+            self.__run_in_window(self.get_and_delete_job)
 
         if self.dynamic_load.enabled:
-            self.dynamic_load_job()
-            schedule.every(self.dynamic_load.schedule_interval).seconds.do(self.dynamic_load_job)
+            self.__run_cancellable(self.dynamic_load_job)
+
+        self.__schedule_jobs()
 
         while True:
+            self.reload_config()
             schedule.run_pending()
-            time.sleep(1)
+            self.__run_triggered_jobs()
+
+            if self.pending_job is not None and (self.off_peak is None or self.off_peak.is_open()):
+                self.__run_in_window(self.pending_job)
+
+            if self.schedule_mode == "deadline":
+                self.__run_cancellable(self.deadline_job)
+                self.__wait(min(self.__get_seconds_until_next_run(), CONFIG_CHECK_INTERVAL))
+            else:
+                self.__wait(1)
+
+    def __wait(self, seconds):
+        """
+        Waits the given number of seconds, or until a job is triggered through the control endpoint.
+        """
+        self.trigger_event.wait(seconds)
+        self.trigger_event.clear()
+
+    @staticmethod
+    def __run_cancellable(job, *args):
+        """
+        Runs a job that may be cancelled through the control endpoint.
+
+        Returns:
+            bool: False if the job was cancelled.
+        """
+        try:
+            job(*args)
+        except RunCancelledError:
+            logger.info("[JOB][CONTROL] Cancelled the running job.")
+            return False
+
+        return True
+
+    def trigger_job(self, job: str, scope: JobScope = None):
+        """
+        Queues a run of a job, which starts once the running job finished, without waiting for its schedule or an
+        off-peak window. Called from the control endpoint.
+
+        Args:
+            job: The job to run, get_and_delete or dynamic_load.
+            scope: The section or series the run is limited to. Defaults to the whole library.
+
+        Returns:
+            bool: False if the job is already queued with the same scope.
+        """
+        scope = scope or JobScope()
+        with self.trigger_lock:
+            if (job, scope) in self.triggers:
+                return False
+            self.triggers.append((job, scope))
+
+        logger.info("[JOB][CONTROL] Queued a %s job. Section: %s. Series: %s.", job, scope.section or "all", scope.series or "all")
+        self.trigger_event.set()
+        return True
+
+    def cancel_job(self, job: str = None):
+        """
+        Cancels the running job, or else the job paused outside of the off-peak windows. Called from the control
+        endpoint.
+
+        Args:
+            job: The job to cancel. Defaults to any job.
+
+        Returns:
+            str: "running" or "paused" for the job that was cancelled, or None if there was no job to cancel.
+        """
+        if cancel_run(job):
+            logger.info("[JOB][CONTROL] Cancelling the running job.")
+            return "running"
+
+        pending_job = self.pending_job
+        if pending_job is not None and job in (None, self.__get_job_name(pending_job)):
+            # The paused job is dropped by the run loop, which is the only thread that resumes it.
+            self.cancel_paused_job = True
+            self.trigger_event.set()
+            return "paused"
+
+        return None
+
+    @staticmethod
+    def __get_job_name(job):
+        """
+        Gets the name of a job method, such as get_and_delete for get_and_delete_job.
+        """
+        return job.__name__.rsplit("_job", 1)[0]
+
+    def __run_triggered_jobs(self):
+        """
+        Runs the jobs queued through the control endpoint, one at a time.
+
+        A triggered run does not resume or disturb a job paused outside of the off-peak windows, unless it covers
+        the whole library, in which case it takes the place of the paused fetch and delete job.
+        """
+        if self.cancel_paused_job:
+            self.cancel_paused_job = False
+            if self.pending_job is not None:
+                logger.info("[JOB][CONTROL] Cancelled the paused job.")
+                self.pending_job = None
+                self.completed_phases = frozenset()
+
+        while True:
+            with self.trigger_lock:
+                if not self.triggers:
+                    return
+                job, scope = self.triggers.popleft()
+
+            logger.info("[JOB][CONTROL] Running the triggered %s job. Section: %s. Series: %s.", job, scope.section or "all", scope.series or "all")
+            completed_phases, self.completed_phases = self.completed_phases, frozenset()
+            self.scope = None if scope.is_empty() else scope
+            try:
+                finished = self.__run_cancellable(self.get_and_delete_job if job == "get_and_delete" else self.dynamic_load_job)
+            except Exception as err:  # pylint: disable=broad-except
+                logger.error("[JOB][CONTROL] The triggered %s job failed. Error: %s", job, err)
+                finished = False
+            finally:
+                self.scope = None
+                self.completed_phases = completed_phases
+
+            if finished and job == "get_and_delete" and scope.is_empty() and self.pending_job == self.get_and_delete_job:  # pylint: disable=comparison-with-callable
+                logger.info("[JOB][CONTROL] The triggered job covered the paused job, which is not resumed.")
+                self.pending_job = None
+                self.completed_phases = frozenset()
+
+    def get_status(self):
+        """
+        Gets the state of the jobs for the control endpoint: the running job with its phase, progress and estimated
+        time left, the queued and paused jobs, and the last run of every job.
+
+        Returns:
+            dict: The JSON serializable status.
+        """
+        report = get_current_report()
+        running = None
+        if report is not None:
+            phases = [phase for phase in report.get_phases() if phase != "total"]
+            progress = report.get_progress()
+            eta_seconds = [step["eta_seconds"] for step in progress.values() if step["eta_seconds"] is not None and step["processed"] < step["total"]]
+            scope = self.scope
+            running = {
+                "job": report.job,
+                "started_at": datetime.fromtimestamp(report.started_at).isoformat(),
+                "phase": phases[-1] if phases else None,
+                "scope": scope.to_dict() if scope is not None else None,
+                "cancelling": report.cancelled,
+                "progress": progress,
+                "eta_seconds": max(eta_seconds) if eta_seconds else None,
+            }
+
+        pending_job = self.pending_job
+        paused = None
+        if pending_job is not None:
+            paused = {"job": self.__get_job_name(pending_job), "completed_phases": sorted(self.completed_phases), "resumes_at": self.off_peak.get_next_start().isoformat() if self.off_peak is not None else None}
+
+        with self.trigger_lock:
+            queued = [{"job": job, "scope": scope.to_dict()} for job, scope in self.triggers]
+
+        next_run = schedule.next_run()
+        return {
+            "state": "running" if running else "paused" if paused else "idle",
+            "dry_run": self.dry_run,
+            "running": running,
+            "paused": paused,
+            "queued": queued,
+            "next_run": next_run.isoformat() if next_run else None,
+            "last_runs": {job: last_report.to_dict() for job, last_report in get_last_reports().items()},
+        }
+
+    def __check_schedule_mode(self):
+        """
+        Falls back to interval scheduling if deadline scheduling is not supported by the configuration.
+        """
+        if self.schedule_mode == "deadline" and self.plex.state is None:
+            logger.warning("[JOB] Deadline scheduling requires the state store to be enabled. Falling back to interval scheduling.")
+            self.schedule_mode = "interval"
+
+        if self.schedule_mode == "deadline" and len(self.plex_clients) > 1:
+            logger.warning("[JOB] Deadline scheduling supports a single Plex server. Falling back to interval scheduling.")
+            self.schedule_mode = "interval"
+
+    def __schedule_jobs(self):
+        """
+        Schedules the enabled jobs at their configured intervals, replacing any previous schedule.
+        """
+        schedule.clear()
+
+        if self.schedule_mode == "deadline":
+            schedule.every(self.reconcile_interval).seconds.do(self.__run_in_window, self.reconcile_job)
+        else:
+            schedule.every(self.schedule_interval).seconds.do(self.__run_in_window, self.get_and_delete_job)
+
+        if self.dynamic_load.enabled:
+            schedule.every(self.dynamic_load.schedule_interval).seconds.do(self.__run_cancellable, self.dynamic_load_job)
+
+    def __run_in_window(self, job):
+        """
+        Runs a scheduled scan job if an off-peak window is open, or defers it until the next window opens.
+
+        A job that is still running when its window closes is paused, and resumed from the phase and item it
+        stopped at once the next window opens.
+        """
+        if self.pending_job is None:
+            # Only a paused job resumes from the phases it completed.
+            self.completed_phases = frozenset()
+
+        if self.off_peak is None:
+            self.pending_job = None
+            self.__run_cancellable(job)
+            return
+
+        window_end = self.off_peak.get_end()
+        if window_end is None:
+            if self.pending_job is None:
+                logger.info("[JOB][OFF-PEAK] Outside of the off-peak windows. Deferring the job until %s.", self.off_peak.get_next_start())
+            self.pending_job = job
+            return
+
+        self.pending_job = None
+        self.window_end = window_end.timestamp()
+        try:
+            job()
+        except WindowClosedError:
+            logger.info("[JOB][OFF-PEAK] The off-peak window closed. Pausing the job until %s.", self.off_peak.get_next_start())
+            self.pending_job = job
+        except RunCancelledError:
+            logger.info("[JOB][CONTROL] Cancelled the running job.")
+        finally:
+            self.window_end = None
+
+    def __check_window(self):
+        """
+        Stops the running job if it was cancelled, or if its off-peak window has closed.
+        """
+        check_cancelled()
+        if self.window_end is not None and time.time() >= self.window_end:
+            raise WindowClosedError()
+
+    def reload_config(self):
+        """
+        Re-parses the configuration file if it was modified and applies it to the running jobs and clients.
+
+        An invalid file is logged and ignored, and the current configuration stays in effect.
+
+        Returns:
+            bool: True if a new configuration was applied.
+        """
+        if not self.config.has_changed():
+            return False
+
+        try:
+            config = Config(exit_on_error=False)
+        except ValueError as err:
+            logger.error("[CONFIG] %s. Keeping the current configuration.", err)
+            self.config.mtime = Config.get_mtime()
+            return False
+
+        previous_config = self.config
+        previous_schedule = (self.schedule_mode, self.schedule_interval, self.reconcile_interval, self.dynamic_load.enabled, self.dynamic_load.schedule_interval)
+        try:
+            self.apply_config(config)
+        except Exception as err:  # pylint: disable=broad-except
+            logger.error("[CONFIG] Failed to apply the configuration file. Error: %s. Keeping the current configuration.", err)
+            self.apply_config(previous_config)
+            self.config.mtime = Config.get_mtime()
+            return False
+
+        logger.info("[CONFIG] Reloaded the configuration file.")
+
+        if previous_config.schedule_mode != config.schedule_mode:
+            self.__check_schedule_mode()
+            self.deadlines = []
+            if self.schedule_mode == "deadline":
+                self.__build_deadlines()
+
+        if previous_schedule != (self.schedule_mode, self.schedule_interval, self.reconcile_interval, self.dynamic_load.enabled, self.dynamic_load.schedule_interval):
+            self.__schedule_jobs()
+
+        return True
+
+    def apply_config(self, config):
+        """
+        Applies a new configuration to the job settings and clients.
+
+        Clients whose connection settings did not change are kept, together with their caches, connection pools
+        and state stores, and only pick up the new thresholds, tags and folders. The others are recreated on
+        their next use.
+
+        Args:
+            config: The new configuration.
+        """
+        previous_config = self.config
+        self.__apply_settings(config)
+
+        if (config.log_level, config.log_format, config.log_rate_limit) != (previous_config.log_level, previous_config.log_format, previous_config.log_rate_limit):
+            configure_logger(config)
+
+        if config.run_report != previous_config.run_report:
+            configure_run_report(config.run_report.path if config.run_report.enabled else None)
+
+        if config.metrics != previous_config.metrics:
+            logger.warning("[CONFIG] Changes to the metrics endpoint take effect after a restart.")
+
+        if config.control != previous_config.control:
+            logger.warning("[CONFIG] Changes to the control endpoint take effect after a restart.")
+
+        self.deletion_throttle.apply_config(config.deletion_throttle)
+        reconnect = config.rate_limit != previous_config.rate_limit
+
+        if "plex_clients" in self.__dict__:
+            reconnect_plex = reconnect or config.state != previous_config.state
+            plex_clients = {client.name: client for client in self.plex_clients}
+            self.plex_clients = [self.__update_client(plex_clients.get(instance.name), instance, (instance.base_url, instance.token), reconnect_plex, lambda instance=instance, index=index: self.__create_plex_client(index, instance)) for index, instance in enumerate(config.plex_instances)]
+            self.__dict__.pop("plex", None)
+            self.__close_replaced_clients(plex_clients.values(), self.plex_clients)
+
+        if "radarr_clients" in self.__dict__:
+            radarr_clients = {client.name: client for client in self.radarr_clients}
+            self.radarr_clients = [self.__update_client(radarr_clients.get(instance.name), instance, (instance.base_url, instance.api_key), reconnect, lambda instance=instance: RadarrClient(config, instance, self.deletion_throttle)) for instance in config.radarr_instances if instance.enabled]
+            self.__close_replaced_clients(radarr_clients.values(), self.radarr_clients)
+
+        if "sonarr_clients" in self.__dict__:
+            sonarr_clients = {client.name: client for client in self.sonarr_clients}
+            self.sonarr_clients = [self.__update_client(sonarr_clients.get(instance.name), instance, (instance.base_url, instance.api_key), reconnect, lambda instance=instance: SonarrClient(config, instance, self.deletion_throttle)) for instance in config.sonarr_instances if instance.enabled]
+            self.__close_replaced_clients(sonarr_clients.values(), self.sonarr_clients)
+
+        if "overseerr" in self.__dict__:
+            overseerr = self.overseerr
+            self.overseerr = self.__update_client(overseerr, config.overseerr, (config.overseerr.base_url, config.overseerr.api_key), reconnect, lambda: OverseerrClient(config))
+            self.__close_replaced_clients([overseerr], [self.overseerr])
+
+    def __update_client(self, client, instance, connection, reconnect, create):
+        """
+        Applies the configuration of an instance to its existing client, or creates a new client if it connects differently.
+        """
+        if client is None or reconnect or client.get_connection() != connection:
+            return create()
+
+        client.apply_config(self.config, instance)
+        return client
+
+    @staticmethod
+    def __close_replaced_clients(previous_clients, clients):
+        """
+        Closes the sessions and state stores of the previous clients that were replaced or removed.
+        """
+        for client in previous_clients:
+            if not any(client is current_client for current_client in clients):
+                client.close()
+
+    def run_once(self):
+        """
+        Runs a single cycle of every enabled job.
+
+        Returns:
+            bool: True if every job finished without errors or failed calls.
+        """
+        jobs = [("get_and_delete", self.get_and_delete_job)]
+        if self.dynamic_load.enabled:
+            jobs.append(("dynamic_load", self.dynamic_load_job))
+
+        success = True
+        for job, func in jobs:
+            success = self.__run_job(job, func) and success
+
+        return success
+
+    def __run_job(self, job, func):
+        """
+        Runs a job once and checks its run report for failed calls.
+        """
+        try:
+            func()
+        except Exception as err:  # pylint: disable=broad-except
+            logger.error("[JOB] %s job failed. Error: %s", job, err)
+            return False
+
+        report = get_last_report(job)
+        if report is not None and report.failures:
+            logger.error("[JOB] %s job finished with failed calls: %s", job, report.failures)
+            return False
+
+        return True
+
+    @staticmethod
+    def __run_concurrently(func, items):
+        """
+        Calls the function with every item in its own thread and returns the results in order.
+        """
+        if len(items) <= 1:
+            return [func(item) for item in items]
+
+        with ThreadPoolExecutor(max_workers=len(items)) as executor:
+            return list(executor.map(func, items))
+
+    def __get_clients(self, section_type):
+        """
+        Gets the *arr clients that manage the given type of media.
+        """
+        return self.radarr_clients if section_type == "movie" else self.sonarr_clients
+
+    def __get_all_thresholds(self, section_type):
+        """
+        Gets every (watched, unwatched) deletion threshold pair, including the section thresholds, of the *arr instances
+        that manage the given type of media.
+        """
+        clients = self.__get_clients(section_type)
+        return [(client.watched_deletion_threshold, client.unwatched_deletion_threshold) for client in clients] + [thresholds for client in clients for thresholds in client.section_thresholds.values()]
+
+    def __get_thresholds(self, section_type):
+        """
+        Gets the lowest watched and unwatched deletion thresholds of the *arr instances that manage the given type of media.
+        """
+        thresholds = self.__get_all_thresholds(section_type)
+        return min(watched for watched, _ in thresholds), min(unwatched for _, unwatched in thresholds)
+
+    def __get_item_thresholds(self, section_type, rating_key):
+        """
+        Gets the (watched, unwatched) deletion thresholds of the *arr instances that own an item, for its section.
+
+        Items that have not been walked since the deadline scheduling started fall back to the lowest thresholds, so they
+        are re-checked early rather than late.
+        """
+        section, names = self.deadline_owners.get(str(rating_key), (None, ()))
+        thresholds = [client.section_thresholds.get(section, (client.watched_deletion_threshold, client.unwatched_deletion_threshold)) for client in self.__get_clients(section_type) if client.name in names]
+        return thresholds or [self.__get_thresholds(section_type)]
+
+    @staticmethod
+    def __get_routed(client, snapshot):
+        """
+        Gets a boolean mask of the rows of the snapshot that are routed to the given *arr instance.
+        """
+        return np.fromiter((client.owns_locations(media_state.locations) for media_state in snapshot.media_states), dtype=bool, count=len(snapshot))
+
+    def __record_deadline_owners(self, section_type, snapshot):
+        """
+        Records the section and the *arr instances of every row of the snapshot.
+        """
+        routed_by_client = [(client.name, self.__get_routed(client, snapshot)) for client in self.__get_clients(section_type)]
+        for index, rating_key in enumerate(snapshot.rating_keys):
+            self.deadline_owners[str(rating_key)] = (snapshot.media_states[index].section, tuple(name for name, routed in routed_by_client if routed[index]))
+
+    def __get_deadlines(self, section_type, snapshot):
+        """
+        Gets the earliest expiry of every row of the snapshot under the thresholds of the *arr instances it is routed to.
+
+        Rows that were not evaluated or are not routed to any instance have no deadline and are infinite.
+        """
+        deadlines = np.full(len(snapshot), np.inf)
+        for client in self.__get_clients(section_type):
+            policy = ExpiryPolicy(client.watched_deletion_threshold, client.unwatched_deletion_threshold, client.section_thresholds)
+            deadlines = np.fmin(deadlines, np.where(self.__get_routed(client, snapshot), policy.get_expiry(snapshot), np.inf))
+
+        return deadlines
+
+    def __scope_has_media(self, section_type):
+        """
+        Checks whether the scope of a triggered run can hold media of the given type. A run limited to a series has no
+        movies, and a run limited to a section only has media of the type of that section.
+        """
+        if self.scope is None:
+            return True
+
+        if self.scope.series is not None and section_type != "show":
+            return False
+
+        return self.scope.section is None or any(plex.has_section(section_type, self.scope.section) for plex in self.plex_clients)
+
+    def __get_media_states(self, section_type):
+        """
+        Walks the given sections of every Plex server concurrently.
+
+        The walk is shared by all *arr instances, so the history window covers the widest of their thresholds.
+        """
+        thresholds = self.__get_all_thresholds(section_type)
+        results = self.__run_concurrently(lambda plex: plex.get_media_states(section_type, thresholds, self.schedule_interval, self.window_end), self.plex_clients)
+        if any(media_states is None for media_states in results):
+            raise WindowClosedError()
+
+        return [media_state for media_states in results for media_state in media_states]
+
+    def __get_expired_media(self, client, snapshot, current_time=None):
+        """
+        Gets the media that is routed to the given *arr instance and expired under its thresholds.
+
+        Media that is also present on another Plex server is only expired once it is expired on every server. A run
+        limited to a scope only returns the expired media in it.
+
+        Args:
+            client: The *arr client.
+            snapshot: The MediaSnapshot of the media.
+            current_time: The timestamp to evaluate at. Defaults to now.
+
+        Returns:
+            list: (MediaState, expiry date) tuples of the expired media.
+        """
+        policy = ExpiryPolicy(client.watched_deletion_threshold, client.unwatched_deletion_threshold, client.section_thresholds)
+        routed = self.__get_routed(client, snapshot)
+        expiry = policy.get_expiry(snapshot)
+        expired = routed & policy.get_expired(snapshot, current_time)
+        expired &= ~np.isin(snapshot.guids, snapshot.guids[routed & ~expired])
+        if self.scope is not None:
+            # The scope applies after the copies were compared, so a copy outside of it still keeps the item.
+            expired &= np.fromiter((self.scope.contains(media_state.section, media_state.media.title) for media_state in snapshot.media_states), dtype=bool, count=len(snapshot))
+
+        expired_media = []
+        for index in np.flatnonzero(expired):
+            media_state = snapshot.media_states[index]
+            expired_at = datetime.fromtimestamp(expiry[index])
+            if media_state.watched_date is None:
+                logger.info("[PLEX] %s is unwatched and expired. Added at %s. Expired at %s.", media_state.media.title, media_state.added_at, expired_at)
+            else:
+                logger.info("[PLEX] %s is watched and expired. Added at %s. Watched at %s. Expired at %s.", media_state.media.title, media_state.added_at, media_state.watched_date, expired_at)
+            expired_media.append((media_state, expired_at))
+
+        CANDIDATES.labels(client.name, "expired", self.dry_run).inc(len(expired_media))
+
+        return expired_media
+
+    def __delete_expired_media(self, section_type, media_states):
+        """
+        Routes the given media to the *arr instances and runs their deletion pipelines concurrently.
+
+        Returns:
+            list: The Plex items that were expired for at least one instance.
+        """
+        clients = self.__get_clients(section_type)
+        delete = self.delete_movies if section_type == "movie" else self.delete_series
+        snapshot = MediaSnapshot(media_states)
+        if self.schedule_mode == "deadline":
+            self.__record_deadline_owners(section_type, snapshot)
+        expired_media_by_client = [(client, self.__get_expired_media(client, snapshot)) for client in clients]
+
+        expired_media = {}
+        for _, client_expired_media in expired_media_by_client:
+            for media_state, _ in client_expired_media:
+                PlexClient.reload_media(media_state)
+                expired_media[id(media_state)] = media_state.media
+
+        if self.plan is not None:
+            self.__run_concurrently(lambda item: self.__plan_media(item[0], section_type, item[1]), expired_media_by_client)
+        else:
+            media_deleted_by_client = self.__run_concurrently(lambda item: delete(item[0], [media_state.media for media_state, _ in item[1]]), expired_media_by_client)
+            agent = "tmdb" if section_type == "movie" else "tvdb"
+            for (_, client_expired_media), media_deleted in zip(expired_media_by_client, media_deleted_by_client):
+                for media_state, _ in client_expired_media:
+                    if self.__get_external_id(media_state.media, agent) in media_deleted:
+                        self.__add_deleted_folders(media_state.server, section_type, media_state.locations)
+
+            self.__delete_overseerr_media(section_type, dict(zip(clients, media_deleted_by_client)))
+
+        return list(expired_media.values())
+
+    def __delete_overseerr_media(self, section_type, media_deleted_by_client):
+        """
+        Deletes the media that the *arr instances deleted from Overseerr in a single pass, except for media that
+        another enabled instance still holds, so removing a title from one instance keeps its request while a second
+        instance still serves it.
+
+        Args:
+            section_type: The type of the deleted media.
+            media_deleted_by_client: The IDs and titles of the media deleted by every *arr client.
+        """
+        if not self.overseerr_enabled:
+            return
+
+        media_deleted = {}
+        for client_media_deleted in media_deleted_by_client.values():
+            media_deleted.update(client_media_deleted)
+
+        if not media_deleted:
+            return
+
+        held_ids = set()
+        for client in self.__get_clients(section_type):
+            # An instance no longer holds the media it just deleted, even while its cached media still lists it.
+            held_ids.update(client.get_media_ids() - media_deleted_by_client.get(client, {}).keys())
+
+        for media_id in media_deleted.keys() & held_ids:
+            logger.info("[JOB] Keeping %s in Overseerr because another instance still holds it.", media_deleted[media_id])
+
+        self.overseerr.get_and_delete_media({media_id: title for media_id, title in media_deleted.items() if media_id not in held_ids}, self.dry_run)
+
+    def __add_deleted_folders(self, server, section_type, locations):
+        """
+        Remembers the folders of a deleted item, so they are scanned by the Plex server once the job finished.
+        """
+        if self.dry_run or not self.config.scan.enabled:
+            return
+
+        for location in locations:
+            self.deleted_folders[server].add(PlexClient.get_folder(section_type, location))
+
+    def __scan_deleted_folders(self):
+        """
+        Scans the folders that items were deleted from on every Plex server and waits for the scans to finish, so
+        the next cycle does not evaluate items that no longer exist.
+        """
+        for plex in self.plex_clients:
+            folders = self.deleted_folders.pop(plex.name, None)
+            if not folders:
+                continue
+
+            try:
+                plex.scan_folders(folders, self.config.scan.empty_trash, self.config.scan.timeout)
+            except Exception as err:  # pylint: disable=broad-except
+                logger.error("[PLEX][SCAN] Failed to scan the deleted folders. Error: %s", err)
+                record_failure(plex.name, "scan")
+
+    @staticmethod
+    def __get_external_id(media, agent):
+        """
+        Gets the ID of a Plex item in an external database, such as tmdb or tvdb.
+        """
+        return next((guid.id.split(f"{agent}://")[1].split("?")[0] for guid in media.guids if guid.id.startswith(f"{agent}://")), None)
+
+    def __plan_media(self, client, section_type, expired_media):
+        """
+        Adds the media that the given *arr instance would delete to the deletion plan.
+        """
+        agent = "tmdb" if section_type == "movie" else "tvdb"
+        media_states_by_id = {}
+        for media_state, expired_at in expired_media:
+            external_id = self.__get_external_id(media_state.media, agent)
+            if external_id is not None:
+                media_states_by_id[external_id] = (media_state, expired_at)
+
+        planned_media = client.get_deletion_plan({external_id: media_state.media.title for external_id, (media_state, _) in media_states_by_id.items()})
+
+        for item in planned_media:
+            media_state, expired_at = media_states_by_id[item[f"{agent}_id"]]
+            item.update({
+                "type": section_type,
+                "plex_server": media_state.server,
+                "plex_rating_key": str(media_state.media.ratingKey),
+                "plex_locations": media_state.locations,
+                "section": media_state.section,
+                "reason": "unwatched" if media_state.watched_date is None else "watched",
+                "added_at": media_state.added_at.isoformat(),
+                "last_watched": media_state.watched_date.isoformat() if media_state.watched_date else None,
+                "expired_at": expired_at.isoformat(),
+            })
+
+        self.plan.extend(planned_media)
+
+    def write_plan(self, path):
+        """
+        Runs the evaluation of a fetch and delete job without deleting anything and writes the resulting deletion plan.
+
+        Args:
+            path: The path the plan is written to as JSON.
+
+        Returns:
+            bool: True if the job finished without errors or failed calls.
+        """
+        self.plan = []
+        try:
+            success = self.__run_job("get_and_delete", self.get_and_delete_job)
+            planned_media = {(item["service"], item["id"]): item for item in self.plan}
+            plan = {"created_at": datetime.now().isoformat(), "items": sorted(planned_media.values(), key=lambda item: (item["service"], item["title"]))}
+        finally:
+            self.plan = None
+
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(plan, file, indent=2)
+
+        logger.info("[JOB][PLAN] Wrote %s planned deletions to %s.", len(plan["items"]), path)
+        return success
+
+    def apply_plan(self, path):
+        """
+        Executes a deletion plan written by write_plan, without evaluating the Plex libraries again.
+
+        Every planned item is re-validated against its *arr instance, so items that were removed or tagged as
+        exempt since the plan was written are skipped.
+
+        Args:
+            path: The path of the plan.
+
+        Returns:
+            bool: True if the plan was applied without errors or failed calls.
+        """
+        with open(path, encoding="utf-8") as file:
+            plan = json.load(file)
+
+        return self.__run_job("apply", lambda: self.__apply_plan(plan))
+
+    @timed_job("apply")
+    def __apply_plan(self, plan):
+        """
+        Applies the planned deletions of every *arr instance concurrently.
+        """
+        clients = {client.name: client for client in (self.radarr_clients if self.radarr_enabled else []) + (self.sonarr_clients if self.sonarr_enabled else [])}
+        planned_media = defaultdict(list)
+
+        for item in plan.get("items", []):
+            if item.get("service") not in clients:
+                logger.error("[JOB][PLAN] Skipping %s because %s is not an enabled instance.", item.get("title"), item.get("service"))
+                continue
+
+            planned_media[item["service"]].append(item)
+
+        # Planned items are only deleted while they are still on a volume below its target.
+        limit_to_low_volumes = self.free_space.enabled and self.free_space.prevent_age_based_deletion and self.__uses_volumes()
+        if limit_to_low_volumes:
+            self.__volumes_below_minimum()
+        self.__limit_deletions_to_low_volumes(limit_to_low_volumes)
+
+        def apply(name):
+            media_deleted = clients[name].apply_deletion_plan(planned_media[name], self.dry_run)
+            for item in planned_media[name]:
+                if (item.get("tmdb_id") or item.get("tvdb_id")) in media_deleted:
+                    self.__add_deleted_folders(item.get("plex_server"), item.get("type"), item.get("plex_locations", []))
+
+            return media_deleted
+
+        names = list(planned_media.keys())
+        try:
+            media_deleted_by_client = dict(zip((clients[name] for name in names), self.__run_concurrently(apply, names)))
+        finally:
+            self.__limit_deletions_to_low_volumes(False)
+
+        for section_type in ("movie", "show"):
+            section_clients = self.__get_clients(section_type)
+            self.__delete_overseerr_media(section_type, {client: media_deleted for client, media_deleted in media_deleted_by_client.items() if client in section_clients})
+
+        self.__scan_deleted_folders()
+
+    def write_snapshot(self, path):
+        """
+        Captures the inputs of a fetch and delete job and writes them, so the job can be replayed offline.
+
+        The snapshot holds the watch state of every Plex item, the media and tags of every *arr instance, the
+        Overseerr media and the disk usage of the free space path.
+
+        Args:
+            path: The path the snapshot is written to as JSON.
+
+        Returns:
+            bool: True if the snapshot was captured without errors or failed calls.
+        """
+        snapshot = {"created_at": time.time(), "history_window": None, "media": {}, "instances": {}, "overseerr": None, "disk_usage": None}
+        success = self.__run_job("snapshot", lambda: self.__capture_snapshot(snapshot))
+        if not success:
+            return False
+
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(snapshot, file)
+
+        logger.info("[JOB][SNAPSHOT] Wrote %s Plex items and %s *arr instances to %s.", sum(len(rows) for rows in snapshot["media"].values()), len(snapshot["instances"]), path)
+        return True
 
+    @timed_job("snapshot")
+    def __capture_snapshot(self, snapshot):
+        """
+        Fills the snapshot from Plex and the enabled *arr and Overseerr instances.
+        """
+        for section_type, enabled in (("movie", self.radarr_enabled), ("show", self.sonarr_enabled)):
+            if not enabled:
+                continue
+
+            snapshot["media"][section_type] = MediaSnapshot(self.__get_media_states(section_type)).to_rows()
+            history_window = max(max(thresholds) for thresholds in self.__get_all_thresholds(section_type)) + self.schedule_interval * 3
+            snapshot["history_window"] = max(snapshot["history_window"] or 0, history_window)
+            for client in self.__get_clients(section_type):
+                snapshot["instances"][client.name] = client.get_snapshot()
+
+        if self.overseerr_enabled:
+            snapshot["overseerr"] = self.overseerr.get_snapshot()
+
+        if self.free_space.enabled and not self.__uses_volumes():
+            total, _, free = shutil.disk_usage(self.free_space.path)
+            snapshot["disk_usage"] = {"path": self.free_space.path, "total": total, "free": free}
+
+    def replay_snapshot(self, path, watched_thresholds=None, unwatched_thresholds=None):
+        """
+        Replays the deletion decisions of a snapshot written by write_snapshot for every combination of thresholds,
+        without connecting to any service.
+
+        The thresholds of a combination replace the watched and unwatched deletion thresholds of every *arr instance.
+        Section thresholds, exempt tags, routing and progressive deletion are taken from the configuration.
+
+        Args:
+            path: The path of the snapshot.
+            watched_thresholds: The watched deletion thresholds to replay, in seconds. Defaults to those configured.
+            unwatched_thresholds: The unwatched deletion thresholds to replay, in seconds. Defaults to those configured.
+
+        Returns:
+            list: The number of items and bytes each combination deletes and the number of series it unmonitors, or None if the snapshot does not match the
+            configured instances.
+        """
+        with open(path, encoding="utf-8") as file:
+            snapshot = json.load(file)
+
+        media_snapshots = {section_type: MediaSnapshot.from_rows(rows) for section_type, rows in snapshot["media"].items()}
+        clients = [client for section_type in media_snapshots for client in self.__get_clients(section_type)]
+        for client in clients:
+            if client.name not in snapshot["instances"]:
+                logger.error("[JOB][REPLAY] %s is not in the snapshot %s.", client.name, path)
+                return None
+            client.load_snapshot(snapshot["instances"][client.name])
+
+        if watched_thresholds and snapshot["history_window"] is not None and max(watched_thresholds) > snapshot["history_window"]:
+            logger.warning("[JOB][REPLAY] The snapshot only holds watch history of the last %s. Items last watched before that are replayed as unwatched.", convert_seconds(snapshot["history_window"]))
+
+        if self.free_space.enabled and self.__uses_volumes():
+            logger.warning("[JOB][REPLAY] Free space targets per volume are not replayed. Deletions are replayed without free space checks.")
+
+        results = []
+        for watched, unwatched in itertools.product(watched_thresholds or [None], unwatched_thresholds or [None]):
+            thresholds = {client.name: (client.watched_deletion_threshold, client.unwatched_deletion_threshold, client.section_thresholds) for client in clients}
+            for client in clients:
+                client.watched_deletion_threshold = watched if watched is not None else client.watched_deletion_threshold
+                client.unwatched_deletion_threshold = unwatched if unwatched is not None else client.unwatched_deletion_threshold
+
+            try:
+                result = self.__replay(snapshot, media_snapshots)
+            finally:
+                for client in clients:
+                    client.watched_deletion_threshold, client.unwatched_deletion_threshold, client.section_thresholds = thresholds[client.name]
+
+            result.update({"watched_deletion_threshold": watched, "unwatched_deletion_threshold": unwatched})
+            results.append(result)
+            logger.info("[JOB][REPLAY] Watched: %s. Unwatched: %s. Movies: %s. Series: %s. Series unmonitored: %s. Overseerr requests: %s. Total space freed: %s. Deletion cycles: %s.", convert_seconds(watched) if watched is not None else "configured", convert_seconds(unwatched) if unwatched is not None else "configured", result["movies"], result["series"], result["unmonitored_series"], result["overseerr_requests"], convert_bytes(result["size_on_disk"]), result["deletion_cycles"])
+
+        return results
+
+    def __replay(self, snapshot, media_snapshots):
+        """
+        Replays a single fetch and delete job against a snapshot, including progressive deletion cycles.
+
+        Unmonitored series are counted separately and do not count towards the space freed, as the episodes they keep
+        are not known offline.
+        """
+        disk_usage = snapshot["disk_usage"] if self.free_space.enabled and not self.__uses_volumes() else None
+        free_space = self.free_space
+
+        def below_minimum(size_on_disk):
+            return round((disk_usage["free"] + size_on_disk) / disk_usage["total"] * 100) < free_space.minimum_free_space_percentage
+
+        planned_media = {}
+        deletion_cycle = 0
+        if disk_usage is None or not free_space.prevent_age_based_deletion or below_minimum(0):
+            level = logger.level
+            logger.setLevel(max(level, logging.WARNING))
+            try:
+                while True:
+                    for section_type, media_snapshot in media_snapshots.items():
+                        for client in self.__get_clients(section_type):
+                            self.plan = []
+                            self.__plan_media(client, section_type, self.__get_expired_media(client, media_snapshot, snapshot["created_at"]))
+                            planned_media.update({(item["service"], item["id"]): item for item in self.plan})
+                    size_on_disk = sum(item["size_on_disk"] for item in planned_media.values() if item.get("action") != "unmonitor")
+
+                    if disk_usage is None or not free_space.progressive_deletion.enabled or deletion_cycle >= free_space.progressive_deletion.maximum_deletion_cycles or not below_minimum(size_on_disk):
+                        break
+
+                    deletion_cycle += 1
+                    reduction = free_space.progressive_deletion.threshold_reduction_per_cycle
+                    for client in [client for section_type in media_snapshots for client in self.__get_clients(section_type)]:
+                        client.watched_deletion_threshold -= reduction if client.watched_deletion_threshold - reduction > 0 else 0
+                        client.unwatched_deletion_threshold -= reduction if client.unwatched_deletion_threshold - reduction > 0 else 0
+                        client.section_thresholds = {section: tuple(threshold - reduction if threshold - reduction > 0 else threshold for threshold in thresholds) for section, thresholds in client.section_thresholds.items()}
+            finally:
+                self.plan = None
+                logger.setLevel(level)
+
+        deleted_ids = {(item["type"], item.get("tmdb_id") or item.get("tvdb_id")) for item in planned_media.values()}
+        overseerr_requests = [item for item in snapshot["overseerr"] or [] if (item.get("mediaType") == "movie" and ("movie", str(item.get("tmdbId"))) in deleted_ids) or (item.get("mediaType") == "tv" and ("show", str(item.get("tvdbId"))) in deleted_ids)]
+
+        return {
+            "movies": sum(1 for item in planned_media.values() if item["type"] == "movie"),
+            "series": sum(1 for item in planned_media.values() if item["type"] == "show" and item.get("action") != "unmonitor"),
+            "unmonitored_series": sum(1 for item in planned_media.values() if item.get("action") == "unmonitor"),
+            "size_on_disk": sum(item["size_on_disk"] for item in planned_media.values() if item.get("action") != "unmonitor"),
+            "overseerr_requests": len(overseerr_requests),
+            "deletion_cycles": deletion_cycle,
+            "instances": {name: sum(1 for service, _ in planned_media if service == name) for name in snapshot["instances"]},
+        }
+
+    def __get_seconds_until_next_run(self):
+        """
+        Gets the number of seconds until either the next scheduled job or the earliest expiry deadline.
+        """
+        seconds = schedule.idle_seconds()
+        if self.deadlines:
+            deadline_seconds = self.deadlines[0][0] - time.time()
+            seconds = deadline_seconds if seconds is None else min(seconds, deadline_seconds)
+
+        return max(seconds if seconds is not None else 1, 0)
+
+    def __build_deadlines(self):
+        """
+        Rebuilds the min-heap of expiry deadlines from the state store.
+        """
+        deadlines = []
+
+        if self.radarr_enabled:
+            for next_expiry, rating_key in self.plex.state.get_next_expiries("movie", lambda rating_key: self.__get_item_thresholds("movie", rating_key)):
+                deadlines.append((next_expiry, rating_key, "movie"))
+
+        if self.sonarr_enabled:
+            for next_expiry, rating_key in self.plex.state.get_next_expiries("show", lambda rating_key: self.__get_item_thresholds("show", rating_key)):
+                deadlines.append((next_expiry, rating_key, "show"))
+
+        current_time = time.time()
+        self.deadlines = [deadline for deadline in deadlines if deadline[0] > current_time]
+        heapq.heapify(self.deadlines)
+
+        if self.deadlines:
+            logger.info("[JOB][DEADLINE] Tracking %s expiry deadlines. Next deadline in %s.", len(self.deadlines), convert_seconds(self.deadlines[0][0] - current_time))
+
+    def reconcile_job(self):
+        """
+        Runs a full fetch and delete job and rebuilds the expiry deadlines from its results.
+        """
+        self.get_and_delete_job()
+        self.__build_deadlines()
+
+    def deadline_job(self):
+        """
+        Re-validates and deletes the items whose expiry deadline has been reached.
+        """
+        current_time = time.time()
+        due_rating_keys = {"movie": [], "show": []}
+
+        while self.deadlines and self.deadlines[0][0] <= current_time:
+            _, rating_key, section_type = heapq.heappop(self.deadlines)
+            due_rating_keys[section_type].append(rating_key)
+
+        if due_rating_keys["movie"] or due_rating_keys["show"]:
+            self.__delete_due_media(due_rating_keys)
+
+    @timed_job("deadline")
+    def __delete_due_media(self, due_rating_keys):
+        """
+        Re-validates and deletes the given due items.
+        """
+        logger.debug("[JOB][DEADLINE] Deadline job started")
+
+        if (self.free_space.enabled and self.free_space.prevent_age_based_deletion) and not self.__free_space_below_minimum():
+            logger.info("[JOB] Free space is above the minimum threshold. Skipping job.")
+            return
+
+        self.__limit_deletions_to_low_volumes(self.free_space.enabled and self.free_space.prevent_age_based_deletion and self.__uses_volumes())
+
+        for section_type, rating_keys in due_rating_keys.items():
+            if not rating_keys:
+                continue
+
+            thresholds = self.__get_all_thresholds(section_type)
+            media_states = self.plex.get_media_states_by_keys(section_type, rating_keys, thresholds, self.schedule_interval)
+            media = self.__delete_expired_media(section_type, media_states)
+            self.__push_deadlines(section_type, media_states, media)
+
+        self.__scan_deleted_folders()
+        self.__limit_deletions_to_low_volumes(False)
+
+        logger.debug("[JOB][DEADLINE] Deadline job finished")
+
+    def __push_deadlines(self, section_type, media_states, expired_media):
+        """
+        Pushes the new deadlines of re-validated items that turned out not to be expired.
+
+        Every item gets the deadline of the *arr instances and section that own it. Items that are still expired (dry
+        run or failed deletion) are left to the next reconcile.
+        """
+        expired_rating_keys = {str(item.ratingKey) for item in expired_media}
+        snapshot = MediaSnapshot(media_state for media_state in media_states if str(media_state.media.ratingKey) not in expired_rating_keys)
+        current_time = time.time()
+
+        for rating_key, next_expiry in zip(snapshot.rating_keys, self.__get_deadlines(section_type, snapshot)):
+            if current_time < next_expiry < np.inf:
+                heapq.heappush(self.deadlines, (float(next_expiry), str(rating_key), section_type))
+
+    @timed_job("get_and_delete")
     def get_and_delete_job(self, deletion_cycle: int = 0):
         """
         This function gets unplayed movies and TV shows and deletes them if they are eligible for deletion.
@@ -74,31 +1207,62 @@ class JobRunner:
             logger.info("[JOB] Free space is above the minimum threshold. Skipping job.")
             return
 
-        if self.radarr_enabled:
+        # Once free space has been checked, only titles on the volumes that are below their target are deleted.
+        self.__limit_deletions_to_low_volumes(self.free_space.enabled and self.__uses_volumes() and (deletion_cycle > 0 or self.free_space.prevent_age_based_deletion))
+
+        if self.radarr_enabled and "movie" not in self.completed_phases and self.__scope_has_media("movie"):
+            self.__check_window()
             logger.debug("[JOB] Fetching and deleting movies")
-            self.get_and_delete_movies()
+            with time_phase("get_and_delete", "movies"):
+                self.get_and_delete_movies()
+            self.completed_phases |= {"movie"}
         
-        if self.sonarr_enabled:
+        if self.sonarr_enabled and "show" not in self.completed_phases and self.__scope_has_media("show"):
+            self.__check_window()
             logger.debug("[JOB] Fetching and deleting series")
-            self.get_and_delete_series()
-
-        if self.free_space.enabled and self.progressive_deletion.enabled and self.__free_space_below_minimum():
-            self.radarr_watched_deletion_threshold -= self.progressive_deletion.threshold_reduction_per_cycle if self.radarr_watched_deletion_threshold - self.progressive_deletion.threshold_reduction_per_cycle > 0 else 0
-            self.radarr_unwatched_deletion_threshold -= self.progressive_deletion.threshold_reduction_per_cycle if self.radarr_unwatched_deletion_threshold - self.progressive_deletion.threshold_reduction_per_cycle > 0 else 0
-            self.sonarr_watched_deletion_threshold -= self.progressive_deletion.threshold_reduction_per_cycle if self.sonarr_watched_deletion_threshold - self.progressive_deletion.threshold_reduction_per_cycle > 0 else 0
-            self.sonarr_unwatched_deletion_threshold -= self.progressive_deletion.threshold_reduction_per_cycle if self.sonarr_unwatched_deletion_threshold - self.progressive_deletion.threshold_reduction_per_cycle > 0 else 0
-            logger.info("[JOB][FREE SPACE] Free space is still below the minimum threshold. Decreasing deletion thresholds by %s. New thresholds: Radarr watched: %s. Radarr unwatched: %s. Sonarr watched: %s. Sonarr unwatched: %s.", convert_seconds(self.progressive_deletion.threshold_reduction_per_cycle), convert_seconds(self.radarr_watched_deletion_threshold), convert_seconds(self.radarr_unwatched_deletion_threshold), convert_seconds(self.sonarr_watched_deletion_threshold), convert_seconds(self.sonarr_unwatched_deletion_threshold))
-            self.get_and_delete_job(deletion_cycle + 1)
+            with time_phase("get_and_delete", "series"):
+                self.get_and_delete_series()
+            self.completed_phases |= {"show"}
+
+        self.completed_phases = frozenset()
+
+        with time_phase("get_and_delete", "scan"):
+            self.__scan_deleted_folders()
+
+        clients = (self.radarr_clients if self.radarr_enabled else []) + (self.sonarr_clients if self.sonarr_enabled else [])
+        if self.free_space.enabled and self.progressive_deletion.enabled and deletion_cycle < self.progressive_deletion.maximum_deletion_cycles and self.__free_space_below_minimum():
+            thresholds = {client.name: (client.watched_deletion_threshold, client.unwatched_deletion_threshold, client.section_thresholds) for client in clients}
+            for client in clients:
+                client.watched_deletion_threshold -= self.progressive_deletion.threshold_reduction_per_cycle if client.watched_deletion_threshold - self.progressive_deletion.threshold_reduction_per_cycle > 0 else 0
+                client.unwatched_deletion_threshold -= self.progressive_deletion.threshold_reduction_per_cycle if client.unwatched_deletion_threshold - self.progressive_deletion.threshold_reduction_per_cycle > 0 else 0
+                client.section_thresholds = {section: tuple(threshold - self.progressive_deletion.threshold_reduction_per_cycle if threshold - self.progressive_deletion.threshold_reduction_per_cycle > 0 else threshold for threshold in thresholds) for section, thresholds in client.section_thresholds.items()}
+            logger.info("[JOB][FREE SPACE] Free space is still below the minimum threshold. Decreasing deletion thresholds by %s. New thresholds: %s", convert_seconds(self.progressive_deletion.threshold_reduction_per_cycle), self.__format_thresholds(clients))
+            try:
+                self.get_and_delete_job(deletion_cycle + 1)
+            except BaseException:
+                # A cycle that is cancelled, paused or fails does not leave the thresholds lowered.
+                for client in clients:
+                    client.watched_deletion_threshold, client.unwatched_deletion_threshold, client.section_thresholds = thresholds[client.name]
+                raise
         elif deletion_cycle > 0 and deletion_cycle <= self.progressive_deletion.maximum_deletion_cycles:
-            self.radarr_watched_deletion_threshold += (self.progressive_deletion.threshold_reduction_per_cycle * deletion_cycle)
-            self.radarr_unwatched_deletion_threshold += (self.progressive_deletion.threshold_reduction_per_cycle * deletion_cycle)
-            self.sonarr_watched_deletion_threshold += (self.progressive_deletion.threshold_reduction_per_cycle * deletion_cycle)
-            self.sonarr_unwatched_deletion_threshold += (self.progressive_deletion.threshold_reduction_per_cycle * deletion_cycle)
-            logger.info("[JOB][FREE SPACE] Free space is above the minimum threshold. Increasing deletion thresholds to original levels. New thresholds: Radarr watched: %s. Radarr unwatched: %s. Sonarr watched: %s. Sonarr unwatched: %s.", convert_seconds(self.radarr_watched_deletion_threshold), convert_seconds(self.radarr_unwatched_deletion_threshold), convert_seconds(self.sonarr_watched_deletion_threshold), convert_seconds(self.sonarr_unwatched_deletion_threshold))
+            for client in clients:
+                client.watched_deletion_threshold += (self.progressive_deletion.threshold_reduction_per_cycle * deletion_cycle)
+                client.unwatched_deletion_threshold += (self.progressive_deletion.threshold_reduction_per_cycle * deletion_cycle)
+                client.section_thresholds = {section: tuple(threshold + (self.progressive_deletion.threshold_reduction_per_cycle * deletion_cycle) for threshold in thresholds) for section, thresholds in client.section_thresholds.items()}
+            logger.info("[JOB][FREE SPACE] Free space is above the minimum threshold. Increasing deletion thresholds to original levels. New thresholds: %s", self.__format_thresholds(clients))
 
+        self.__limit_deletions_to_low_volumes(False)
 
         logger.debug("[JOB] Fetch and delete job finished")
 
+    @staticmethod
+    def __format_thresholds(clients):
+        """
+        Formats the deletion thresholds of the given clients for logging.
+        """
+        return " ".join(f"{client.name} watched: {convert_seconds(client.watched_deletion_threshold)}. {client.name} unwatched: {convert_seconds(client.unwatched_deletion_threshold)}." for client in clients)
+
+    @timed_job("dynamic_load")
     def dynamic_load_job(self):
         """
         This function dynamically loads and unloads the Plex library based on the current time.
@@ -111,61 +1275,77 @@ class JobRunner:
 
         if self.sonarr_enabled:
             logger.debug("[JOB] Dynamic loading series")
-            self.dynamic_load_series()
+            with time_phase("dynamic_load", "series"):
+                self.dynamic_load_series()
 
         logger.debug("[JOB] Dynamic load job finished")
 
     def get_and_delete_movies(self):
         """
-        Fetches unplayed movies and deletes them if they are eligible for deletion.
+        Fetches unplayed movies and deletes them from every Radarr instance they are eligible for deletion in.
+        """
+        media_states = self.__get_media_states("movie")
+        self.__delete_expired_media("movie", media_states)
+
+    def delete_movies(self, radarr, media):
         """
-        media = self.plex.get_expired_media("movie", self.radarr_watched_deletion_threshold, self.radarr_unwatched_deletion_threshold, self.schedule_interval)
+        Deletes the given expired Plex movies from a Radarr instance.
 
+        Returns:
+            dict: The TMDB IDs and titles of the deleted movies.
+        """
         media_to_delete = {}
         for item in media:
-            tmdb_id = next(
-                (guid.id.split("tmdb://")[1].split("?")[0] for guid in item.guids if guid.id.startswith("tmdb://")),
-                None,
-            )
+            tmdb_id = self.__get_external_id(item, "tmdb")
             if tmdb_id is not None:
                 media_to_delete[tmdb_id] = item.title
 
-        media_deleted = self.radarr.get_and_delete_media(media_to_delete, self.dry_run)
-        if self.overseerr_enabled:
-            self.overseerr.get_and_delete_media(media_deleted, self.dry_run)
+        return radarr.get_and_delete_media(media_to_delete, self.dry_run)
 
     def get_and_delete_series(self):
         """
-        Fetches unplayed TV shows and deletes them if they are eligible for deletion.
+        Fetches unplayed TV shows and deletes them from every Sonarr instance they are eligible for deletion in.
+        """
+        media_states = self.__get_media_states("show")
+        self.__delete_expired_media("show", media_states)
+
+    def delete_series(self, sonarr, media):
         """
-        media = self.plex.get_expired_media("show", self.sonarr_watched_deletion_threshold, self.sonarr_unwatched_deletion_threshold, self.schedule_interval)
+        Deletes the given expired Plex series from a Sonarr instance.
 
+        Returns:
+            dict: The TVDB IDs and titles of the deleted series.
+        """
         media_to_delete = {}
         for item in media:
-            tvdb_id = next(
-                (guid.id.split("tvdb://")[1].split("?")[0] for guid in item.guids if guid.id.startswith("tvdb://")),
-                None,
-            )
+            tvdb_id = self.__get_external_id(item, "tvdb")
             if tvdb_id is not None:
                 media_to_delete[tvdb_id] = item.title
 
-        media_deleted = self.sonarr.get_and_delete_media(media_to_delete, self.dry_run)
-        if self.overseerr_enabled:
-            self.overseerr.get_and_delete_media(media_deleted, self.dry_run)
+        return sonarr.get_and_delete_media(media_to_delete, self.dry_run)
 
     def dynamic_load_series(self):
         """
         Dynamically loads and unloads TV shows based on current media consumption.
         """
-        dynamic_media = self.plex.get_dynamic_load_media(self.dynamic_load.watched_deletion_threshold)
+        clients = [client for client in self.sonarr_clients if client.dynamic_load.enabled]
+        if not clients:
+            return
 
-        media_to_load = defaultdict(list)
-        for item in dynamic_media:
-            tvdb_id = next(
-                (guid.id.split("tvdb://")[1].split("?")[0] for guid in item.media.guids if guid.id.startswith("tvdb://")),
-                None,
-            )
-            if tvdb_id is not None:
-                media_to_load[tvdb_id] = item
+        watched_media_expiry_seconds = max(client.dynamic_load.watched_deletion_threshold for client in clients)
+        results = self.__run_concurrently(lambda plex: plex.get_dynamic_load_media(watched_media_expiry_seconds), self.plex_clients)
+        dynamic_media = [item for items in results for item in items if self.scope is None or self.scope.contains(getattr(item.media, "librarySectionTitle", None), item.media.title)]
+
+        def load(sonarr):
+            media_to_load = defaultdict(list)
+            for item in dynamic_media:
+                if not sonarr.owns_locations(item.media.locations):
+                    continue
+
+                tvdb_id = self.__get_external_id(item.media, "tvdb")
+                if tvdb_id is not None:
+                    media_to_load[tvdb_id] = item
+
+            sonarr.get_dynamic_load_media(media_to_load, self.dry_run)
 
-        self.sonarr.get_dynamic_load_media(media_to_load, self.dry_run)
+        self.__run_concurrently(load, clients)
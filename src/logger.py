@@ -1,20 +1,165 @@
 """This module is used to configure the logger for the application."""
+import atexit
+import json
 import logging
-from logging.handlers import RotatingFileHandler
-from src.config import Config
-
-config = Config()
+import queue
+import re
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
 logger = logging.getLogger()
-logger.setLevel(logging.getLevelName(config.log_level))
 
-file_handler = RotatingFileHandler('app.log', maxBytes=1000000, backupCount=3)
-stream_handler = logging.StreamHandler()
+TAG_PATTERN = re.compile(r"\[([^\]]+)\]")
+TAG_PREFIX_PATTERN = re.compile(r"^(?:\[[^\]]+\])+")
+
+_listener = None
+_queue_handler = None
+_rate_limit_filter = None
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    Queue handler that leaves formatting to the background writer thread.
+
+    The standard handler merges the arguments into the message before queueing it, which would keep the
+    cost of formatting in the hot loops that log.
+    """
+    def prepare(self, record):
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formatter that writes every record as a single JSON line.
+    """
+    def format(self, record):
+        message = record.getMessage()
+        tag_prefix = TAG_PREFIX_PATTERN.match(message)
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "tags": TAG_PATTERN.findall(tag_prefix.group(0)) if tag_prefix else [],
+            "message": message,
+            "template": record.msg if isinstance(record.msg, str) else str(record.msg),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+
+        return json.dumps(entry, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Filter that drops informational records above a rate per message template.
+
+    The number of dropped records of a template is logged once its next one-second window starts, or when the
+    logger is stopped. Warnings and errors are never dropped.
+    """
+    def __init__(self, rate: int):
+        super().__init__()
+        self.rate = rate
+        self.windows = {}
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or record.name == __name__:
+            return True
+
+        window = int(record.created)
+        with self.lock:
+            state = self.windows.get(record.msg)
+            if state is None or state[0] != window:
+                suppressed = state[2] if state is not None else 0
+                self.windows[record.msg] = [window, 1, 0]
+            else:
+                suppressed = 0
+                state[1] += 1
+                if state[1] > self.rate:
+                    state[2] += 1
+                    return False
+
+        if suppressed:
+            self.__log_suppressed(record.msg, suppressed)
+
+        return True
+
+    def flush(self):
+        """
+        Logs the number of records dropped in the current windows.
+        """
+        with self.lock:
+            suppressed = [(template, state[2]) for template, state in self.windows.items() if state[2]]
+            self.windows.clear()
+
+        for template, count in suppressed:
+            self.__log_suppressed(template, count)
+
+    @staticmethod
+    def __log_suppressed(template, count):
+        logging.getLogger(__name__).info("Suppressed %s similar messages: %s", count, template)
+
+
+def configure_logger(config):
+    """
+    Configures the application logger from the given configuration.
+
+    Records are put on a queue and written to app.log and stderr by a background thread.
+
+    Args:
+        config: The application configuration.
+
+    Returns:
+        None
+    """
+    global _listener, _queue_handler, _rate_limit_filter  # pylint: disable=global-statement
+    stop_logger()
+
+    logger.setLevel(logging.getLevelName(config.log_level))
+
+    file_handler = RotatingFileHandler('app.log', maxBytes=1000000, backupCount=3)
+    stream_handler = logging.StreamHandler()
+
+    if config.log_format == "json":
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+
+    file_handler.setFormatter(formatter)
+    stream_handler.setFormatter(formatter)
+
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
+
+    log_queue = queue.SimpleQueue()
+    _queue_handler = DeferredQueueHandler(log_queue)
+    if config.log_rate_limit > 0:
+        _rate_limit_filter = RateLimitFilter(config.log_rate_limit)
+        _queue_handler.addFilter(_rate_limit_filter)
+
+    _listener = QueueListener(log_queue, file_handler, stream_handler)
+    _listener.start()
+    logger.addHandler(_queue_handler)
+
+
+def stop_logger():
+    """
+    Writes the records that are still queued and stops the background writer thread.
+    """
+    global _listener, _queue_handler, _rate_limit_filter  # pylint: disable=global-statement
+    if _rate_limit_filter is not None:
+        _rate_limit_filter.flush()
+        _rate_limit_filter = None
+
+    if _queue_handler is not None:
+        logger.removeHandler(_queue_handler)
+        _queue_handler = None
 
-formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
 
-file_handler.setFormatter(formatter)
-stream_handler.setFormatter(formatter)
 
-logger.addHandler(file_handler)
-logger.addHandler(stream_handler)
+atexit.register(stop_logger)
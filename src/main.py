@@ -1,7 +1,23 @@
 """Main module for the application."""
 from src.config import Config
+from src.control import start_control_server
 from src.jobs import JobRunner
-from src.logger import logger
+from src.logger import logger, configure_logger
+from src.metrics import start_metrics_server
+from src import profiling
+
+EXIT_SUCCESS = 0
+EXIT_FAILURE = 1
+
+
+def parse_thresholds(config, value, name):
+    """
+    Parses a comma separated list of thresholds, such as 30d,90d, into seconds.
+    """
+    if not value:
+        return None
+
+    return [config._convert_to_seconds(threshold.strip(), name) for threshold in value.split(",")]  # pylint: disable=protected-access
 
 
 def main(args):
@@ -12,13 +28,64 @@ def main(args):
         args: Command line arguments.
 
     Returns:
-        None
+        int: The exit status of the application.
     """
-    logger.info("Starting Eraserr")
     config = Config()
+    configure_logger(config)
+    logger.info("Starting Eraserr")
 
     if args.dry_run:
         config.dry_run = args.dry_run
 
-    job_runner = JobRunner(config)
+    if args.apply:
+        config.dry_run = args.dry_run
+
+    if args.snapshot:
+        # The state store would skip the items that are not due, which the replay still has to evaluate.
+        config.state.enabled = False
+
+    if config.metrics.enabled and not args.replay:
+        start_metrics_server(config.metrics.address, config.metrics.port)
+
+    profiling.configure(config.run_report.path if config.run_report.enabled else None)
+
+    job_runner = JobRunner(config, force_dry_run=args.dry_run)
+
+    if args.plan:
+        success = job_runner.write_plan(args.plan)
+        return EXIT_SUCCESS if success else EXIT_FAILURE
+
+    if args.apply:
+        success = job_runner.apply_plan(args.apply)
+        logger.info("Eraserr applied %s %s", args.apply, "successfully" if success else "with errors")
+        return EXIT_SUCCESS if success else EXIT_FAILURE
+
+    if args.snapshot:
+        success = job_runner.write_snapshot(args.snapshot)
+        return EXIT_SUCCESS if success else EXIT_FAILURE
+
+    if args.replay:
+        try:
+            watched_thresholds = parse_thresholds(config, args.watched_thresholds, "--watched-thresholds")
+            unwatched_thresholds = parse_thresholds(config, args.unwatched_thresholds, "--unwatched-thresholds")
+        except ValueError as err:
+            logger.error("%s", err)
+            return EXIT_FAILURE
+
+        results = job_runner.replay_snapshot(args.replay, watched_thresholds, unwatched_thresholds)
+        return EXIT_SUCCESS if results is not None else EXIT_FAILURE
+
+    if args.profile:
+        success = profiling.profile(job_runner.run_once, args.profile)
+        return EXIT_SUCCESS if success else EXIT_FAILURE
+
+    if args.once:
+        success = job_runner.run_once()
+        logger.info("Eraserr finished %s", "successfully" if success else "with errors")
+        return EXIT_SUCCESS if success else EXIT_FAILURE
+
+    if config.control.enabled:
+        start_control_server(job_runner, config.control)
+
     job_runner.run()
+    return EXIT_SUCCESS
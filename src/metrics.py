@@ -0,0 +1,118 @@
+"""This module contains the Prometheus metrics exposed by the application."""
+import re
+import time
+from contextlib import contextmanager
+from functools import wraps
+from urllib.parse import urlparse
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+from src.logger import logger
+from src.profiling import get_current_report, phase as phase_of_run, record_failure as record_report_failure, record_request, run_report, span
+
+REQUEST_COUNT = Counter("eraserr_requests_total", "Number of HTTP requests sent to each service.", ["service", "method", "endpoint", "status"])
+REQUEST_LATENCY = Histogram("eraserr_request_duration_seconds", "Latency of HTTP requests sent to each service.", ["service", "method", "endpoint"])
+CYCLE_DURATION = Histogram(
+    "eraserr_cycle_duration_seconds",
+    "Duration of each job cycle and its phases.",
+    ["job", "phase"],
+    buckets=(1, 5, 15, 30, 60, 300, 900, 1800, 3600, 7200, 14400, 28800, float("inf")),
+)
+CANDIDATES = Counter("eraserr_candidates_total", "Number of media items evaluated, deleted and exempted.", ["service", "outcome", "dry_run"])
+BYTES_FREED = Counter("eraserr_bytes_freed_total", "Number of bytes freed by deletions.", ["service", "dry_run"])
+FREE_SPACE_PERCENTAGE = Gauge("eraserr_free_space_percentage", "Free space percentage of the monitored path.", ["path"])
+RETRY_COUNT = Counter("eraserr_retries_total", "Number of retried calls to each service.", ["service"])
+FAILURE_COUNT = Counter("eraserr_failures_total", "Number of failed calls to each service.", ["service", "operation"])
+LIMITER_CONCURRENCY = Gauge("eraserr_limiter_concurrency", "Number of concurrent requests currently allowed to each service.", ["service"])
+LIMITER_RATE = Gauge("eraserr_limiter_rate", "Number of requests per second currently allowed to each service, or 0 if the rate is not limited.", ["service"])
+LIMITER_DECREASES = Counter("eraserr_limiter_decreases_total", "Number of times the limits of each service were decreased.", ["service", "reason"])
+CACHE_REQUESTS = Counter("eraserr_cache_requests_total", "Number of cached resource lookups, by whether they hit the cache, shared a fetch in progress or missed.", ["service", "resource", "result"])
+DELETION_THROTTLE_SECONDS = Counter("eraserr_deletion_throttle_seconds_total", "Number of seconds deletions waited for the deletion budget or for Plex playback to stop.", ["service", "reason"])
+
+ID_SEGMENT_PATTERN = re.compile(r"/\d+(?=/|$)")
+
+
+def start_metrics_server(address: str, port: int):
+    """
+    Starts the HTTP server that exposes the metrics to Prometheus.
+    """
+    start_http_server(port, addr=address)
+    logger.info("[METRICS] Serving metrics on %s:%s", address, port)
+
+
+def get_endpoint(url: str):
+    """
+    Converts a request URL to an endpoint label by dropping the query and replacing IDs with a placeholder.
+    """
+    return ID_SEGMENT_PATTERN.sub("/{id}", urlparse(url).path)
+
+
+def instrument_session(session, service: str):
+    """
+    Adds a response hook to the given requests session that records request counts and latencies.
+    """
+    def record_response(response, *args, **kwargs):
+        endpoint = get_endpoint(response.request.url)
+        REQUEST_COUNT.labels(service, response.request.method, endpoint, response.status_code).inc()
+        REQUEST_LATENCY.labels(service, response.request.method, endpoint).observe(response.elapsed.total_seconds())
+        record_request(service, response.request.method, endpoint)
+
+    session.hooks["response"].append(record_response)
+    return session
+
+
+@contextmanager
+def time_phase(job: str, phase: str):
+    """
+    Records the duration of a job phase, both as a metric and as a span of the run in progress.
+    """
+    start = time.perf_counter()
+    try:
+        with span(f"{job}.{phase}"), phase_of_run(phase):
+            yield
+    finally:
+        CYCLE_DURATION.labels(job, phase).observe(time.perf_counter() - start)
+
+
+def record_failure(service: str, operation: str):
+    """
+    Records a failed call to a service, both as a metric and in the run in progress.
+    """
+    FAILURE_COUNT.labels(service, operation).inc()
+    record_report_failure(service, operation)
+
+
+def timed_job(job: str):
+    """
+    Decorator that records the total duration of a job and writes its run report.
+
+    Nested calls, such as the recursive cycles of progressive deletion, are folded into the outermost run like the
+    run report, so the total duration is only recorded once per run.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            nested = get_current_report() is not None
+            with run_report(job):
+                if nested:
+                    return func(*args, **kwargs)
+
+                with time_phase(job, "total"):
+                    return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class RetryLogger:
+    """
+    Logger passed to the retry decorator that counts retries before forwarding the warning to the application logger.
+    """
+    def __init__(self, service: str):
+        self.service = service
+
+    def warning(self, msg, *args, **kwargs):
+        """
+        Counts a retry and logs the warning.
+        """
+        RETRY_COUNT.labels(self.service).inc()
+        logger.warning(f"[{self.service.upper()}] {msg}", *args, **kwargs)
@@ -0,0 +1,55 @@
+"""Module for EpisodeIndex class."""
+import time
+from datetime import datetime, timedelta
+
+
+class EpisodeIndex:
+    """
+    Class for the regular episodes of a Sonarr series, sorted by season and episode number.
+
+    The episodes that aired within the watched deletion threshold, and the position of each of them, are kept
+    until an episode airs or leaves the threshold, so most lookups do not filter or sort the episodes again.
+    """
+    def __init__(self, episodes: list, signature):
+        self.signature = signature
+        self.episodes = sorted((episode for episode in episodes if episode.get("seasonNumber", -1) != 0), key=lambda episode: (episode["seasonNumber"], episode["episodeNumber"]))
+        self.aired_episodes = []
+        self.positions = {}
+        self.threshold = None
+        self.valid_until = None
+
+    def get_aired_episodes(self, watched_deletion_threshold: int):
+        """
+        Gets the episodes that aired within the watched deletion threshold.
+
+        Args:
+            watched_deletion_threshold: The number of seconds after which aired episodes are left out.
+
+        Returns:
+            tuple: The sorted episodes, and a dictionary from (season number, episode number) to their position.
+        """
+        now = datetime.now()
+        if self.threshold == watched_deletion_threshold and now < self.valid_until:
+            return self.aired_episodes, self.positions
+
+        aired_before = now.isoformat()
+        aired_after = datetime.fromtimestamp(time.time() - watched_deletion_threshold).isoformat()
+        self.aired_episodes = []
+        self.valid_until = datetime.max
+
+        for episode in self.episodes:
+            # Episodes without an air date have not aired yet.
+            air_date = episode.get("airDate")
+            if air_date is None:
+                continue
+
+            if air_date >= aired_before:
+                self.valid_until = min(self.valid_until, datetime.fromisoformat(air_date))
+            elif air_date > aired_after:
+                self.aired_episodes.append(episode)
+                self.valid_until = min(self.valid_until, datetime.fromisoformat(air_date) + timedelta(seconds=watched_deletion_threshold))
+
+        self.positions = {(episode["seasonNumber"], episode["episodeNumber"]): index for index, episode in enumerate(self.aired_episodes)}
+        self.threshold = watched_deletion_threshold
+
+        return self.aired_episodes, self.positions
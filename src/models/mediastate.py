@@ -0,0 +1,11 @@
+"""Module for MediaState class."""
+class MediaState:
+    """Class for representing the watch state of a Plex item."""
+    def __init__(self, media, added_at, watched_date, server: str = "plex", section: str = None):
+        self.media = media
+        self.added_at = added_at
+        self.watched_date = watched_date
+        self.server = server
+        self.section = section
+        self.locations = list(getattr(media, "locations", None) or [])
+        self.reloaded = False
@@ -0,0 +1,20 @@
+"""Module for SnapshotMedia class."""
+from collections import namedtuple
+
+Guid = namedtuple("Guid", ["id"])
+Label = namedtuple("Label", ["tag"])
+MediaPart = namedtuple("MediaPart", ["size"])
+Media = namedtuple("Media", ["parts"])
+
+
+class SnapshotMedia:  # pylint: disable=invalid-name,too-few-public-methods
+    """Class for representing a Plex item restored from a snapshot or read from the Plex database, in place of the plexapi object."""
+    def __init__(self, row: dict):
+        self.ratingKey = row["rating_key"]
+        self.guid = row["guid"]
+        self.type = row["type"]
+        self.title = row["title"]
+        self.guids = [Guid(guid) for guid in row["guids"]]
+        self.labels = [Label(label) for label in row["labels"]]
+        self.media = [Media([MediaPart(row["size"])])]
+        self.locations = row["locations"]
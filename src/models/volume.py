@@ -0,0 +1,46 @@
+"""Module for Volume class."""
+
+
+class Volume:
+    """Class for representing a disk that media is stored on, with its free space target."""
+    def __init__(self, path: str, free_space: int, total_space: int, minimum_free_space_percentage: int):
+        self.path = path.rstrip("/\\") or path
+        self.free_space = free_space
+        self.total_space = total_space
+        self.minimum_free_space_percentage = minimum_free_space_percentage
+
+    @property
+    def free_space_percentage(self):
+        """
+        The free space of the volume as a percentage of its total space.
+        """
+        return self.free_space / self.total_space * 100
+
+    def is_below_minimum(self):
+        """
+        Checks whether the free space of the volume is below its target.
+        """
+        return round(self.free_space_percentage) < self.minimum_free_space_percentage
+
+    def contains(self, path: str):
+        """
+        Checks whether the given path is stored on the volume, for both / and \\ separated paths.
+        """
+        return path == self.path or (path.startswith(self.path) and (self.path[-1] in ("/", "\\") or path[len(self.path):len(self.path) + 1] in ("/", "\\")))
+
+
+def get_volume(volumes: list, path: str):
+    """
+    Gets the volume the given path is stored on, which is the volume with the longest path that contains it.
+
+    Args:
+        volumes: The volumes to choose from.
+        path: The path of a title.
+
+    Returns:
+        Volume: The volume of the path, or None if no volume contains it.
+    """
+    if not path:
+        return None
+
+    return max((volume for volume in volumes if volume.contains(path)), key=lambda volume: len(volume.path), default=None)
@@ -0,0 +1,147 @@
+"""This module contains the expiry policy engine, which evaluates the expiry of a whole library at once."""
+import time
+from datetime import datetime
+import numpy as np
+from src.models.mediastate import MediaState
+from src.models.snapshotmedia import SnapshotMedia
+
+
+def _get_loaded(media, attr):
+    """
+    Gets an attribute of a Plex item only if it was loaded, as reading an empty attribute of a partial item reloads it.
+    """
+    return vars(media).get(attr) or []
+
+
+def _get_size(media):
+    """
+    Gets the size on disk of a Plex item from its media parts. Shows do not list their parts and have a size of 0.
+    """
+    return sum(part.size or 0 for item in _get_loaded(media, "media") for part in item.parts)
+
+
+def _get_timestamp(date):
+    return date.timestamp() if date is not None else np.nan
+
+
+def _get_date(timestamp):
+    return datetime.fromtimestamp(timestamp) if timestamp is not None else None
+
+
+class MediaSnapshot:
+    """
+    Class for holding the watch state of a library as columns.
+
+    Every column has one row per MediaState, in the order the states were given. Dates are Unix timestamps and are
+    NaN when unknown, such as for items that were not evaluated.
+    """
+    def __init__(self, media_states):
+        self.media_states = list(media_states)
+        count = len(self.media_states)
+        self.rating_keys = np.array([str(media_state.media.ratingKey) for media_state in self.media_states], dtype=str)
+        self.guids = np.array([media_state.media.guid or f"{media_state.server}:{media_state.media.ratingKey}" for media_state in self.media_states], dtype=str)
+        self.types = np.array([media_state.media.type for media_state in self.media_states], dtype=str)
+        self.sections = np.array([media_state.section or "" for media_state in self.media_states], dtype=str)
+        self.servers = np.array([media_state.server for media_state in self.media_states], dtype=str)
+        self.added_at = np.fromiter((_get_timestamp(media_state.added_at) for media_state in self.media_states), dtype=np.float64, count=count)
+        self.last_watched = np.fromiter((_get_timestamp(media_state.watched_date) for media_state in self.media_states), dtype=np.float64, count=count)
+        self.sizes = np.fromiter((_get_size(media_state.media) for media_state in self.media_states), dtype=np.int64, count=count)
+        self.tags = np.empty(count, dtype=object)
+        self.tags[:] = [frozenset(label.tag for label in _get_loaded(media_state.media, "labels")) for media_state in self.media_states]
+        self.evaluated = ~np.isnan(self.added_at)
+
+    def __len__(self):
+        return len(self.media_states)
+
+    @classmethod
+    def from_rows(cls, rows):
+        """
+        Restores a snapshot written by to_rows, without a connection to Plex.
+
+        Args:
+            rows: The rows of the snapshot.
+
+        Returns:
+            MediaSnapshot: A snapshot whose MediaStates hold SnapshotMedia items.
+        """
+        return cls(MediaState(SnapshotMedia(row), _get_date(row["added_at"]), _get_date(row["last_watched"]), row["server"], row["section"] or None) for row in rows)
+
+    def to_rows(self):
+        """
+        Converts the snapshot to JSON serializable rows, one per item.
+        """
+        rows = []
+        for index, media_state in enumerate(self.media_states):
+            rows.append({
+                "server": str(self.servers[index]),
+                "section": str(self.sections[index]),
+                "rating_key": str(self.rating_keys[index]),
+                "guid": str(self.guids[index]),
+                "type": str(self.types[index]),
+                "title": media_state.media.title,
+                "guids": [guid.id for guid in _get_loaded(media_state.media, "guids")],
+                "labels": sorted(self.tags[index]),
+                "locations": media_state.locations,
+                "added_at": None if np.isnan(self.added_at[index]) else float(self.added_at[index]),
+                "last_watched": None if np.isnan(self.last_watched[index]) else float(self.last_watched[index]),
+                "size": int(self.sizes[index]),
+            })
+
+        return rows
+
+    def select(self, mask):
+        """
+        Gets the MediaStates of the rows selected by a boolean mask.
+        """
+        return [self.media_states[index] for index in np.flatnonzero(mask)]
+
+
+class ExpiryPolicy:
+    """
+    Class for evaluating the expiry of every item of a MediaSnapshot at once.
+
+    Items expire a number of seconds after they were last watched, or after they were added if they are unwatched.
+    Both thresholds can be overridden per Plex library section.
+    """
+    def __init__(self, watched_deletion_threshold: int, unwatched_deletion_threshold: int, section_thresholds=None):
+        self.watched_deletion_threshold = watched_deletion_threshold
+        self.unwatched_deletion_threshold = unwatched_deletion_threshold
+        self.section_thresholds = section_thresholds or {}
+
+    def get_thresholds(self, snapshot: MediaSnapshot):
+        """
+        Gets the watched and unwatched deletion thresholds that apply to every row of the snapshot.
+
+        Returns:
+            tuple: An array of watched thresholds and an array of unwatched thresholds, in seconds.
+        """
+        watched = np.full(len(snapshot), self.watched_deletion_threshold, dtype=np.float64)
+        unwatched = np.full(len(snapshot), self.unwatched_deletion_threshold, dtype=np.float64)
+
+        for section, (watched_threshold, unwatched_threshold) in self.section_thresholds.items():
+            in_section = snapshot.sections == section
+            watched[in_section] = watched_threshold
+            unwatched[in_section] = unwatched_threshold
+
+        return watched, unwatched
+
+    def get_expiry(self, snapshot: MediaSnapshot):
+        """
+        Gets the timestamp at which every row of the snapshot expires. Rows that were not evaluated are NaN.
+        """
+        watched, unwatched = self.get_thresholds(snapshot)
+        return np.where(np.isnan(snapshot.last_watched), snapshot.added_at + unwatched, snapshot.last_watched + watched)
+
+    def get_expired(self, snapshot: MediaSnapshot, current_time: float = None):
+        """
+        Gets a boolean mask of the rows of the snapshot that are expired.
+
+        Args:
+            snapshot: The MediaSnapshot to evaluate.
+            current_time: The timestamp to evaluate at. Defaults to now.
+
+        Returns:
+            numpy.ndarray: True for every expired row. Rows that were not evaluated are never expired.
+        """
+        current_time = current_time if current_time is not None else time.time()
+        return snapshot.evaluated & (self.get_expiry(snapshot) < current_time)
@@ -0,0 +1,386 @@
+"""This module contains the timing spans, run reports and profiler used to find out which part of a cycle is slow."""
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from src.logger import logger
+
+_lock = threading.Lock()
+_current_report = None
+_last_reports = {}
+_report_path = None
+
+
+def _get_max_rss():
+    """
+    Gets the peak resident memory of the process in bytes, or None on platforms without the resource module, such
+    as Windows.
+    """
+    if sys.platform == "win32":
+        return None
+
+    import resource  # pylint: disable=import-outside-toplevel
+
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+class RunCancelledError(BaseException):
+    """
+    Raised in a job whose run was cancelled.
+
+    It derives from BaseException, like KeyboardInterrupt, so the retry decorators of the clients do not retry the
+    call it interrupts.
+    """
+
+
+class RunReport:
+    """
+    Class for collecting the spans, request counts and memory high-water marks of a single job run.
+    """
+    def __init__(self, job: str):
+        self.job = job
+        self.started_at = time.time()
+        self.finished_at = None
+        self.status = "running"
+        self.error = None
+        self.spans = {}
+        self.requests = {}
+        self.failures = {}
+        self.phases = []
+        self.progress = {}
+        self.cancelled = False
+        self.lock = threading.Lock()
+
+    def add_span(self, name: str, duration: float):
+        """
+        Records the duration of a span.
+        """
+        with self.lock:
+            span = self.spans.setdefault(name, {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+            span["count"] += 1
+            span["total_seconds"] += duration
+            span["max_seconds"] = max(span["max_seconds"], duration)
+
+    def add_request(self, service: str, method: str, endpoint: str):
+        """
+        Records a request sent to a service.
+        """
+        key = f"{service} {method} {endpoint}"
+        with self.lock:
+            self.requests[key] = self.requests.get(key, 0) + 1
+
+    def add_failure(self, service: str, operation: str):
+        """
+        Records a failed call to a service.
+        """
+        key = f"{service} {operation}"
+        with self.lock:
+            self.failures[key] = self.failures.get(key, 0) + 1
+
+    def enter_phase(self, name: str):
+        """
+        Marks the start of a phase of the run.
+        """
+        with self.lock:
+            self.phases.append(name)
+
+    def exit_phase(self):
+        """
+        Marks the end of the innermost phase of the run.
+        """
+        with self.lock:
+            self.phases.pop()
+
+    def get_phases(self):
+        """
+        Gets a copy of the phases the run is in, from the outermost to the innermost.
+        """
+        with self.lock:
+            return list(self.phases)
+
+    def start_progress(self, step: str, total: int):
+        """
+        Starts counting the items processed by a step of the run, such as the walk of a Plex server.
+        """
+        with self.lock:
+            self.progress[step] = {"processed": 0, "total": total, "started_at": time.time()}
+
+    def advance_progress(self, step: str, count: int = 1):
+        """
+        Counts processed items of a step.
+
+        Raises:
+            RunCancelledError: If the run was cancelled.
+        """
+        if self.cancelled:
+            raise RunCancelledError()
+
+        with self.lock:
+            if step in self.progress:
+                self.progress[step]["processed"] += count
+
+    def get_progress(self):
+        """
+        Gets the number of processed and total items of every step, with an estimate of the seconds left.
+        """
+        now = time.time()
+        with self.lock:
+            progress = {step: dict(item) for step, item in self.progress.items()}
+
+        for item in progress.values():
+            processed, total = item["processed"], item["total"]
+            item["eta_seconds"] = round((now - item.pop("started_at")) / processed * (total - processed), 1) if processed else None
+
+        return progress
+
+    def to_dict(self):
+        """
+        Converts the report to a JSON serializable dictionary.
+        """
+        memory = {}
+        max_rss = _get_max_rss()
+        if max_rss is not None:
+            memory["max_rss_bytes"] = max_rss
+        if tracemalloc.is_tracing():
+            memory["tracemalloc_current_bytes"], memory["tracemalloc_peak_bytes"] = tracemalloc.get_traced_memory()
+
+        with self.lock:
+            spans = {name: {"count": span["count"], "total_seconds": round(span["total_seconds"], 6), "max_seconds": round(span["max_seconds"], 6)} for name, span in sorted(self.spans.items())}
+            requests = dict(sorted(self.requests.items()))
+            failures = dict(sorted(self.failures.items()))
+
+        return {
+            "job": self.job,
+            "status": self.status,
+            "error": self.error,
+            "started_at": datetime.fromtimestamp(self.started_at).isoformat(),
+            "finished_at": datetime.fromtimestamp(self.finished_at).isoformat() if self.finished_at else None,
+            "duration_seconds": round((self.finished_at or time.time()) - self.started_at, 6),
+            "spans": spans,
+            "request_count": sum(requests.values()),
+            "requests": requests,
+            "failures": failures,
+            "memory": memory,
+        }
+
+
+def configure(report_path):
+    """
+    Sets the path the run reports are written to, or None to disable them.
+    """
+    global _report_path  # pylint: disable=global-statement
+    _report_path = report_path
+
+
+def get_current_report():
+    """
+    Returns the report of the run in progress, if any.
+    """
+    return _current_report
+
+
+def get_last_report(job: str):
+    """
+    Returns the report of the last finished run of the given job, if any.
+    """
+    return _last_reports.get(job)
+
+
+def get_last_reports():
+    """
+    Returns the report of the last finished run of every job.
+    """
+    return dict(_last_reports)
+
+
+def cancel_run(job: str = None):
+    """
+    Cancels the run in progress, or only a run of the given job. The run stops at its next processed item or phase.
+
+    Returns:
+        bool: True if a run was cancelled.
+    """
+    report = _current_report
+    if report is None or (job is not None and report.job != job):
+        return False
+
+    report.cancelled = True
+    return True
+
+
+def check_cancelled():
+    """
+    Stops the run in progress if it was cancelled.
+
+    Raises:
+        RunCancelledError: If the run was cancelled.
+    """
+    report = _current_report
+    if report is not None and report.cancelled:
+        raise RunCancelledError()
+
+
+@contextmanager
+def run_report(job: str):
+    """
+    Collects a run report for the duration of the block and writes it when the block exits.
+
+    Nested runs, such as the recursive cycles of progressive deletion, are folded into the outermost run.
+    """
+    global _current_report  # pylint: disable=global-statement
+    with _lock:
+        if _current_report is not None:
+            nested = True
+        else:
+            nested = False
+            _current_report = RunReport(job)
+        report = _current_report
+
+    if nested:
+        yield report
+        return
+
+    try:
+        yield report
+        report.status = "success"
+    except RunCancelledError:
+        report.status = "cancelled"
+        raise
+    except BaseException as err:
+        report.status = "failed"
+        report.error = repr(err)
+        raise
+    finally:
+        report.finished_at = time.time()
+        with _lock:
+            _current_report = None
+            _last_reports[job] = report
+        write_report(report)
+
+
+def write_report(report: RunReport):
+    """
+    Writes a run report next to the configured path, with the job name inserted before the extension.
+    """
+    if not _report_path:
+        return
+
+    root, extension = os.path.splitext(_report_path)
+    path = f"{root}.{report.job}{extension or '.json'}"
+
+    try:
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(report.to_dict(), file, indent=2)
+    except OSError as err:
+        logger.error("[PROFILE] Failed to write run report to %s. Error: %s", path, err)
+
+
+@contextmanager
+def span(name: str):
+    """
+    Records the duration of the block as a span of the run in progress.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        report = _current_report
+        if report is not None:
+            report.add_span(name, time.perf_counter() - start)
+
+
+@contextmanager
+def phase(name: str):
+    """
+    Marks the block as the current phase of the run in progress.
+    """
+    report = _current_report
+    if report is None:
+        yield
+        return
+
+    report.enter_phase(name)
+    try:
+        yield
+    finally:
+        report.exit_phase()
+
+
+def start_progress(step: str, total: int):
+    """
+    Starts counting the items processed by a step of the run in progress.
+    """
+    report = _current_report
+    if report is not None:
+        report.start_progress(step, total)
+
+
+def advance_progress(step: str, count: int = 1):
+    """
+    Counts processed items of a step of the run in progress.
+
+    Raises:
+        RunCancelledError: If the run was cancelled.
+    """
+    report = _current_report
+    if report is not None:
+        report.advance_progress(step, count)
+
+
+def record_request(service: str, method: str, endpoint: str):
+    """
+    Records a request in the run in progress.
+    """
+    report = _current_report
+    if report is not None:
+        report.add_request(service, method, endpoint)
+
+
+def record_failure(service: str, operation: str):
+    """
+    Records a failed call in the run in progress.
+    """
+    report = _current_report
+    if report is not None:
+        report.add_failure(service, operation)
+
+
+def profile(func, output_path: str, top: int = 25):
+    """
+    Runs the given function under cProfile and tracemalloc.
+
+    The CPU profile is written to the output path in pstats format and a summary of the slowest functions
+    and largest allocations is logged.
+
+    Args:
+        func: The function to profile.
+        output_path: The path the pstats file is written to.
+        top: The number of functions and allocation sites to log.
+    """
+    profiler = cProfile.Profile()
+    tracemalloc.start()
+    profiler.enable()
+
+    try:
+        return func()
+    finally:
+        profiler.disable()
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        profiler.dump_stats(output_path)
+
+        stream = io.StringIO()
+        pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(top)
+        logger.info("[PROFILE] CPU profile written to %s.\n%s", output_path, stream.getvalue())
+
+        allocations = "\n".join(str(stat) for stat in snapshot.statistics("lineno")[:top])
+        logger.info("[PROFILE] Peak traced memory: %s bytes. Top allocations:\n%s", peak, allocations)
@@ -0,0 +1,173 @@
+"""This module contains the StateStore class which persists the expiry state of each Plex item between cycles."""
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS media_state (
+    rating_key TEXT PRIMARY KEY,
+    section_type TEXT NOT NULL,
+    title TEXT,
+    signature TEXT,
+    added_at REAL,
+    last_watched REAL,
+    next_expiry REAL,
+    evaluated_at REAL
+);
+CREATE INDEX IF NOT EXISTS media_state_next_expiry ON media_state (section_type, next_expiry);
+"""
+
+
+def compute_next_expiry(added_at, last_watched, watched_media_expiry_seconds, unwatched_media_expiry_seconds):
+    """
+    Computes the earliest time at which an item could possibly expire.
+
+    Args:
+        added_at: The timestamp the item (or its newest episode) was added.
+        last_watched: The timestamp the item was last watched, or None if it is unwatched.
+        watched_media_expiry_seconds: The number of seconds after which watched media is considered expired.
+        unwatched_media_expiry_seconds: The number of seconds after which unwatched media is considered expired.
+
+    Returns:
+        float: The timestamp of the next possible expiry.
+    """
+    if last_watched is not None:
+        return last_watched + watched_media_expiry_seconds
+
+    return (added_at or 0) + unwatched_media_expiry_seconds
+
+
+class StateStore:
+    """
+    Class for persisting the addedAt, last watched time and next possible expiry of each Plex item.
+
+    Watches and newly added episodes can only push an item's expiry further into the future, so an item whose
+    stored next possible expiry has not been reached cannot be expired and does not need to be re-evaluated.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.executescript(SCHEMA)
+        self.connection.commit()
+
+    def close(self):
+        """
+        Closes the connection to the database.
+        """
+        with self.lock:
+            self.connection.close()
+
+    def get(self, rating_key):
+        """
+        Retrieves the stored state of an item.
+
+        Args:
+            rating_key: The Plex rating key of the item.
+
+        Returns:
+            dict: The stored state, or None if the item has never been evaluated.
+        """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT signature, added_at, last_watched, next_expiry FROM media_state WHERE rating_key = ?", (str(rating_key),)
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        return {"signature": row[0], "added_at": row[1], "last_watched": row[2], "next_expiry": row[3]}
+
+    def is_due(self, rating_key, signature, watched_media_expiry_seconds, unwatched_media_expiry_seconds, current_time=None):
+        """
+        Determines whether an item needs a full evaluation.
+
+        An item is due when it has never been evaluated, its listing signature changed since the last evaluation,
+        or its next possible expiry under the given thresholds has been reached.
+
+        Returns:
+            bool: True if the item should be fully evaluated.
+        """
+        state = self.get(rating_key)
+        if state is None or state["signature"] != signature:
+            return True
+
+        current_time = current_time if current_time is not None else time.time()
+        next_expiry = compute_next_expiry(state["added_at"], state["last_watched"], watched_media_expiry_seconds, unwatched_media_expiry_seconds)
+
+        return next_expiry <= current_time
+
+    def get_next_expiries(self, section_type, get_thresholds):
+        """
+        Computes the next possible expiry of every stored item of the given section type.
+
+        Args:
+            section_type: The type of media to retrieve.
+            get_thresholds: A function that gets the (watched_media_expiry_seconds, unwatched_media_expiry_seconds)
+                tuples that apply to an item from its rating key. The item expires under the earliest of them.
+
+        Returns:
+            List[tuple]: A list of (next_expiry, rating_key) tuples.
+        """
+        with self.lock:
+            rows = self.connection.execute("SELECT rating_key, added_at, last_watched FROM media_state WHERE section_type = ?", (section_type,)).fetchall()
+
+        return [(min(compute_next_expiry(added_at, last_watched, *thresholds) for thresholds in get_thresholds(rating_key)), rating_key) for rating_key, added_at, last_watched in rows]
+
+    def get_watch_states(self, section_type):
+        """
+        Retrieves the stored added and last watched timestamps of every item of the given section type.
+
+        Returns:
+            dict: (added_at, last_watched) tuples by rating key.
+        """
+        with self.lock:
+            rows = self.connection.execute("SELECT rating_key, added_at, last_watched FROM media_state WHERE section_type = ?", (section_type,)).fetchall()
+
+        return {rating_key: (added_at, last_watched) for rating_key, added_at, last_watched in rows}
+
+    def update(self, rating_key, section_type, title, signature, added_at, last_watched, next_expiry):
+        """
+        Stores the result of a full evaluation of an item.
+        """
+        self.update_many([(rating_key, section_type, title, signature, added_at, last_watched, next_expiry)])
+
+    def update_many(self, rows):
+        """
+        Stores the results of the full evaluation of many items in a single transaction.
+
+        Args:
+            rows: (rating_key, section_type, title, signature, added_at, last_watched, next_expiry) tuples.
+        """
+        evaluated_at = time.time()
+        with self.lock:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO media_state (rating_key, section_type, title, signature, added_at, last_watched, next_expiry, evaluated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(str(rating_key), section_type, title, signature, added_at, last_watched, next_expiry, evaluated_at) for rating_key, section_type, title, signature, added_at, last_watched, next_expiry in rows],
+            )
+            self.connection.commit()
+
+    def remove(self, rating_keys):
+        """
+        Removes the stored state of the given items.
+        """
+        with self.lock:
+            self.connection.executemany("DELETE FROM media_state WHERE rating_key = ?", [(str(rating_key),) for rating_key in rating_keys])
+            self.connection.commit()
+
+    def prune(self, section_type, rating_keys):
+        """
+        Removes the stored state of every item of the given section type that is not in the given rating keys.
+
+        Returns:
+            int: The number of items removed.
+        """
+        keep = {str(rating_key) for rating_key in rating_keys}
+        with self.lock:
+            stored = [row[0] for row in self.connection.execute("SELECT rating_key FROM media_state WHERE section_type = ?", (section_type,))]
+
+        stale = [rating_key for rating_key in stored if rating_key not in keep]
+        if stale:
+            self.remove(stale)
+
+        return len(stale)
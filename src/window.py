@@ -0,0 +1,60 @@
+"""This module contains the OffPeakWindows class, which decides when the scheduled fetch and delete job may run."""
+import random
+import socket
+from datetime import datetime, timedelta
+
+
+class WindowClosedError(Exception):
+    """Raised when the off-peak window of a job closes before the job finished."""
+
+
+class OffPeakWindows:
+    """
+    Class for the daily off-peak windows the scheduled fetch and delete job runs in.
+
+    A deployment starts its jobs a fixed, random offset of up to the jitter after a window opens, so deployments
+    that share services do not all start at the same moment. The offset is derived from the host name, so it is
+    the same after a restart.
+    """
+    def __init__(self, off_peak_config, seed=None):
+        self.config = off_peak_config
+        self.offset = random.Random(seed if seed is not None else socket.gethostname()).uniform(0, off_peak_config.jitter)
+
+    def __get_windows(self, now):
+        """
+        Gets the (start, end) datetimes of the windows of yesterday, today and tomorrow, starting after the offset.
+        """
+        midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        windows = []
+        for days in (-1, 0, 1):
+            for start, end in self.config.windows:
+                length = (end - start) % 1440 * 60
+                window_start = midnight + timedelta(days=days, minutes=start)
+                # An offset longer than the window would skip it, so it wraps around within the window.
+                windows.append((window_start + timedelta(seconds=self.offset % length), window_start + timedelta(seconds=length)))
+
+        return windows
+
+    def get_end(self, now: datetime = None):
+        """
+        Gets the end of the window that is open now.
+
+        Returns:
+            datetime: The end of the open window, or None if no window is open.
+        """
+        now = now or datetime.now()
+        ends = [end for start, end in self.__get_windows(now) if start <= now < end]
+        return max(ends) if ends else None
+
+    def is_open(self, now: datetime = None):
+        """
+        Checks whether a window is open now.
+        """
+        return self.get_end(now) is not None
+
+    def get_next_start(self, now: datetime = None):
+        """
+        Gets the time at which the next window opens.
+        """
+        now = now or datetime.now()
+        return min(start for start, _ in self.__get_windows(now) if start > now)